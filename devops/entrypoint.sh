@@ -12,6 +12,14 @@ then
     python manage.py migrate
     # python manage.py collectstatic --noinput
     # django-admin compilemessages
+    # Release expired reservations, send queued emails, apply payment
+    # webhooks and refresh suggestions in the background
+    python manage.py clean_transactions &
+    python manage.py send_outbox &
+    python manage.py process_webhooks &
+    python manage.py refresh_recommendations &
+    python manage.py build_related_publications &
+    python manage.py build_similar_publications &
 
     # I'd like to run gunicorn here, but I couldn't make reload to work
     until uvicorn conf.asgi:application --reload --port 8000 --host 0.0.0.0; do
@@ -27,5 +35,15 @@ else
     python manage.py migrate
     # python manage.py collectstatic --noinput
     # django-admin compilemessages
+    # Release expired reservations, send queued emails, apply payment
+    # webhooks and refresh suggestions in the background
+    python manage.py clean_transactions &
+    python manage.py send_outbox &
+    python manage.py process_webhooks &
+    python manage.py refresh_recommendations &
+    python manage.py build_related_publications &
+    python manage.py build_similar_publications &
+    # Request metrics are added up across the gunicorn workers
+    export METRICS_DIR="${METRICS_DIR:-/django/run/metrics}"
     gunicorn conf.asgi:application -c /devops/gunicorn.conf.py
 fi
@@ -1,3 +1,6 @@
+import os
+import shutil
+
 reload = False
 accesslog = '-'
 errorlog = '-'
@@ -8,3 +11,13 @@ bind = '0.0.0.0:8000'
 workers = 1
 worker_class = 'uvicorn.workers.UvicornWorker'
 max_requests = 1000
+
+
+def on_starting(server):
+    # Metrics of a previous run must not be added to the new ones
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+        # Workers run as user, not as the master
+        os.chown(metrics_dir, server.cfg.uid, server.cfg.gid)
@@ -5,12 +5,20 @@ from publications.api.main import router as publication_router
 from transactions.api.main import router as transaction_router
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.http import HttpResponse
+from utilities.etag import add_etag
 
 
 class ShortNameNinjaAPI(NinjaAPI):
     def get_openapi_operation_id(self, operation):
         return operation.view_func.__name__
 
+    def create_response(self, request, data, *, status=200):
+        # Views decorated with utilities.etag.conditional tag their response
+        return add_etag(
+            request,
+            super().create_response(request, data, status=status)
+        )
+
 
 api = ShortNameNinjaAPI(csrf=True)
 api.add_router('/auth/', auth_router)
@@ -19,7 +27,6 @@ api.add_router('/publications/', publication_router)
 api.add_router('/transactions/', transaction_router)
 
 
-
 @api.get('csrf')
 @ensure_csrf_cookie
 def get_csrf(request):
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal
 
 from pydantic import BaseSettings
 
@@ -43,6 +43,71 @@ class EnvSettings(BaseSettings):
     fintoc_key: str = ""
     fintoc_payment_uri: str = ""
     fintoc_webhook_secret: str = ""
+    fintoc_connect_timeout: float = 3.05
+    fintoc_read_timeout: float = 10
+    fintoc_max_retries: int = 2
+    fintoc_retry_backoff: float = 0.25
+    fintoc_breaker_threshold: int = 5
+    fintoc_breaker_reset_seconds: float = 30
+
+    # Reservation expiry settings
+    reservation_expiry_seconds: int = 15 * 60
+    reservation_sweep_interval: float = 30
+    reservation_sweep_batch_size: int = 100
+    clean_transactions_on_request: bool = False
+    reservation_engine: Literal['locking', 'conditional'] = 'locking'
+
+    # Idempotency key settings
+    idempotency_key_ttl: int = 24 * 60 * 60
+    idempotency_lock_timeout: float = 30
+
+    # Email outbox settings
+    email_outbox_interval: float = 5
+    email_outbox_batch_size: int = 50
+    email_outbox_max_attempts: int = 8
+    email_outbox_retry_backoff: float = 30
+    email_outbox_max_retry_delay: float = 60 * 60
+
+    # Seconds a user's permissions are cached across requests, 0 disables
+    principal_cache_ttl: int = 0
+
+    # Webhook queue settings
+    webhook_events_interval: float = 1
+    webhook_events_batch_size: int = 50
+    webhook_events_max_attempts: int = 5
+
+    # Recommendation settings
+    recommendations_interval: float = 60 * 60
+    recommendations_batch_size: int = 500
+    recommendations_per_user: int = 50
+    related_publications_interval: float = 5 * 60
+    related_publications_batch_size: int = 500
+    related_publications_per_publication: int = 20
+    similar_publications_interval: float = 10 * 60
+    similar_publications_batch_size: int = 500
+    similar_publications_per_publication: int = 20
+    similar_publications_rebuild_interval: float = 24 * 60 * 60
+
+    # Sales export settings
+    export_chunk_size: int = 2000
+    export_spool_max_size: int = 8 * 1024 * 1024
+
+    # Cache settings, the shared tier is a django cache backend
+    cache_backend: str = 'django.core.cache.backends.dummy.DummyCache'
+    cache_location: str = ''
+    cache_ttl: int = 5 * 60
+    cache_local_max_entries: int = 1000
+    cache_lock_timeout: float = 5
+
+    # Request metrics settings, without a directory only the metrics of
+    # the current process are exposed
+    metrics_dir: str = ''
+    metrics_flush_interval: float = 5
+    metrics_token: str = ''
+
+    # Pagination settings
+    pagination_page_size: int = 20
+    pagination_max_page_size: int = 100
 
     # AWS secrets
     secrets: dict[str, str] = {}
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'django.contrib.postgres',
     # 'django.contrib.staticfiles',
 
     # 3rd party
@@ -52,6 +53,7 @@ if DEBUG:
 
 MIDDLEWARE = [
     'utilities.healthcheck_middleware.HealthCheckMiddleware',
+    'utilities.metrics_middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,11 +61,77 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'transactions.clean_transactions.CleanTransactionMiddleWare',
 ]
 
+# Expired reservations are released by the clean_transactions command.
+# Cleaning on every request is kept as an opt-in fallback.
+RESERVATION_EXPIRY_SECONDS = env.reservation_expiry_seconds
+RESERVATION_SWEEP_INTERVAL = env.reservation_sweep_interval
+RESERVATION_SWEEP_BATCH_SIZE = env.reservation_sweep_batch_size
+if env.clean_transactions_on_request:
+    MIDDLEWARE.append(
+        'transactions.clean_transactions.CleanTransactionMiddleWare'
+    )
+
+# How checkouts reserve stock: 'locking' locks the publication items with
+# SELECT FOR UPDATE, 'conditional' reserves them with conditional UPDATEs.
+RESERVATION_ENGINE = env.reservation_engine
+
+# Invalidations made by one process only reach the others through a cache
+# they all share, memcached or redis. Without one, CACHE_BACKEND is the
+# DummyCache and nothing is cached across requests. The LocMemCache is only
+# shared within a process, for single process setups and tests.
+CACHE_CONFIGURED = (
+    env.cache_backend != 'django.core.cache.backends.dummy.DummyCache'
+)
+
+# Permissions and groups of a user are loaded once per request. They can
+# also be cached across requests for PRINCIPAL_CACHE_TTL seconds, changes
+# made through the permissions endpoints invalidate them.
+PRINCIPAL_CACHE_TTL = env.principal_cache_ttl if CACHE_CONFIGURED else 0
+
+# Latency, queries and response sizes of every request, and the requests,
+# errors and circuit breaker of the payment client, are served on
+# /metrics, behind a bearer METRICS_TOKEN when it is set. Each worker writes
+# its metrics to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds so they
+# are added up across workers.
+METRICS_DIR = env.metrics_dir
+METRICS_FLUSH_INTERVAL = env.metrics_flush_interval
+METRICS_TOKEN = env.metrics_token
+
+# Responses of checkouts sent with an Idempotency-Key are replayed for
+# IDEMPOTENCY_KEY_TTL seconds. A retry waits up to IDEMPOTENCY_LOCK_TIMEOUT
+# seconds for a request with the same key that is still running.
+IDEMPOTENCY_KEY_TTL = env.idempotency_key_ttl
+IDEMPOTENCY_LOCK_TIMEOUT = env.idempotency_lock_timeout
+
 ROOT_URLCONF = 'conf.urls'
 
+# Default and maximum amount of items in a page of a list endpoint
+PAGINATION_PAGE_SIZE = env.pagination_page_size
+PAGINATION_MAX_PAGE_SIZE = env.pagination_max_page_size
+
+# Sales exports are read EXPORT_CHUNK_SIZE rows at a time from a server side
+# cursor, and kept in memory up to EXPORT_SPOOL_MAX_SIZE bytes before
+# spilling to a temporary file.
+EXPORT_CHUNK_SIZE = env.export_chunk_size
+EXPORT_SPOOL_MAX_SIZE = env.export_spool_max_size
+
+# Public catalogue reads are cached for CACHE_TTL seconds, 0 disables it.
+# Each process keeps up to CACHE_LOCAL_MAX_ENTRIES entries in memory in
+# front of the CACHE_SHARED_ALIAS cache, shared by every process. A miss
+# waits up to CACHE_LOCK_TIMEOUT seconds for another request computing it.
+CACHES = {
+    'default': {
+        'BACKEND': env.cache_backend,
+        'LOCATION': env.cache_location
+    }
+}
+CACHE_SHARED_ALIAS = 'default'
+CACHE_TTL = env.cache_ttl if CACHE_CONFIGURED else 0
+CACHE_LOCAL_MAX_ENTRIES = env.cache_local_max_entries
+CACHE_LOCK_TIMEOUT = env.cache_lock_timeout
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -166,6 +234,46 @@ else:
     EMAIL_DEFAULT_FROM = env.secrets['email_default_from']
     EMAIL_USE_TLS = env.email_use_tls
 
+# Emails are queued in utilities.EmailOutbox and sent by send_outbox.
+# Failed sends are retried with exponential backoff up to the max attempts.
+EMAIL_OUTBOX_INTERVAL = env.email_outbox_interval
+EMAIL_OUTBOX_BATCH_SIZE = env.email_outbox_batch_size
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.email_outbox_max_attempts
+EMAIL_OUTBOX_RETRY_BACKOFF = env.email_outbox_retry_backoff
+EMAIL_OUTBOX_MAX_RETRY_DELAY = env.email_outbox_max_retry_delay
+
+# Fintoc webhooks are queued in transactions.WebhookEvent and applied by
+# process_webhooks. An event failing WEBHOOK_EVENTS_MAX_ATTEMPTS times is
+# marked as failed and stops blocking the rest of its payment events.
+WEBHOOK_EVENTS_INTERVAL = env.webhook_events_interval
+WEBHOOK_EVENTS_BATCH_SIZE = env.webhook_events_batch_size
+WEBHOOK_EVENTS_MAX_ATTEMPTS = env.webhook_events_max_attempts
+
+# Recommendations are precomputed in publications.UserRecommendation by
+# refresh_recommendations, every RECOMMENDATIONS_INTERVAL seconds.
+RECOMMENDATIONS_INTERVAL = env.recommendations_interval
+RECOMMENDATIONS_BATCH_SIZE = env.recommendations_batch_size
+RECOMMENDATIONS_PER_USER = env.recommendations_per_user
+
+# Publications bought together are kept in publications.RelatedPublication
+# by build_related_publications, which counts new sales every
+# RELATED_PUBLICATIONS_INTERVAL seconds.
+RELATED_PUBLICATIONS_INTERVAL = env.related_publications_interval
+RELATED_PUBLICATIONS_BATCH_SIZE = env.related_publications_batch_size
+RELATED_PUBLICATIONS_PER_PUBLICATION = \
+    env.related_publications_per_publication
+
+# Publications alike are kept in publications.SimilarPublication by
+# build_similar_publications, which every SIMILAR_PUBLICATIONS_INTERVAL
+# seconds updates the publications changed since its last run, and every
+# SIMILAR_PUBLICATIONS_REBUILD_INTERVAL seconds, 0 disables it, all of them.
+SIMILAR_PUBLICATIONS_INTERVAL = env.similar_publications_interval
+SIMILAR_PUBLICATIONS_BATCH_SIZE = env.similar_publications_batch_size
+SIMILAR_PUBLICATIONS_PER_PUBLICATION = \
+    env.similar_publications_per_publication
+SIMILAR_PUBLICATIONS_REBUILD_INTERVAL = \
+    env.similar_publications_rebuild_interval
+
 FINTOC_ACCOUNT: dict[str, str]
 if not PROD:
     FINTOC_KEY = env.fintoc_key
@@ -188,6 +296,16 @@ else:
         'institution_id': env.secrets['fintoc_institution_id']
     }
 
+# Fintoc client tuning, the caller holds reserved stock while it waits.
+# Retries back off exponentially with full jitter, and the circuit opens
+# after FINTOC_BREAKER_THRESHOLD consecutive failures.
+FINTOC_CONNECT_TIMEOUT = env.fintoc_connect_timeout
+FINTOC_READ_TIMEOUT = env.fintoc_read_timeout
+FINTOC_MAX_RETRIES = env.fintoc_max_retries
+FINTOC_RETRY_BACKOFF = env.fintoc_retry_backoff
+FINTOC_BREAKER_THRESHOLD = env.fintoc_breaker_threshold
+FINTOC_BREAKER_RESET_SECONDS = env.fintoc_breaker_reset_seconds
+
 
 if not PROD:
     MAX_FILE_SIZE = env.max_file_size
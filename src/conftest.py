@@ -1,9 +1,109 @@
 import pytest
 from unittest.mock import Mock
 from ninja.testing import TestClient
+from ninja.testing.client import NinjaResponse
 from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import caches
+from django.db import connection
 from conf.api import api
+from conf.env import env
+from user_profiles.principal import Principal
+from utilities.cache import local_cache
+from collections import Counter
+from dataclasses import dataclass
 from datetime import date
+from typing import Callable, Iterable
+import os
+import re
+import warnings
+
+
+# The ninja test client and django's, through conf.urls, both build the
+# urls of the api, which ninja takes for two apis with the same namespace
+os.environ.setdefault('NINJA_SKIP_REGISTRY', 'true')
+
+
+# A query run this many times by a single request is reported as N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+class NPlusOneWarning(UserWarning):
+    pass
+
+
+@dataclass(frozen=True)
+class StandInPrincipal(Principal):
+    # Principal of the users that only exist in the tests, their has_perm
+    # mock answers the permission checks
+    user: Mock = None
+
+    def has_perm(self, perm: str) -> bool:
+        return self.user.has_perm(perm)
+
+
+def stand_in_user(user_id: int, has_perm: bool) -> Mock:
+    user = Mock(
+        id=user_id,
+        is_authenticated=True,
+        has_perm=Mock(return_value=has_perm)
+    )
+    user.principal = StandInPrincipal(
+        user_id,
+        True,
+        False,
+        frozenset(),
+        frozenset(),
+        user
+    )
+    return user
+
+
+def query_fingerprint(sql: str) -> str:
+    # Queries that only differ in their parameters, the length of their IN
+    # lists or inlined numbers such as LIMIT share a fingerprint
+    return _NUMBER.sub('?', _IN_LIST.sub('IN (...)', ' '.join(sql.split())))
+
+
+def repeated_queries(
+    queries: Iterable[str],
+    threshold: int = N_PLUS_ONE_THRESHOLD
+) -> dict[str, int]:
+    counts = Counter(query_fingerprint(sql) for sql in queries)
+    return {sql: count for sql, count in counts.items() if count >= threshold}
+
+
+class QueryRecorder:
+    # Installed with connection.execute_wrapper, keeps the sql before
+    # parameters are bound
+
+    def __init__(self):
+        self.queries: list[str] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+@pytest.fixture(autouse=True)
+def local_memory_cache(settings) -> None:
+    # Tests run in a single process, where the in memory cache is shared
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        }
+    }
+    settings.CACHE_TTL = env.cache_ttl
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(local_memory_cache) -> None:
+    # Ids restart on every test, cached entries must not outlive it
+    local_cache.clear()
+    for cache in caches.all():
+        cache.clear()
 
 
 @pytest.fixture(scope="session")
@@ -20,26 +120,69 @@ def ninja_client() -> TestClient:
             )
             SessionMiddleware().process_request(request)
             request.sessions.save()
+            principal = getattr(request.user, 'principal', None)
+            if isinstance(principal, StandInPrincipal):
+                request._principal = principal
             return request
+
+        def _call(self, func, request, kwargs) -> NinjaResponse:
+            # The queries of each request are kept on its response
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = super()._call(func, request, kwargs)
+            response.queries = recorder.queries
+            repeated = repeated_queries(recorder.queries)
+            if repeated:
+                warnings.warn(
+                    f'{request.method} {request.path} repeated queries '
+                    f'{repeated}',
+                    NPlusOneWarning
+                )
+            return response
     return SessionTestClient(api)
 
 
+@pytest.fixture(scope="function")
+def assert_query_budget(settings) -> Callable:
+    """
+    Checks that a request runs at most budget queries, none of them
+    repeated as in an N+1, with each of sizes rows. grow(size) has to bring
+    the rows the request lists up to size before the request is repeated.
+    """
+    # Measure the database, not the cache of the catalogue
+    settings.CACHE_TTL = 0
+
+    def check(
+        request: Callable[[], NinjaResponse],
+        grow: Callable[[int], None],
+        budget: int,
+        sizes: tuple[int, ...] = (1, 50)
+    ) -> None:
+        query_counts = {}
+        for size in sizes:
+            grow(size)
+            response = request()
+            assert response.status_code == 200
+            repeated = repeated_queries(response.queries)
+            assert not repeated, \
+                f'Repeated queries with {size} rows: {repeated}'
+            query_counts[size] = len(response.queries)
+            assert query_counts[size] <= budget, \
+                f'{query_counts[size]} queries with {size} rows, ' \
+                f'the budget is {budget}'
+        assert len(set(query_counts.values())) == 1, \
+            f'Queries grow with the rows: {query_counts}'
+    return check
+
+
 @pytest.fixture(scope="session")
 def super_user() -> Mock:
-    return Mock(
-        id=9001,
-        is_authenticated=True,
-        has_perm=Mock(return_value=True)
-    )
+    return stand_in_user(9001, True)
 
 
 @pytest.fixture(scope="session")
 def mid_user() -> Mock:
-    return Mock(
-        id=8999,
-        is_authenticated=True,
-        has_perm=Mock(return_value=False)
-    )
+    return stand_in_user(8999, False)
 
 
 @pytest.fixture(scope="session")
@@ -9,9 +9,15 @@ from utilities.errors import (
     missing_permission,
     not_found
 )
+from publications.helpers.cache import (
+    CATEGORIES_VERSION,
+    invalidate_categories
+)
 from publications.helpers.generation import upload_category_image
 from publications.helpers.validation import validate_files
 from ninja.security import django_auth
+from user_profiles.principal import get_principal
+from utilities.cache import cached
 from typing import Union
 
 
@@ -20,7 +26,13 @@ router = Router()
 
 @router.get("/all", response={200: list[CategorySchema]})
 def show_categories(request):
-    return 200, Category.objects.all()
+    def categories() -> list[dict]:
+        return [
+            CategorySchema.from_orm(category).dict(by_alias=True)
+            for category in Category.objects.all()
+        ]
+
+    return 200, cached('categories', (), [CATEGORIES_VERSION], categories)
 
 
 @router.post(
@@ -37,7 +49,7 @@ def add_category(
     body: CategoryCreationSchema,
     file: UploadedFile = File(...)
 ):
-    if not request.user.has_perm('publications.can_allow'):
+    if not get_principal(request).has_perm('publications.can_allow'):
         return 403, missing_permission()
     if not validate_files([file]):
         error_mesage = 'Only upload 1 file of at most 10MB each' \
@@ -48,6 +60,7 @@ def add_category(
     if form.is_valid():
         category = form.save()
         upload_category_image(category, file)
+        invalidate_categories()
         return 200, category
 
     return 400, {'errors': dict(form.errors)}
@@ -63,7 +76,7 @@ def add_category(
     auth=django_auth
 )
 def delete_category(request, category_id: int):
-    if not request.user.has_perm('publications.can_allow'):
+    if not get_principal(request).has_perm('publications.can_allow'):
         return 403, missing_permission()
     category_query = Category.objects.filter(id=category_id)
     if not category_query.exists():
@@ -72,4 +85,5 @@ def delete_category(request, category_id: int):
     if category.items.all().exists():
         return 400, {'message', 'Category is in use.'}
     category.delete()
+    invalidate_categories()
     return 204, None
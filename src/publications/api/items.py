@@ -0,0 +1,55 @@
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import IntegerField, Q, Value
+from django.db.models.functions import Coalesce
+from ninja import Router
+from ninja.security import django_auth
+from publications.models import Item
+from publications.schema import ItemLookupResultSchema
+from utilities.errors import ErrorOut, bad_parameters
+
+
+_MAX_LOOKUP_SKUS = 500
+
+router = Router()
+
+
+@router.get(
+    '/lookup',
+    response={
+        200: ItemLookupResultSchema,
+        400: ErrorOut
+    },
+    auth=django_auth
+)
+def lookup_items(request, skus: str):
+    # skus is a comma separated list, e.g. ?skus=101,102,103
+    try:
+        sku_set = {int(sku) for sku in skus.split(',') if sku.strip()}
+    except ValueError:
+        return 400, bad_parameters()
+    if len(sku_set) == 0 or len(sku_set) > _MAX_LOOKUP_SKUS:
+        return 400, bad_parameters()
+    items = list(
+        Item.objects.filter(
+            sku__in=sku_set
+        ).select_related(
+            'category'
+        ).annotate(
+            publication_ids=Coalesce(
+                ArrayAgg(
+                    'publication_items__publication_id',
+                    distinct=True,
+                    filter=Q(publication_items__isnull=False),
+                    ordering='publication_items__publication_id'
+                ),
+                Value([]),
+                output_field=ArrayField(IntegerField())
+            )
+        ).order_by('sku')
+    )
+    found_skus = {item.sku for item in items}
+    return 200, {
+        'items': items,
+        'missing_skus': sorted(sku_set - found_skus)
+    }
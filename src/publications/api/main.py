@@ -2,6 +2,7 @@ from ninja import Router
 from publications.api.publications import router as publications_router
 from publications.api.shopping_cart import router as shopping_cart_router
 from publications.api.categories import router as categories_router
+from publications.api.items import router as items_router
 
 _TGS = ["Publications"]
 router = Router()
@@ -24,3 +25,8 @@ router.add_router(
     tags=_TGS
 )
 
+router.add_router(
+    "items",
+    items_router,
+    tags=_TGS
+)
@@ -1,8 +1,19 @@
-from django.contrib.auth import get_user_model
+from django.db import transaction
 from ninja.security import django_auth
-from ninja import Router, File
+from ninja import Router, File, Query
 from ninja.files import UploadedFile
 from datetime import date
+from publications.helpers import get_items_by_sku
+from publications.helpers.cache import (
+    ACTIVE_PUBLICATIONS_ORDERING,
+    ACTIVE_PUBLICATIONS_VERSION,
+    BRANDS_VERSION,
+    active_publications_etag,
+    invalidate_brands,
+    invalidate_publications,
+    publication_etag,
+    publication_version
+)
 from publications.helpers.generation import (
     upload_publication_images,
     generate_items
@@ -12,7 +23,18 @@ from publications.helpers.validation import (
     validate_publication
 )
 from publications.helpers.validation import validate_files
-from publications.helpers.suggestions import get_user_recommendations
+from publications.helpers.filtering import (
+    count_facets,
+    filter_publications,
+    valid_filters
+)
+from publications.helpers.search import (
+    search_active_publications,
+    update_search_vectors
+)
+from publications.helpers.recommendations import get_user_recommendations
+from publications.helpers.similar import mark_content_changed
+from publications.helpers.suggestions import suggest_related_publications
 from publications.mail import send_publication_rejection_email
 from publications.models import (
     PublicationItem,
@@ -27,16 +49,30 @@ from publications.schema import (
     PublicationUpdateSchema,
     PublicationItemUpdateSchema,
     PublicationCreationSchema,
-    SuccinctPublicationSchema
+    SuccinctPublicationSchema,
+    SuccinctPublicationPageSchema,
+    PublicationFilterSchema,
+    FilteredPublicationPageSchema
 )
 from publications.forms import PublicationCreationForm
+from user_profiles.principal import get_principal
+from utilities.cache import cached
+from utilities.etag import conditional, request_etag
 from utilities.errors import (
     ErrorsOut,
     ErrorOut,
+    bad_parameters,
     not_found,
     missing_permission,
 )
-from typing import Union
+from utilities.pagination import (
+    InvalidCursor,
+    page_limit,
+    paginate_queryset
+)
+from typing import Optional, Union
+
+_PUBLICATION_ORDERING = ('-publish_date', '-id')
 
 router = Router()
 
@@ -55,16 +91,29 @@ def get_publication_recommendations(request, amount: int):
 @router.get(
     "/all",
     response={
-        200: list[SuccinctPublicationSchema],
+        200: SuccinctPublicationPageSchema,
+        400: ErrorOut,
         403: ErrorOut
     },
     auth=django_auth
 )
-def show_publications(request):
-    user = get_user_model().objects.get(pk=request.user.id)
+def show_publications(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    user = get_principal(request)
     if not user.has_perm('publications.can_allow'):
         return 403, missing_permission()
-    return 200, Publication.objects.all()
+    try:
+        return 200, paginate_queryset(
+            Publication.objects.with_general_item_info(),
+            _PUBLICATION_ORDERING,
+            cursor,
+            limit
+        )
+    except InvalidCursor:
+        return 400, bad_parameters()
 
 
 @router.get(
@@ -77,13 +126,13 @@ def show_publications(request):
     auth=django_auth
 )
 def show_publications_user(request, user_id: int):
-    user = get_user_model().objects.get(pk=request.user.id)
+    user = get_principal(request)
     perm_1 = user.has_perm('publications.can_allow')
     perm_2 = user.has_perm('publications.can_create')
     perm_3 = (int(request.user.id) == int(user_id))
     if not (perm_1 or (perm_2 and perm_3)):
         return 403, missing_permission()
-    publications = Publication.objects.filter(
+    publications = Publication.objects.with_general_item_info().filter(
         seller=user_id,
         is_active=True
     )
@@ -94,12 +143,76 @@ def show_publications_user(request, user_id: int):
 
 @router.get(
     "/active",
+    response={
+        200: SuccinctPublicationPageSchema,
+        400: ErrorOut
+    }
+)
+@conditional(active_publications_etag)
+def show_active_publications(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    def active_publications_page() -> dict:
+        return SuccinctPublicationPageSchema.parse_obj(
+            paginate_queryset(
+                Publication.objects.with_general_item_info().filter(
+                    is_active=True
+                ),
+                ACTIVE_PUBLICATIONS_ORDERING,
+                cursor,
+                limit
+            )
+        ).dict(by_alias=True)
+
+    try:
+        return 200, cached(
+            'active_publications',
+            (request_etag(request), cursor, page_limit(limit)),
+            [ACTIVE_PUBLICATIONS_VERSION],
+            active_publications_page
+        )
+    except InvalidCursor:
+        return 400, bad_parameters()
+
+
+@router.get(
+    "/filter",
+    response={
+        200: FilteredPublicationPageSchema,
+        400: ErrorOut
+    }
+)
+def filter_active_publications(
+    request,
+    filters: PublicationFilterSchema = Query(...),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    filters = filters.dict()
+    if not valid_filters(filters):
+        return 400, bad_parameters()
+    try:
+        page = paginate_queryset(
+            filter_publications(filters),
+            _PUBLICATION_ORDERING,
+            cursor,
+            limit
+        )
+    except InvalidCursor:
+        return 400, bad_parameters()
+    return 200, page | {'facets': count_facets(filters)}
+
+
+@router.get(
+    "/search",
     response={
         200: list[SuccinctPublicationSchema]
     }
 )
-def show_active_publications(request):
-    return 200, Publication.objects.filter(is_active=True)
+def search_publications(request, q: str, limit: Optional[int] = None):
+    return 200, search_active_publications(q, page_limit(limit))
 
 
 @router.get(
@@ -111,10 +224,12 @@ def show_active_publications(request):
     auth=django_auth
 )
 def show_inactive_publications(request):
-    user = get_user_model().objects.get(pk=request.user.id)
+    user = get_principal(request)
     if not user.has_perm('publications.can_allow'):
         return 403, missing_permission()
-    return 200, Publication.objects.filter(is_accepted=False)
+    return 200, Publication.objects.with_general_item_info().filter(
+        is_accepted=False
+    )
 
 
 @router.get(
@@ -124,14 +239,54 @@ def show_inactive_publications(request):
         404: ErrorOut
     }
 )
+@conditional(publication_etag)
 def show_specific_publication(request, publication_id: int):
-    publication_search = Publication.objects.filter(
+    def active_publication() -> Optional[dict]:
+        publication_search = Publication.objects.with_details().filter(
+            id=publication_id,
+            is_active=True
+        ).first()
+        if publication_search is None:
+            return None
+        return PublicationSchema.from_orm(
+            publication_search
+        ).dict(by_alias=True)
+
+    publication = cached(
+        'publication',
+        (request_etag(request), publication_id),
+        [publication_version(publication_id)],
+        active_publication
+    )
+    if publication is None:
+        return 404, not_found("Publication")
+    return 200, publication
+
+
+@router.get(
+    '/{publication_id}/related',
+    response={
+        200: list[SuccinctPublicationSchema],
+        404: ErrorOut
+    }
+)
+def show_related_publications(
+    request,
+    publication_id: int,
+    limit: Optional[int] = None
+):
+    # Customers who bought this publication also bought these, or else
+    # the publications most alike
+    related = suggest_related_publications(
+        publication_id,
+        page_limit(limit)
+    )
+    if not related and not Publication.objects.filter(
         id=publication_id,
         is_active=True
-    ).first()
-    if publication_search is None:
+    ).exists():
         return 404, not_found("Publication")
-    return 200, publication_search
+    return 200, related
 
 
 @router.get(
@@ -143,7 +298,7 @@ def show_specific_publication(request, publication_id: int):
     auth=django_auth
 )
 def show_specific_publication_as_admin(request, publication_id: int):
-    publication_search = Publication.objects.filter(
+    publication_search = Publication.objects.with_details().filter(
         id=publication_id
     ).first()
     if publication_search is None:
@@ -167,7 +322,7 @@ def create_publication(
     files: list[UploadedFile] = File(...)
 ):
     # Validate permissions
-    user = get_user_model().objects.get(pk=request.user.id)
+    user = get_principal(request)
     if not user.has_perm('publications.can_create'):
         return 403, missing_permission()
     # Validate publication info
@@ -175,7 +330,12 @@ def create_publication(
     if error_or_none is not None:
         return code, error_or_none
     # Validate publication items
-    code, error_or_none = validate_publication_items(user.id, body.dict())
+    items_by_sku = get_items_by_sku(body.dict())
+    code, error_or_none = validate_publication_items(
+        user.id,
+        body.dict(),
+        items_by_sku
+    )
     if error_or_none is not None:
         return code, error_or_none
     # Validate publication
@@ -189,18 +349,29 @@ def create_publication(
         error_mesage = 'Only upload 5 or less images of at most 10MB each' \
             + ' with extenstion "jpeg", "jpg" or "png".'
         return 400, {'message': error_mesage}
-    # Generate publication
-    publication = Publication.objects.create(
-        seller=user,
-        price=body.price,
-        description=body.description,
-        publish_date=date.today()
-    )
-    # Generate publication items
-    generate_items(publication, body.dict())
+    with transaction.atomic():
+        # Generate publication
+        publication = Publication.objects.create(
+            seller_id=user.id,
+            price=body.price,
+            description=body.description,
+            publish_date=date.today()
+        )
+        # Generate publication items, the publication is dropped if an
+        # item created meanwhile conflicts with the form
+        code, error_or_none = generate_items(
+            publication,
+            body.dict(),
+            items_by_sku
+        )
+        if error_or_none is not None:
+            transaction.set_rollback(True)
+            return code, error_or_none
+    update_search_vectors([publication.id])
+    invalidate_brands()
     # Upload images
     upload_publication_images(publication, files)
-    return 201, publication
+    return 201, Publication.objects.with_details().get(pk=publication.id)
 
 
 @router.post(
@@ -209,7 +380,8 @@ def create_publication(
         200: PublicationSchema,
         400: ErrorsOut,
         403: ErrorOut,
-        404: ErrorOut
+        404: ErrorOut,
+        409: ItemConflictErrorSchema
     },
     auth=django_auth
 )
@@ -219,7 +391,7 @@ def add_publication_item(
     body: PublicationItemAddSchema
 ):
     # Validate permissions
-    user = get_user_model().objects.get(pk=request.user.id)
+    user = get_principal(request)
     if not user.has_perm('publications.can_create'):
         return 403, missing_permission()
     # Validate publication
@@ -239,12 +411,26 @@ def add_publication_item(
         'publication_items': body.dict()['publication_items']
     }
     # Validate publication items
-    code, error_or_none = validate_publication_items(user.id, publication_info)
+    items_by_sku = get_items_by_sku(publication_info)
+    code, error_or_none = validate_publication_items(
+        user.id,
+        publication_info,
+        items_by_sku
+    )
     if error_or_none is not None:
         return code, error_or_none
     # Generate new items
-    generate_items(publication, publication_info)
-    return 200, publication
+    code, error_or_none = generate_items(
+        publication,
+        publication_info,
+        items_by_sku
+    )
+    if error_or_none is not None:
+        return code, error_or_none
+    update_search_vectors([publication.id])
+    mark_content_changed([publication.id])
+    invalidate_publications([publication.id])
+    return 200, Publication.objects.with_details().get(pk=publication.id)
 
 
 @router.patch(
@@ -259,7 +445,7 @@ def add_publication_item(
 )
 def update_publication(request, pub_id: int, body: PublicationUpdateSchema):
     # Validate permission
-    user = get_user_model().objects.get(pk=request.user.id)
+    user = get_principal(request)
     if not user.has_perm('publications.can_update'):
         return 403, missing_permission()
     # Query publication
@@ -284,6 +470,9 @@ def update_publication(request, pub_id: int, body: PublicationUpdateSchema):
     )
     if publication_form.is_valid():
         publication_form.save()
+        update_search_vectors([publication.id])
+        mark_content_changed([publication.id])
+        invalidate_publications([publication.id])
         publication.refresh_from_db()
         return 200, publication
     return 400, {'errors': dict(publication_form.errors)}
@@ -305,7 +494,7 @@ def update_publication_item(
     body: PublicationItemUpdateSchema
 ):
     # Validate permission
-    user = get_user_model().objects.get(pk=request.user.id)
+    user = get_principal(request)
     if not user.has_perm('publications.can_update'):
         return 403, missing_permission()
     # Query publication
@@ -320,6 +509,7 @@ def update_publication_item(
     if body.amount > publication_item.reserved:
         publication_item.amount = body.amount
         publication_item.save()
+        invalidate_publications([publication_item.publication_id])
         return 200, publication_item
     return 400, {
         'message': 'Existen reservas superiores a la cantidad entregada.'
@@ -344,13 +534,16 @@ def remove_publication(request, publication_id: int):
         return 404, not_found('Publication')
     publication = publication_query.get()
 
-    is_admin = request.user.has_perm('publications.can_allow')
-    is_owner = publication.seller.id == request.user.id
+    user = get_principal(request)
+    is_admin = user.has_perm('publications.can_allow')
+    is_owner = publication.seller_id == user.id
     if not (is_admin or is_owner):
         return 403, missing_permission()
 
     publication.is_active = False
     publication.save()
+    mark_content_changed([publication.id])
+    invalidate_publications([publication.id])
     return 204, None
 
 
@@ -364,7 +557,7 @@ def remove_publication(request, publication_id: int):
     auth=django_auth
 )
 def accept_publication(request, publication_id: int):
-    if not request.user.has_perm('publications.can_allow'):
+    if not get_principal(request).has_perm('publications.can_allow'):
         return 403, missing_permission()
     publication_query = Publication.objects.filter(
         id=publication_id,
@@ -375,6 +568,8 @@ def accept_publication(request, publication_id: int):
         publication.is_active = True
         publication.is_accepted = True
         publication.save()
+        mark_content_changed([publication.id])
+        invalidate_publications([publication.id])
         return 200, publication
     return 404, not_found('Publication')
 
@@ -389,7 +584,7 @@ def accept_publication(request, publication_id: int):
     auth=django_auth
 )
 def reject_publication(request, publication_id: int):
-    if not request.user.has_perm('publications.can_allow'):
+    if not get_principal(request).has_perm('publications.can_allow'):
         return 403, missing_permission()
 
     publication_query = Publication.objects.filter(
@@ -398,20 +593,27 @@ def reject_publication(request, publication_id: int):
     )
     if publication_query.exists():
         publication = publication_query.get()
-        send_publication_rejection_email(publication, request)
-        pub_item_id_and_item_tuples = [
-            (pub_item.id, pub_item.item)
-            for pub_item in publication.publication_items.all()
-        ]
-        publication.delete()
-        for pub_item_id, item in pub_item_id_and_item_tuples:
-            if not item.referenced_by_others(pub_item_id):
-                item.delete()
+        with transaction.atomic():
+            send_publication_rejection_email(publication, request)
+            pub_item_id_and_item_tuples = [
+                (pub_item.id, pub_item.item)
+                for pub_item in publication.publication_items.all()
+            ]
+            invalidate_publications([publication.id])
+            invalidate_brands()
+            publication.delete()
+            for pub_item_id, item in pub_item_id_and_item_tuples:
+                if not item.referenced_by_others(pub_item_id):
+                    item.delete()
         return 204, None
     return 404, not_found('Publication')
 
 
 @router.get("/existing_brands", response={200: list[str]})
 def show_brands(request):
-    brands = Item.objects.values('brand').distinct()
-    return 200, [brand['brand'] for brand in brands]
+    def brands() -> list[str]:
+        return list(
+            Item.objects.values_list('brand', flat=True).distinct()
+        )
+
+    return 200, cached('brands', (), [BRANDS_VERSION], brands)
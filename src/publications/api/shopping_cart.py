@@ -1,5 +1,4 @@
 from ninja import Router
-from django.contrib.auth import get_user_model
 from ninja.security import django_auth
 from publications.models import PublicationItem, ShoppingCartPointer
 from publications.schema import (
@@ -16,6 +15,18 @@ from utilities.errors import (
 router = Router()
 
 
+def cart_details(cart_owner_id: int):
+    # Load what ShoppingCartDetailSchema renders for every item at once
+    return ShoppingCartPointer.objects.filter(
+        cart_owner_id=cart_owner_id
+    ).select_related(
+        'publication_item__item__category',
+        'publication_item__publication'
+    ).prefetch_related(
+        'publication_item__publication__photos'
+    ).order_by('id')
+
+
 @router.post(
     '/add_to_cart/{publication_item_id}',
     response={
@@ -27,7 +38,6 @@ router = Router()
     auth=django_auth
 )
 def add_to_cart(request, publication_item_id: int, body: ShoppingCartSchema):
-    user = get_user_model().objects.get(pk=request.user.id)
     publication_item_query = PublicationItem.objects.filter(
         id=publication_item_id
     )
@@ -37,12 +47,12 @@ def add_to_cart(request, publication_item_id: int, body: ShoppingCartSchema):
 
     publication_item = publication_item_query.get()
     exist_in_cart = ShoppingCartPointer.objects.filter(
-        cart_owner=user, publication_item=publication_item
+        cart_owner_id=request.user.id, publication_item=publication_item
     )
     if exist_in_cart:
         if publication_item.publication.is_active:
             ShoppingCartPointer.objects.filter(
-                cart_owner=user,
+                cart_owner_id=request.user.id,
                 publication_item=publication_item
             ).update(amount=body.dict()["amount"])
             return 200, None
@@ -51,7 +61,7 @@ def add_to_cart(request, publication_item_id: int, body: ShoppingCartSchema):
     else:
         if publication_item.publication.is_active:
             shopping_cart = ShoppingCartPointer(
-                cart_owner=user,
+                cart_owner_id=request.user.id,
                 publication_item=publication_item,
                 amount=body.dict()["amount"]
             )
@@ -70,7 +80,6 @@ def add_to_cart(request, publication_item_id: int, body: ShoppingCartSchema):
     auth=django_auth
 )
 def remove_from_cart(request, publication_item_id: int):
-    user = get_user_model().objects.get(pk=request.user.id)
     publication_item_query = PublicationItem.objects.filter(
         id=publication_item_id
     )
@@ -78,7 +87,7 @@ def remove_from_cart(request, publication_item_id: int):
         return 404, not_found('Publication item')
     publication_item = publication_item_query.get()
     shopping_cart_query = ShoppingCartPointer.objects.filter(
-        cart_owner=user,
+        cart_owner_id=request.user.id,
         publication_item=publication_item
     )
     if shopping_cart_query.exists():
@@ -96,8 +105,9 @@ def remove_from_cart(request, publication_item_id: int):
     auth=django_auth
 )
 def remove_all_cart_from_active_user(request):
-    user = get_user_model().objects.get(pk=request.user.id)
-    in_cart = ShoppingCartPointer.objects.filter(cart_owner=user).all()
+    in_cart = ShoppingCartPointer.objects.filter(
+        cart_owner_id=request.user.id
+    )
     for pub in in_cart:
         pub.delete()
     return 200, None
@@ -109,8 +119,7 @@ def remove_all_cart_from_active_user(request):
     auth=django_auth
 )
 def show_shopping_cart_user(request):
-    user = get_user_model().objects.get(pk=request.user.id)
-    return ShoppingCartPointer.objects.filter(cart_owner=user.id)
+    return cart_details(request.user.id)
 
 
 @router.get(
@@ -126,4 +135,4 @@ def show_shopping_cart_from_specific_user(request, user_id: int):
     # Por mientras por seguridad solo ver propio carrito (JT).
     if user_id != request.user.id:
         return 403, {'message': 'Solo es posible ver tu propio carrito.'}
-    return ShoppingCartPointer.objects.filter(cart_owner=user_id)
+    return cart_details(user_id)
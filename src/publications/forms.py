@@ -5,14 +5,22 @@ from publications.models import Publication, Item, Category
 class ItemCreationForm(ModelForm):
     category_id = IntegerField()
 
+    def __init__(self, *args, category_ids=None, **kwargs):
+        # Ids of the categories known to exist, spares a query per form
+        self.category_ids = category_ids
+        super().__init__(*args, **kwargs)
+
     class Meta:
         model = Item
         fields = ('name', 'brand', 'size', 'color', 'sku')
 
     def clean_cateogry_id(self):
         category_id = self.cleaned_data['category_id']
-        category_query = Category.objects.filter(id=category_id)
-        if not category_query.exists():
+        if self.category_ids is not None:
+            category_exists = category_id in self.category_ids
+        else:
+            category_exists = Category.objects.filter(id=category_id).exists()
+        if not category_exists:
             self.add_error(
                 'category_id',
                 'Category not found.'
@@ -23,6 +31,11 @@ class ItemCreationForm(ModelForm):
         super().clean()
         self.clean_cateogry_id()
 
+    def validate_unique(self):
+        # Existing skus are reused instead of recreated, the validation
+        # helpers check them against their items all at once.
+        pass
+
     def save(self, commit=True):
         item = super(ItemCreationForm, self).save(commit=False)
         # lower case baby
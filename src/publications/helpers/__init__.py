@@ -0,0 +1,8 @@
+from publications.models import Item
+
+
+def get_items_by_sku(publication_info: dict) -> dict[int, Item]:
+    # Fetch every existing item of the request at once, validation and
+    # generation both look items up in this index instead of the database.
+    sku_set = {item['sku'] for item in publication_info['publication_items']}
+    return {item.sku: item for item in Item.objects.filter(sku__in=sku_set)}
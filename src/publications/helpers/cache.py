@@ -0,0 +1,81 @@
+from publications.models import Publication, PublicationItem
+from utilities.cache import bump_versions
+from utilities.etag import make_etag
+from utilities.pagination import InvalidCursor, page_limit, page_queryset
+from typing import Iterable, Optional
+
+
+# Versions of the cached public catalogue. The listing of active
+# publications depends on every publication, the detail of a publication
+# only on its own version.
+ACTIVE_PUBLICATIONS_VERSION = 'publications'
+BRANDS_VERSION = 'brands'
+CATEGORIES_VERSION = 'categories'
+
+
+def publication_version(publication_id: int) -> str:
+    return f'publication:{publication_id}'
+
+
+def invalidate_publications(publication_ids: Iterable[int]) -> None:
+    bump_versions(
+        ACTIVE_PUBLICATIONS_VERSION,
+        *(publication_version(pub_id) for pub_id in set(publication_ids))
+    )
+
+
+def invalidate_publication_items(pub_item_ids: Iterable[int]) -> None:
+    invalidate_publications(
+        PublicationItem.objects.filter(
+            id__in=pub_item_ids
+        ).values_list('publication_id', flat=True)
+    )
+
+
+def invalidate_brands() -> None:
+    bump_versions(BRANDS_VERSION)
+
+
+def invalidate_categories() -> None:
+    bump_versions(CATEGORIES_VERSION)
+
+
+# Ordering of the listing of active publications
+ACTIVE_PUBLICATIONS_ORDERING = ('-publish_date', '-id')
+
+
+# Cached bodies are keyed by their ETag as well, so they can never be
+# served with the ETag of other rows.
+def active_publications_etag(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Optional[str]:
+    # Like publication_etag it comes from the rows, those of the page
+    # only, so stock taken by the workers, whose cache versions other
+    # processes may not see, changes it too
+    try:
+        page = page_queryset(
+            Publication.objects.filter(is_active=True),
+            ACTIVE_PUBLICATIONS_ORDERING,
+            cursor,
+            limit
+        )
+    except InvalidCursor:
+        # The view answers it
+        return None
+    version = Publication.objects.filter(
+        id__in=page.values('id')
+    ).content_version()
+    return make_etag(version, cursor, page_limit(limit))
+
+
+def publication_etag(publication_id: int) -> Optional[str]:
+    # A single publication is cheap to read, its ETag comes from the rows
+    # themselves so writes that skip the invalidation above change it too
+    version = Publication.objects.filter(
+        id=publication_id,
+        is_active=True
+    ).content_version()
+    if version['publications'] == 0:
+        return None
+    return make_etag(version, publication_id)
@@ -0,0 +1,108 @@
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q, QuerySet
+from publications.models import (
+    _SIZE_IDENTITY_CLASSES,
+    Publication,
+    PublicationItem
+)
+
+
+# Facet columns and the key their counts are returned under
+_FACETS = {
+    'category_id': 'categories',
+    'brand': 'brands',
+    'size_class': 'size_classes',
+    'color': 'colors'
+}
+
+
+def _price_filter(filters: dict, prefix: str = '') -> Q:
+    price_filter = Q()
+    if filters['min_price'] is not None:
+        price_filter &= Q(**{f'{prefix}price__gte': filters['min_price']})
+    if filters['max_price'] is not None:
+        price_filter &= Q(**{f'{prefix}price__lte': filters['max_price']})
+    return price_filter
+
+
+def valid_filters(filters: dict) -> bool:
+    return filters['size_class'] is None \
+        or filters['size_class'] in _SIZE_IDENTITY_CLASSES
+
+
+def filter_publication_items(filters: dict) -> QuerySet:
+    # A publication matches when a single one of its items matches every
+    # item filter. Item brands and colors are stored lowercased.
+    publication_items = PublicationItem.objects.filter(
+        _price_filter(filters, 'publication__'),
+        publication__is_active=True
+    )
+    if filters['category'] is not None:
+        publication_items = publication_items.filter(
+            item__category_id=filters['category']
+        )
+    if filters['brand'] is not None:
+        publication_items = publication_items.filter(
+            item__brand=filters['brand'].lower()
+        )
+    if filters['size_class'] is not None:
+        publication_items = publication_items.filter(
+            item__size_class=filters['size_class']
+        )
+    if filters['color'] is not None:
+        publication_items = publication_items.filter(
+            item__color=filters['color'].lower()
+        )
+    if filters['in_stock']:
+        publication_items = publication_items.filter(
+            amount__gt=F('reserved')
+        )
+    return publication_items
+
+
+def filter_publications(filters: dict) -> QuerySet:
+    # Filter the publication columns directly as well, so the planner can
+    # use the (is_active, price) index before probing the items.
+    return Publication.objects.with_general_item_info().filter(
+        _price_filter(filters),
+        Exists(
+            filter_publication_items(filters).filter(
+                publication=OuterRef('pk')
+            )
+        ),
+        is_active=True
+    )
+
+
+def count_facets(filters: dict) -> dict[str, list[dict]]:
+    # Count the matching publications for every facet value with one
+    # GROUPING SETS query, the GROUPING() flags tell the sets apart since
+    # the facet columns may hold nulls themselves.
+    matches_sql, params = filter_publication_items(filters).values(
+        'publication_id',
+        category_id=F('item__category_id'),
+        brand=F('item__brand'),
+        size_class=F('item__size_class'),
+        color=F('item__color')
+    ).query.sql_with_params()
+    columns = ', '.join(_FACETS)
+    groupings = ', '.join(f'GROUPING({facet})' for facet in _FACETS)
+    grouping_sets = ', '.join(f'({facet})' for facet in _FACETS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {columns}, {groupings}, '
+            'COUNT(DISTINCT publication_id) AS count '
+            f'FROM ({matches_sql}) AS matches '
+            f'GROUP BY GROUPING SETS ({grouping_sets}) '
+            f'ORDER BY count DESC, {columns}',
+            params
+        )
+        rows = cursor.fetchall()
+    facets = {key: [] for key in _FACETS.values()}
+    for row in rows:
+        values = row[:len(_FACETS)]
+        flags = row[len(_FACETS):-1]
+        for key, value, not_grouped in zip(_FACETS.values(), values, flags):
+            if not not_grouped and value is not None:
+                facets[key].append({'value': value, 'count': row[-1]})
+    return facets
@@ -5,8 +5,10 @@ from publications.models import (
     PublicationItem,
     PublicationPhoto,
     Item,
-    Category
+    Category,
+    item_size_class
 )
+from publications.helpers.validation import check_for_item_conflict
 from utilities.models import get_latest_id
 from typing import Union
 from os import path
@@ -65,42 +67,54 @@ def upload_category_image(
 def generate_items(
     publication: Publication,
     publication_info: dict,
-) -> None:
-    # Extract information from pub_items
-    sku_set = {item['sku'] for item in publication_info['publication_items']}
-    item_query = Item.objects.filter(sku__in=sku_set)
-    category_query = Category.objects.filter(
-        pk=publication_info['item_category_id']
-    )
-    # Store items to be created to make use of bulk_create
-    items_to_create = []
-    publication_items_to_create = []
-    for pub_item in publication_info['publication_items']:
-        item_query_by_sku = item_query.filter(sku=pub_item['sku'])
-        if item_query_by_sku.exists():
-            item = item_query_by_sku.get()
-        else:
-            item = Item(
-                name=publication_info['item_name'].lower(),
-                brand=publication_info['item_brand'].lower(),
-                category=category_query.get(
-                    pk=publication_info['item_category_id']
-                ),
-                size=pub_item['size'].lower(),
-                color=pub_item['color'].lower(),
-                sku=pub_item['sku']
-            )
-            items_to_create.append(item)
-        publication_items_to_create.append(
-            PublicationItem(
-                item=item,
-                publication=publication,
-                amount=pub_item['amount']
-            )
+    items_by_sku: dict[int, Item]
+) -> tuple[int, Union[dict, None]]:
+    # Store items to be created to make use of bulk_create, which skips
+    # Item.save so the size class is set here
+    items_to_create = [
+        Item(
+            name=publication_info['item_name'].lower(),
+            brand=publication_info['item_brand'].lower(),
+            category_id=publication_info['item_category_id'],
+            size=pub_item['size'].lower(),
+            size_class=item_size_class(pub_item['size']),
+            color=pub_item['color'].lower(),
+            sku=pub_item['sku']
         )
+        for pub_item in publication_info['publication_items']
+        if pub_item['sku'] not in items_by_sku
+    ]
     if len(items_to_create) > 0:
-        Item.objects.bulk_create(items_to_create, len(items_to_create))
+        # Another request may have created some of these skus meanwhile,
+        # keep its items and read back the ids of every new sku.
+        Item.objects.bulk_create(
+            items_to_create,
+            len(items_to_create),
+            ignore_conflicts=True
+        )
+        items_by_sku = items_by_sku | {
+            item.sku: item
+            for item in Item.objects.filter(
+                sku__in=[item.sku for item in items_to_create]
+            )
+        }
+        # Those items must match the form as much as the validated ones
+        conflict_found, conflict_list = check_for_item_conflict(
+            publication_info,
+            items_by_sku
+        )
+        if conflict_found:
+            return 409, {'conflicts': conflict_list}
+    publication_items_to_create = [
+        PublicationItem(
+            item=items_by_sku[pub_item['sku']],
+            publication=publication,
+            amount=pub_item['amount']
+        )
+        for pub_item in publication_info['publication_items']
+    ]
     PublicationItem.objects.bulk_create(
         publication_items_to_create,
         len(publication_items_to_create)
     )
+    return 1, None
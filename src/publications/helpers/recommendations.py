@@ -0,0 +1,290 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+from publications.models import (
+    Publication,
+    PublicationItem,
+    UserRecommendation
+)
+from transactions.models import Transaction, TransactionPointer
+from utilities.bulk import copy_rows
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable
+import heapq
+
+
+# Weights of what a candidate publication is scored on
+_CATEGORY_WEIGHT = 0.4
+_SIZE_WEIGHT = 0.25
+_PRICE_WEIGHT = 0.25
+_RECENCY_WEIGHT = 0.1
+# Purchases lose half their weight every _PURCHASE_HALF_LIFE days, new
+# publications half their freshness every _PUBLICATION_HALF_LIFE days
+_PURCHASE_HALF_LIFE = 90
+_PUBLICATION_HALF_LIFE = 30
+# Candidates are priced within half the average paid, either way
+_PRICE_BAND = 0.5
+# Most recent publications in stock considered per category
+_CANDIDATES_PER_CATEGORY = 300
+_COPY_BATCH_SIZE = 2000
+# Size class of items without a size, or without a known one
+_NO_SIZE = ''
+
+
+@dataclass
+class Candidate:
+    publication_id: int
+    price: float
+    freshness: float
+    size_classes: frozenset[str] = frozenset()
+
+
+@dataclass
+class CategoryCandidates:
+    # Sorted by price, so the price band is found by bisection
+    prices: list[float]
+    candidates: list[Candidate]
+
+    @classmethod
+    def by_price(cls, candidates: Iterable[Candidate]):
+        ordered = sorted(candidates, key=lambda candidate: candidate.price)
+        return cls([candidate.price for candidate in ordered], ordered)
+
+    def priced_between(self, low: float, high: float) -> list[Candidate]:
+        return self.candidates[
+            bisect_left(self.prices, low):bisect_right(self.prices, high)
+        ]
+
+
+@dataclass
+class BuyerProfile:
+    # Share of the weighted purchases of each category and size class
+    categories: dict[int, float]
+    size_classes: dict[str, float]
+    average_price: float
+
+
+@dataclass
+class RefreshResult:
+    buyers: int = 0
+    recommendations: int = 0
+
+
+def _half_life_weight(age_days: float, half_life: float) -> float:
+    return 0.5 ** (max(age_days, 0) / half_life)
+
+
+def load_candidates(today: date) -> dict[int, CategoryCandidates]:
+    # One pass over the items in stock, newest publications first, keeping
+    # the first _CANDIDATES_PER_CATEGORY publications of each category.
+    candidates: dict[int, dict[int, Candidate]] = defaultdict(dict)
+    pub_items = PublicationItem.objects.filter(
+        publication__is_active=True,
+        amount__gt=F('reserved'),
+        item__category__isnull=False
+    ).order_by(
+        '-publication__publish_date',
+        '-publication_id'
+    ).values_list(
+        'publication_id',
+        'item__category_id',
+        'item__size_class',
+        'publication__price',
+        'publication__publish_date'
+    )
+    for pub_id, category_id, size_class, price, publish_date in \
+            pub_items.iterator(chunk_size=2000):
+        category = candidates[category_id]
+        candidate = category.get(pub_id)
+        if candidate is None:
+            if len(category) >= _CANDIDATES_PER_CATEGORY:
+                continue
+            candidate = category[pub_id] = Candidate(
+                pub_id,
+                price,
+                _half_life_weight(
+                    (today - publish_date).days,
+                    _PUBLICATION_HALF_LIFE
+                )
+            )
+        candidate.size_classes |= {size_class or _NO_SIZE}
+    return {
+        category_id: CategoryCandidates.by_price(category.values())
+        for category_id, category in candidates.items()
+    }
+
+
+def _normalized(weights: dict) -> dict:
+    total = sum(weights.values())
+    return {key: weight / total for key, weight in weights.items()}
+
+
+def load_profiles(
+    buyer_ids: list[int],
+    refreshed_at: datetime
+) -> dict[int, BuyerProfile]:
+    # Every purchase counts, weighted by how recent it is
+    purchases = defaultdict(list)
+    for buyer_id, category_id, size_class, price, created_at in \
+            TransactionPointer.objects.filter(
+                transaction__buyer_id__in=buyer_ids
+            ).values_list(
+                'transaction__buyer_id',
+                'publication_item__item__category_id',
+                'publication_item__item__size_class',
+                'price_per_unit',
+                'transaction__created_at'
+            ).iterator(chunk_size=2000):
+        age_days = (refreshed_at - created_at).total_seconds() / 86400
+        purchases[buyer_id].append((
+            category_id,
+            size_class or _NO_SIZE,
+            price,
+            _half_life_weight(age_days, _PURCHASE_HALF_LIFE)
+        ))
+    profiles = {}
+    for buyer_id, buyer_purchases in purchases.items():
+        categories = defaultdict(float)
+        size_classes = defaultdict(float)
+        for category_id, item_size_class, _, weight in buyer_purchases:
+            if category_id is not None:
+                categories[category_id] += weight
+            size_classes[item_size_class] += weight
+        total_weight = sum(purchase[3] for purchase in buyer_purchases)
+        if not categories or total_weight == 0:
+            continue
+        profiles[buyer_id] = BuyerProfile(
+            _normalized(categories),
+            _normalized(size_classes),
+            sum(
+                price * weight for _, _, price, weight in buyer_purchases
+            ) / total_weight
+        )
+    return profiles
+
+
+def score_candidates(
+    profile: BuyerProfile,
+    candidates: dict[int, CategoryCandidates],
+    amount: int
+) -> list[tuple[int, float]]:
+    average_price = profile.average_price
+    band = average_price * _PRICE_BAND
+    size_scores = profile.size_classes
+    size_cache: dict[frozenset[str], float] = {}
+    scores = {}
+    for category_id, affinity in profile.categories.items():
+        category = candidates.get(category_id)
+        if category is None:
+            continue
+        category_score = _CATEGORY_WEIGHT * affinity
+        for candidate in category.priced_between(
+            average_price - band,
+            average_price + band
+        ):
+            price_score = 1 - abs(candidate.price - average_price) / band \
+                if band > 0 else 1
+            # Candidates share a handful of size class combinations
+            size_score = size_cache.get(candidate.size_classes)
+            if size_score is None:
+                size_score = size_cache[candidate.size_classes] = max(
+                    (
+                        size_scores.get(item_size_class, 0)
+                        for item_size_class in candidate.size_classes
+                    ),
+                    default=0
+                )
+            score = category_score \
+                + _SIZE_WEIGHT * size_score \
+                + _PRICE_WEIGHT * price_score \
+                + _RECENCY_WEIGHT * candidate.freshness
+            publication_id = candidate.publication_id
+            if score > scores.get(publication_id, -1):
+                scores[publication_id] = score
+    # Ties go to the oldest publication, so results are stable
+    return heapq.nlargest(
+        amount,
+        scores.items(),
+        key=lambda pub_score: (pub_score[1], -pub_score[0])
+    )
+
+
+def _buyer_batches(batch_size: int) -> Iterable[list[int]]:
+    # Active users with at least one purchase, by id
+    last_id = 0
+    while True:
+        batch = list(
+            Transaction.objects.filter(
+                buyer__is_active=True,
+                buyer_id__gt=last_id
+            ).order_by('buyer_id').values_list(
+                'buyer_id',
+                flat=True
+            ).distinct()[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def refresh_recommendations(
+    batch_size: int,
+    per_user: int
+) -> RefreshResult:
+    refreshed_at = now()
+    candidates = load_candidates(refreshed_at.date())
+    result = RefreshResult()
+    for buyer_ids in _buyer_batches(batch_size):
+        recommendations = [
+            (buyer_id, publication_id, score, refreshed_at)
+            for buyer_id, profile in load_profiles(
+                buyer_ids,
+                refreshed_at
+            ).items()
+            for publication_id, score in score_candidates(
+                profile,
+                candidates,
+                per_user
+            )
+        ]
+        # Readers see either the previous or the new recommendations
+        with transaction.atomic():
+            UserRecommendation.objects.filter(user_id__in=buyer_ids).delete()
+            copy_rows(
+                UserRecommendation,
+                ['user', 'publication', 'score', 'computed_at'],
+                recommendations,
+                _COPY_BATCH_SIZE
+            )
+        result.buyers += len(buyer_ids)
+        result.recommendations += len(recommendations)
+    # Users that are gone or inactive since the last refresh
+    UserRecommendation.objects.filter(
+        computed_at__lt=refreshed_at
+    ).delete()
+    return result
+
+
+def get_user_recommendations(
+    user_id: int,
+    amount: int
+) -> list[Publication]:
+    recommendations = list(
+        Publication.objects.with_general_item_info().filter(
+            recommendations__user_id=user_id,
+            is_active=True
+        ).order_by('-recommendations__score', 'id')[:amount]
+    )
+    if recommendations:
+        return recommendations
+    # Users without purchases, or not refreshed yet, get the newest
+    # publications
+    return list(
+        Publication.objects.with_general_item_info().filter(
+            is_active=True
+        ).order_by('-publish_date', '-id')[:amount]
+    )
@@ -0,0 +1,209 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from publications.models import Publication, RelatedPublication
+from transactions.models import (
+    AcountlessTransaction,
+    AcountlessTransactionPointer,
+    Transaction,
+    TransactionPointer
+)
+from utilities.bulk import copy_rows
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Type, Union
+import heapq
+
+
+# Publications bought together are counted from successful sales of both
+# kinds. Only the top neighbours of each publication are stored, sales
+# counted since the last rebuild are merged into them, so a neighbour
+# dropped from the top is counted again from zero. A rebuild counts every
+# sale again.
+_SALES = (
+    (Transaction, TransactionPointer),
+    (AcountlessTransaction, AcountlessTransactionPointer)
+)
+_COPY_BATCH_SIZE = 2000
+
+SaleModel = Union[Type[Transaction], Type[AcountlessTransaction]]
+PointerModel = Union[
+    Type[TransactionPointer],
+    Type[AcountlessTransactionPointer]
+]
+CoPurchases = dict[int, Counter]
+
+
+@dataclass
+class RelatedResult:
+    sales: int = 0
+    publications: int = 0
+
+    def __add__(self, other: 'RelatedResult') -> 'RelatedResult':
+        return RelatedResult(
+            self.sales + other.sales,
+            self.publications + other.publications
+        )
+
+
+def count_co_purchases(
+    pointer_model: PointerModel,
+    sale_ids: list[int]
+) -> CoPurchases:
+    # Sparse publication x publication matrix, as a counter of the
+    # publications bought along with each publication
+    baskets = defaultdict(set)
+    for sale_id, publication_id in pointer_model.objects.filter(
+        transaction_id__in=sale_ids
+    ).values_list('transaction_id', 'publication_item__publication_id'):
+        baskets[sale_id].add(publication_id)
+    co_purchases = defaultdict(Counter)
+    for basket in baskets.values():
+        for publication_id in basket:
+            co_purchases[publication_id].update(basket - {publication_id})
+    return co_purchases
+
+
+def top_related(
+    co_purchases: CoPurchases,
+    per_publication: int
+) -> Iterator[tuple[int, int, int]]:
+    for publication_id, related in co_purchases.items():
+        # Ties go to the oldest publication
+        for related_id, purchases in heapq.nsmallest(
+            per_publication,
+            related.items(),
+            key=lambda related_count: (-related_count[1], related_count[0])
+        ):
+            yield publication_id, related_id, purchases
+
+
+def _replace_related(
+    stored: QuerySet,
+    co_purchases: CoPurchases,
+    per_publication: int
+) -> None:
+    stored.delete()
+    copy_rows(
+        RelatedPublication,
+        ['publication', 'related', 'purchases'],
+        top_related(co_purchases, per_publication),
+        _COPY_BATCH_SIZE
+    )
+
+
+def _unindexed_sale_ids(sale_model: SaleModel, batch_size: int) -> list:
+    return list(
+        sale_model.objects.filter(
+            status='SUCCEDED',
+            related_indexed=False
+        ).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+
+
+def index_new_sales(
+    sale_model: SaleModel,
+    pointer_model: PointerModel,
+    batch_size: int,
+    per_publication: int
+) -> RelatedResult:
+    # A single builder is expected to run at a time
+    with transaction.atomic():
+        sale_ids = _unindexed_sale_ids(sale_model, batch_size)
+        if not sale_ids:
+            return RelatedResult()
+        co_purchases = count_co_purchases(pointer_model, sale_ids)
+        # Merged with the stored neighbours of the same publications
+        stored = RelatedPublication.objects.filter(
+            publication_id__in=list(co_purchases)
+        )
+        for publication_id, related_id, purchases in stored.values_list(
+            'publication_id',
+            'related_id',
+            'purchases'
+        ):
+            co_purchases[publication_id][related_id] += purchases
+        _replace_related(stored, co_purchases, per_publication)
+        sale_model.objects.filter(id__in=sale_ids).update(
+            related_indexed=True
+        )
+    return RelatedResult(len(sale_ids), len(co_purchases))
+
+
+def index_all_new_sales(
+    batch_size: int,
+    per_publication: int
+) -> RelatedResult:
+    result = RelatedResult()
+    for sale_model, pointer_model in _SALES:
+        # Keep going while batches come back full
+        while True:
+            batch_result = index_new_sales(
+                sale_model,
+                pointer_model,
+                batch_size,
+                per_publication
+            )
+            result = result + batch_result
+            if batch_result.sales < batch_size:
+                break
+    return result
+
+
+def _all_sale_ids(sale_model: SaleModel, batch_size: int) -> Iterable[list]:
+    sale_ids = sale_model.objects.filter(
+        status='SUCCEDED'
+    ).order_by('id').values_list('id', flat=True)
+    batch = []
+    for sale_id in sale_ids.iterator(chunk_size=batch_size):
+        batch.append(sale_id)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rebuild_related_publications(
+    batch_size: int,
+    per_publication: int
+) -> RelatedResult:
+    # The whole matrix is counted in memory and replaces the table at once
+    co_purchases = defaultdict(Counter)
+    counted = []
+    for sale_model, pointer_model in _SALES:
+        sale_ids = []
+        for batch in _all_sale_ids(sale_model, batch_size):
+            for publication_id, related in count_co_purchases(
+                pointer_model,
+                batch
+            ).items():
+                co_purchases[publication_id].update(related)
+            sale_ids.extend(batch)
+        counted.append((sale_model, sale_ids))
+    with transaction.atomic():
+        _replace_related(
+            RelatedPublication.objects.all(),
+            co_purchases,
+            per_publication
+        )
+        for sale_model, sale_ids in counted:
+            for start in range(0, len(sale_ids), batch_size):
+                sale_model.objects.filter(
+                    id__in=sale_ids[start:start + batch_size]
+                ).update(related_indexed=True)
+    return RelatedResult(
+        sum(len(sale_ids) for _, sale_ids in counted),
+        len(co_purchases)
+    )
+
+
+def get_related_publications(
+    publication_id: int,
+    amount: int
+) -> list[Publication]:
+    return list(
+        Publication.objects.with_general_item_info().filter(
+            related_to__publication_id=publication_id,
+            is_active=True
+        ).order_by('-related_to__purchases', 'id')[:amount]
+    )
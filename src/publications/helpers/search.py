@@ -0,0 +1,87 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity
+)
+from django.db.models import F, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Greatest
+from publications.models import Item, Publication, PublicationItem
+from typing import Iterable
+
+
+# Item names, brands and descriptions are written in spanish
+SEARCH_CONFIG = 'spanish'
+
+
+def publication_search_vector() -> SearchVector:
+    # Every item of a publication shares its name and brand, so the first
+    # one is enough. Names weigh more than brands, and brands more than
+    # the description.
+    sample_item = PublicationItem.objects.filter(
+        publication=OuterRef('pk')
+    ).order_by('id')
+    return SearchVector(
+        Subquery(sample_item.values('item__name')[:1]),
+        weight='A',
+        config=SEARCH_CONFIG
+    ) + SearchVector(
+        Subquery(sample_item.values('item__brand')[:1]),
+        weight='B',
+        config=SEARCH_CONFIG
+    ) + SearchVector(
+        'description',
+        weight='C',
+        config=SEARCH_CONFIG
+    )
+
+
+def update_search_vectors(publication_ids: Iterable[int]) -> None:
+    Publication.objects.filter(
+        id__in=publication_ids
+    ).update(search_vector=publication_search_vector())
+
+
+def _full_text_matches(publications: QuerySet, text: str) -> QuerySet:
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    return publications.filter(
+        search_vector=query
+    ).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-id')
+
+
+def _trigram_matches(publications: QuerySet, text: str) -> QuerySet:
+    # Typo tolerant fallback, the trigram indexes on item names and brands
+    # narrow down the items before joining them with their publications.
+    similar_items = Item.objects.filter(
+        Q(name__trigram_similar=text) | Q(brand__trigram_similar=text)
+    )
+    best_similarity = similar_items.filter(
+        publication_items__publication=OuterRef('pk')
+    ).annotate(
+        similarity=Greatest(
+            TrigramSimilarity('name', text),
+            TrigramSimilarity('brand', text)
+        )
+    ).order_by('-similarity').values('similarity')[:1]
+    return publications.filter(
+        id__in=PublicationItem.objects.filter(
+            item__in=similar_items
+        ).values('publication_id')
+    ).annotate(
+        similarity=Subquery(best_similarity)
+    ).order_by('-similarity', '-id')
+
+
+def search_active_publications(text: str, limit: int) -> list[Publication]:
+    text = text.strip()
+    if text == '':
+        return []
+    publications = Publication.objects.with_general_item_info().filter(
+        is_active=True
+    )
+    matches = list(_full_text_matches(publications, text)[:limit])
+    if len(matches) > 0:
+        return matches
+    return list(_trigram_matches(publications, text)[:limit])
@@ -0,0 +1,314 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+from publications.models import (
+    Publication,
+    PublicationItem,
+    SimilarPublication
+)
+from utilities.bulk import copy_rows
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+import heapq
+import math
+import re
+
+
+# Publications are compared by the TF-IDF of the words of their item
+# names, their brand, category and size classes, and by their price
+_TEXT_WEIGHT = 0.8
+_PRICE_WEIGHT = 0.2
+# Candidates are the publications sharing a feature, only the newest
+# _CANDIDATES_PER_FEATURE publications of each feature are considered so
+# common features, such as a category, cost the same as rare ones
+_CANDIDATES_PER_FEATURE = 200
+# Best candidates by partial score, per similar publication kept, that
+# are scored exactly
+_RESCORED_PER_RESULT = 2
+_COPY_BATCH_SIZE = 2000
+_WORD = re.compile(r'\w+')
+
+Vector = dict[str, float]
+
+
+@dataclass
+class PublicationFeatures:
+    publication_id: int
+    price: float
+    features: set[str] = field(default_factory=set)
+    # Unit length TF-IDF weights of the features
+    vector: Vector = field(default_factory=dict)
+
+
+@dataclass
+class SimilarResult:
+    publications: int = 0
+    similar: int = 0
+
+
+def item_features(
+    name: str,
+    brand: str,
+    category_id: Optional[int],
+    size_class: Optional[str]
+) -> Iterator[str]:
+    for word in _WORD.findall(name.lower()):
+        yield f'name:{word}'
+    yield f'brand:{brand.lower()}'
+    if category_id is not None:
+        yield f'category:{category_id}'
+    if size_class is not None:
+        yield f'size:{size_class}'
+
+
+def load_features() -> list[PublicationFeatures]:
+    # Active publications, newest first
+    publications: dict[int, PublicationFeatures] = {}
+    pub_items = PublicationItem.objects.filter(
+        publication__is_active=True
+    ).order_by(
+        '-publication__publish_date',
+        '-publication_id'
+    ).values_list(
+        'publication_id',
+        'publication__price',
+        'item__name',
+        'item__brand',
+        'item__category_id',
+        'item__size_class'
+    )
+    for pub_id, price, name, brand, category_id, size_class in \
+            pub_items.iterator(chunk_size=2000):
+        publication = publications.get(pub_id)
+        if publication is None:
+            publication = publications[pub_id] = PublicationFeatures(
+                pub_id,
+                price
+            )
+        publication.features.update(
+            item_features(name, brand, category_id, size_class)
+        )
+    publications = list(publications.values())
+    # Each feature counts once per publication, rarer features weigh more
+    frequencies = defaultdict(int)
+    for publication in publications:
+        for feature in publication.features:
+            frequencies[feature] += 1
+    total = len(publications)
+    for publication in publications:
+        weights = {
+            feature: math.log((1 + total) / (1 + frequencies[feature])) + 1
+            for feature in publication.features
+        }
+        norm = math.sqrt(sum(weight ** 2 for weight in weights.values()))
+        publication.vector = {
+            feature: weight / norm for feature, weight in weights.items()
+        }
+    return publications
+
+
+@dataclass
+class FeatureIndex:
+    publications: dict[int, PublicationFeatures]
+    # Publication ids and weights of the candidates with each feature
+    candidates: dict[str, list[tuple[int, float]]]
+
+    @classmethod
+    def build(cls, publications: list[PublicationFeatures]):
+        candidates = defaultdict(list)
+        for publication in publications:
+            for feature, weight in publication.vector.items():
+                if len(candidates[feature]) < _CANDIDATES_PER_FEATURE:
+                    candidates[feature].append(
+                        (publication.publication_id, weight)
+                    )
+        return cls(
+            {
+                publication.publication_id: publication
+                for publication in publications
+            },
+            candidates
+        )
+
+
+def _price_similarity(price: float, other_price: float) -> float:
+    if max(price, other_price) <= 0:
+        return 1
+    return min(price, other_price) / max(price, other_price)
+
+
+def similarity(
+    publication: PublicationFeatures,
+    other: PublicationFeatures
+) -> float:
+    vector = other.vector
+    cosine = sum(
+        weight * vector.get(feature, 0)
+        for feature, weight in publication.vector.items()
+    )
+    return _TEXT_WEIGHT * cosine \
+        + _PRICE_WEIGHT * _price_similarity(publication.price, other.price)
+
+
+def top_similar(
+    publication: PublicationFeatures,
+    index: FeatureIndex,
+    amount: int
+) -> list[tuple[int, float]]:
+    # Sparse dot products over the candidate lists, then the best of them
+    # scored with every feature and the price
+    partial_scores = defaultdict(float)
+    for feature, weight in publication.vector.items():
+        for candidate_id, candidate_weight in index.candidates.get(
+            feature,
+            ()
+        ):
+            partial_scores[candidate_id] += weight * candidate_weight
+    partial_scores.pop(publication.publication_id, None)
+    best = heapq.nlargest(
+        amount * _RESCORED_PER_RESULT,
+        partial_scores,
+        key=partial_scores.__getitem__
+    )
+    # Ties go to the oldest publication
+    return heapq.nlargest(
+        amount,
+        (
+            (pub_id, similarity(publication, index.publications[pub_id]))
+            for pub_id in best
+        ),
+        key=lambda pub_score: (pub_score[1], -pub_score[0])
+    )
+
+
+def mark_content_changed(publication_ids: Iterable[int]) -> None:
+    # Catalogue edits, not reservations, change which publications are alike
+    Publication.objects.filter(id__in=publication_ids).update(
+        content_updated_at=now()
+    )
+
+
+def _touched_publication_ids(since_last_run: bool) -> set[int]:
+    publications = Publication.objects.filter(is_active=True)
+    if since_last_run:
+        # Never indexed, or changed since
+        publications = publications.filter(
+            Q(similar_indexed_at__isnull=True)
+            | Q(content_updated_at__gt=F('similar_indexed_at'))
+        )
+    return set(publications.values_list('id', flat=True))
+
+
+def _stale_neighbour_ids() -> set[int]:
+    # Publications keeping a similar publication changed after them, or
+    # no longer active
+    return set(
+        SimilarPublication.objects.filter(
+            similar__content_updated_at__gt=F(
+                'publication__similar_indexed_at'
+            ),
+            publication__is_active=True
+        ).values_list('publication_id', flat=True)
+    )
+
+
+def _blocks(
+    publications: Iterable[PublicationFeatures],
+    block_size: int
+) -> Iterator[list[PublicationFeatures]]:
+    block = []
+    for publication in publications:
+        block.append(publication)
+        if len(block) == block_size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def _update_similar(
+    publications: Iterable[PublicationFeatures],
+    index: FeatureIndex,
+    block_size: int,
+    per_publication: int,
+    indexed_at: datetime,
+    result: SimilarResult
+) -> set[int]:
+    # Scored and saved a block at a time, so only a block of results is
+    # held. Returns the ids of the similar publications found.
+    found = set()
+    for block in _blocks(publications, block_size):
+        rows = [
+            (publication.publication_id, similar_id, score)
+            for publication in block
+            for similar_id, score in top_similar(
+                publication,
+                index,
+                per_publication
+            )
+        ]
+        block_ids = [publication.publication_id for publication in block]
+        with transaction.atomic():
+            SimilarPublication.objects.filter(
+                publication_id__in=block_ids
+            ).delete()
+            copy_rows(
+                SimilarPublication,
+                ['publication', 'similar', 'score'],
+                rows,
+                _COPY_BATCH_SIZE
+            )
+            Publication.objects.filter(id__in=block_ids).update(
+                similar_indexed_at=indexed_at
+            )
+        found.update(similar_id for _, similar_id, _ in rows)
+        result.publications += len(block)
+        result.similar += len(rows)
+    return found
+
+
+def build_similar_publications(
+    block_size: int,
+    per_publication: int,
+    rebuild: bool = False
+) -> SimilarResult:
+    # Only publications changed since the last run find their similar
+    # publications again, against every active publication, followed by
+    # their neighbours: the publications keeping a changed one and, as
+    # similarity is symmetric, the ones a changed publication found. The
+    # others keep theirs until a rebuild, which also catches up with the
+    # feature weights drifting as the catalogue grows.
+    indexed_at = now()
+    touched = _touched_publication_ids(not rebuild)
+    neighbours = _stale_neighbour_ids() if not rebuild else set()
+    result = SimilarResult()
+    if touched or neighbours:
+        publications = load_features()
+        index = FeatureIndex.build(publications)
+        neighbours |= _update_similar(
+            (pub for pub in publications if pub.publication_id in touched),
+            index,
+            block_size,
+            per_publication,
+            indexed_at,
+            result
+        )
+        neighbours -= touched
+        _update_similar(
+            (
+                pub for pub in publications
+                if pub.publication_id in neighbours
+            ),
+            index,
+            block_size,
+            per_publication,
+            indexed_at,
+            result
+        )
+    # Publications no longer active
+    SimilarPublication.objects.exclude(
+        publication__is_active=True
+    ).delete()
+    return result
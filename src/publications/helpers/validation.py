@@ -1,6 +1,6 @@
 from conf import settings
 from ninja.files import UploadedFile
-from publications.models import Item, Publication, PublicationItem
+from publications.models import Category, Item, Publication, PublicationItem
 from publications.forms import ItemCreationForm
 from typing import Union
 from os import path
@@ -18,14 +18,10 @@ def check_for_duplicate_sku(
 
 def check_for_item_conflict(
     publication: dict,
-    sku_set: set[str]
+    items_by_sku: dict[int, Item]
 ) -> tuple[bool, list[dict]]:
     # Store conflicts in list
     error_list = []
-    # Get existing items
-    item_query = (
-        Item.objects.select_related()
-    ).filter(sku__in=sku_set)
     # Create publication item info
     proto_pub_item = {
         'name': publication['item_name'].lower(),
@@ -39,9 +35,9 @@ def check_for_item_conflict(
             'color': pub_item['color'].lower(),
             'sku': pub_item['sku']
         }
-        existing_item_query = item_query.filter(sku=pub_item['sku'])
-        if existing_item_query.exists():
-            item_info = existing_item_query.get().serialize()
+        existing_item = items_by_sku.get(pub_item['sku'])
+        if existing_item is not None:
+            item_info = existing_item.serialize()
             if item_info != pub_item_info:
                 error_list.append(
                     {'current_item': item_info, 'item_in_form': pub_item_info}
@@ -56,6 +52,12 @@ def check_item_information(publication) -> tuple[bool, Union[dict, None]]:
     # Check publication_item is not empty
     if len(publication['publication_items']) == 0:
         return True, {'publication_items': ['List can not be empty.']}
+    # Every item shares the category, check it once for all the forms
+    category_ids = set(
+        Category.objects.filter(
+            id=publication['item_category_id']
+        ).values_list('id', flat=True)
+    )
     # Check if publication item is valid
     proto_pub_item = {
         'name': publication['item_name'].lower(),
@@ -68,7 +70,7 @@ def check_item_information(publication) -> tuple[bool, Union[dict, None]]:
             'color': pub_item['color'].lower(),
             'sku': pub_item['sku']
         }
-        form = ItemCreationForm(pub_item_info)
+        form = ItemCreationForm(pub_item_info, category_ids=category_ids)
         if not form.is_valid() or not isinstance(pub_item['amount'], int):
             error_dict[i] = ['Invalid parameters.']
     if error_dict:
@@ -80,16 +82,15 @@ def check_for_duplicate_pub(
     user_id,
     sku_set: set[str]
 ) -> tuple[bool, dict]:
-    pub_query = PublicationItem.objects.filter(
+    duplicate_skus = PublicationItem.objects.filter(
         item__sku__in=sku_set,
         publication__seller_id=user_id
-    )
-    if pub_query.exists():
-        return True, {
-            pub.item.sku: ['User has publication with this item already.']
-            for pub in pub_query.all()
-        }
-    return False, {}
+    ).values_list('item__sku', flat=True)
+    duplicates = {
+        sku: ['User has publication with this item already.']
+        for sku in duplicate_skus
+    }
+    return len(duplicates) > 0, duplicates
 
 
 def validate_publication(
@@ -111,7 +112,8 @@ def validate_publication(
 
 def validate_publication_items(
     user_id: int,
-    body: dict
+    body: dict,
+    items_by_sku: dict[int, Item]
 ) -> tuple[int, Union[dict, None]]:
     # Check item information format
     format_error_found, errors = check_item_information(body)
@@ -123,7 +125,10 @@ def validate_publication_items(
     if duplicate_found or sku_set is None:
         return 400, {'message': 'Duplicate sku.'}
     # Check for conflicts with existing items
-    conflict_found, conflict_list = check_for_item_conflict(body, sku_set)
+    conflict_found, conflict_list = check_for_item_conflict(
+        body,
+        items_by_sku
+    )
     if conflict_found:
         return 409, {'conflicts': conflict_list}
     # Check for duplicate publication item
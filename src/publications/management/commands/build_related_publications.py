@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from publications.helpers.related import (
+    RelatedResult,
+    index_all_new_sales,
+    rebuild_related_publications
+)
+from utilities.workers import run_periodically
+from time import monotonic
+
+
+class Command(BaseCommand):
+
+    help: str = 'Count the publications bought together in new sales.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Count the pending sales once and exit.'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Count every sale again before counting new ones.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.RELATED_PUBLICATIONS_INTERVAL,
+            help='Seconds to wait between runs.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.RELATED_PUBLICATIONS_BATCH_SIZE,
+            help='Sales counted per batch.'
+        )
+        parser.add_argument(
+            '--per-publication',
+            type=int,
+            default=settings.RELATED_PUBLICATIONS_PER_PUBLICATION,
+            help='Related publications kept for each publication.'
+        )
+
+    def handle(self, *args, **options):
+        pending_rebuild = options['rebuild']
+
+        def build() -> None:
+            nonlocal pending_rebuild
+            if pending_rebuild:
+                start = monotonic()
+                result = rebuild_related_publications(
+                    options['batch_size'],
+                    options['per_publication']
+                )
+                self.report('Rebuilt', result, start)
+                pending_rebuild = False
+            start = monotonic()
+            result = index_all_new_sales(
+                options['batch_size'],
+                options['per_publication']
+            )
+            self.report('Updated', result, start)
+
+        run_periodically(
+            'build_related_publications',
+            build,
+            options['interval'],
+            options['once']
+        )
+
+    def report(
+        self,
+        action: str,
+        result: RelatedResult,
+        start: float
+    ) -> None:
+        self.stdout.write(
+            f'{action} the related publications of {result.publications} '
+            f'publications from {result.sales} sales '
+            f'in {monotonic() - start:.3f}s.'
+        )
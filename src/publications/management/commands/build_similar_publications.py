@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from publications.helpers.similar import build_similar_publications
+from utilities.workers import run_periodically
+from time import monotonic
+
+
+class Command(BaseCommand):
+
+    help: str = 'Find the publications alike to the ones changed lately.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Update the changed publications once and exit.'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Update every publication before the changed ones.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.SIMILAR_PUBLICATIONS_INTERVAL,
+            help='Seconds to wait between runs.'
+        )
+        parser.add_argument(
+            '--rebuild-interval',
+            type=float,
+            default=settings.SIMILAR_PUBLICATIONS_REBUILD_INTERVAL,
+            help='Seconds between updates of every publication, 0 for never.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SIMILAR_PUBLICATIONS_BATCH_SIZE,
+            help='Publications scored and saved per block.'
+        )
+        parser.add_argument(
+            '--per-publication',
+            type=int,
+            default=settings.SIMILAR_PUBLICATIONS_PER_PUBLICATION,
+            help='Similar publications kept for each publication.'
+        )
+
+    def handle(self, *args, **options):
+        pending_rebuild = options['rebuild']
+        rebuild_interval = options['rebuild_interval']
+        last_rebuild = monotonic()
+
+        def build() -> None:
+            nonlocal pending_rebuild, last_rebuild
+            start = monotonic()
+            rebuild = pending_rebuild or (
+                rebuild_interval > 0
+                and start - last_rebuild >= rebuild_interval
+            )
+            result = build_similar_publications(
+                options['batch_size'],
+                options['per_publication'],
+                rebuild=rebuild
+            )
+            pending_rebuild = False
+            if rebuild:
+                last_rebuild = start
+            self.stdout.write(
+                f'Saved {result.similar} similar publications of '
+                f'{result.publications} publications '
+                f'in {monotonic() - start:.3f}s.'
+            )
+
+        run_periodically(
+            'build_similar_publications',
+            build,
+            options['interval'],
+            options['once']
+        )
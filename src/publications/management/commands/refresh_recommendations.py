@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from publications.helpers.recommendations import refresh_recommendations
+from utilities.workers import run_periodically
+from time import monotonic
+
+
+class Command(BaseCommand):
+
+    help: str = 'Score the recommended publications of every buyer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single refresh and exit.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.RECOMMENDATIONS_INTERVAL,
+            help='Seconds to wait between refreshes.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.RECOMMENDATIONS_BATCH_SIZE,
+            help='Buyers scored and saved per batch.'
+        )
+        parser.add_argument(
+            '--per-user',
+            type=int,
+            default=settings.RECOMMENDATIONS_PER_USER,
+            help='Recommendations kept for each buyer.'
+        )
+
+    def handle(self, *args, **options):
+        run_periodically(
+            'refresh_recommendations',
+            lambda: self.refresh(options['batch_size'], options['per_user']),
+            options['interval'],
+            options['once']
+        )
+
+    def refresh(self, batch_size: int, per_user: int) -> None:
+        start = monotonic()
+        result = refresh_recommendations(batch_size, per_user)
+        self.stdout.write(
+            f'Saved {result.recommendations} recommendations for '
+            f'{result.buyers} buyers in {monotonic() - start:.3f}s.'
+        )
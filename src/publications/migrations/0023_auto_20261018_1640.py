@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0022_alter_publicationphoto_publication'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='publication',
+            index=models.Index(fields=['-publish_date', '-id'], name='publication_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publication',
+            index=models.Index(fields=['is_active', '-publish_date', '-id'], name='publication_active_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:43
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+BACKFILL_SEARCH_VECTORS = """
+UPDATE publications_publication AS publication
+SET search_vector =
+    setweight(to_tsvector('spanish', coalesce(sample_item.name, '')), 'A')
+    || setweight(to_tsvector('spanish', coalesce(sample_item.brand, '')), 'B')
+    || setweight(to_tsvector('spanish', publication.description), 'C')
+FROM publications_publication AS target
+LEFT JOIN LATERAL (
+    SELECT item.name, item.brand
+    FROM publications_publicationitem AS publication_item
+    JOIN publications_item AS item ON item.id = publication_item.item_id
+    WHERE publication_item.publication_id = target.id
+    ORDER BY publication_item.id
+    LIMIT 1
+) AS sample_item ON TRUE
+WHERE target.id = publication.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0023_auto_20261018_1640'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='publication',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='publication',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='publication_search_idx'),
+        ),
+        # Trigram indexes live outside the model state because they need the
+        # pg_trgm extension, which the test database may not have.
+        migrations.RunSQL(
+            sql=[
+                'CREATE INDEX item_name_trgm_idx ON publications_item '
+                'USING gin (name gin_trgm_ops);',
+                'CREATE INDEX item_brand_trgm_idx ON publications_item '
+                'USING gin (brand gin_trgm_ops);',
+            ],
+            reverse_sql=[
+                'DROP INDEX item_name_trgm_idx;',
+                'DROP INDEX item_brand_trgm_idx;',
+            ],
+            state_operations=[]
+        ),
+        migrations.RunSQL(
+            sql=BACKFILL_SEARCH_VECTORS,
+            reverse_sql=migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_for_duplicate_skus(apps, schema_editor):
+    Item = apps.get_model('publications', 'Item')
+    duplicate_skus = list(
+        Item.objects.values('sku')
+        .annotate(items=Count('id'))
+        .filter(items__gt=1)
+        .order_by('sku')
+        .values_list('sku', flat=True)
+    )
+    if duplicate_skus:
+        raise RuntimeError(
+            'Several items share the skus '
+            f'{", ".join(map(str, duplicate_skus))}, '
+            'merge them before making the sku unique.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0025_catalogue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            check_for_duplicate_skus,
+            migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='sku',
+            field=models.IntegerField(unique=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:51
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0026_item_unique_sku'),
+    ]
+
+    operations = [
+        # Clamp rows that drifted out of range so the constraint applies
+        migrations.RunSQL(
+            sql='UPDATE publications_publicationitem '
+                'SET reserved = GREATEST(0, LEAST(reserved, amount)) '
+                'WHERE reserved < 0 OR reserved > amount;',
+            reverse_sql=migrations.RunSQL.noop
+        ),
+        migrations.AddConstraint(
+            model_name='publicationitem',
+            constraint=models.CheckConstraint(check=models.Q(('reserved__gte', 0), ('reserved__lte', django.db.models.expressions.F('amount'))), name='publicationitem_reserved_within_amount'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0027_publicationitem_reserved_within_amount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='publicationitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='publicationphoto',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
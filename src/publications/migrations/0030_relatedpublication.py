@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0029_userrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPublication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purchases', models.IntegerField()),
+                ('publication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_publications', to='publications.publication')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_to', to='publications.publication')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='relatedpublication',
+            index=models.Index(fields=['publication', '-purchases', 'related'], name='related_publication_top_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='relatedpublication',
+            unique_together={('publication', 'related')},
+        ),
+    ]
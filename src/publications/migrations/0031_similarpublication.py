@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0030_relatedpublication'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='similar_indexed_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='SimilarPublication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('publication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_publications', to='publications.publication')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='publications.publication')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='similarpublication',
+            index=models.Index(fields=['publication', '-score', 'similar'], name='similar_publication_top_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='similarpublication',
+            unique_together={('publication', 'similar')},
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:34
+
+from django.db import migrations, models
+
+
+# The size classes when the column was added
+SIZE_CLASSES = {
+    'xs': ['xs', '36'],
+    's': ['s', '38', '40'],
+    'm': ['m', '42', '44'],
+    'l': ['l', '46', '48'],
+    'xl': ['xl', '50', '52'],
+    'xxl': ['xxl', '54']
+}
+
+
+def fill_size_classes(apps, schema_editor):
+    Item = apps.get_model('publications', 'Item')
+    for size_class, sizes in SIZE_CLASSES.items():
+        # Letter sizes may be stored in either case
+        Item.objects.filter(
+            size__in=sizes + [size.upper() for size in sizes]
+        ).update(size_class=size_class)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0031_similarpublication'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='item',
+            name='item_category_size_idx',
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='size_class',
+            field=models.CharField(blank=True, editable=False, max_length=8, null=True),
+        ),
+        migrations.RunPython(
+            fill_size_classes,
+            migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='size',
+            field=models.CharField(blank=True, choices=[('xs', 'xs'), ('s', 's'), ('m', 'm'), ('l', 'l'), ('xl', 'xl'), ('xxl', 'xxl'), ('XS', 'xs'), ('S', 's'), ('M', 'm'), ('L', 'l'), ('XL', 'xl'), ('XXL', 'xxl'), ('36', '36'), ('38', '38'), ('40', '40'), ('42', '42'), ('44', '44'), ('46', '46'), ('48', '48'), ('50', '50'), ('52', '52'), ('54', '54')], max_length=8, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category', 'size_class'], name='item_category_size_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['size_class'], name='item_size_class_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0032_item_size_class'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='content_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -1,7 +1,20 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.db.models import Q, Sum
+from django.db.models import (
+    Count,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value
+)
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.utils.timezone import now
+from typing import Optional
 
 
 _ITEM_SIZE_CHOICES = [
@@ -25,9 +38,32 @@ _ITEM_SIZE_CHOICES = [
     ('46', '46'),
     ('48', '48'),
     ('50', '50'),
-    ('52', '52')
+    ('52', '52'),
+    ('54', '54')
 ]
 
+# Sizes of each size class, every size choice belongs to exactly one
+_SIZE_IDENTITY_CLASSES = {
+    'xs': {'xs', '36'},
+    's': {'s', '38', '40'},
+    'm': {'m', '42', '44'},
+    'l': {'l', '46', '48'},
+    'xl': {'xl', '50', '52'},
+    'xxl': {'xxl', '54'}
+}
+_SIZE_CLASS_OF = {
+    size: size_class
+    for size_class, sizes in _SIZE_IDENTITY_CLASSES.items()
+    for size in sizes
+}
+
+
+def item_size_class(size: Optional[str]) -> Optional[str]:
+    # Letter sizes are stored in either case
+    if size is None:
+        return None
+    return _SIZE_CLASS_OF.get(size.lower())
+
 
 class Category(models.Model):
     name = models.CharField(max_length=64, unique=True)
@@ -48,8 +84,16 @@ class Item(models.Model):
         blank=True,
         null=True
     )
+    # Kept in sync with size on save, filtered on instead of every size
+    # of a class
+    size_class = models.CharField(
+        max_length=8,
+        blank=True,
+        null=True,
+        editable=False
+    )
     color = models.CharField(max_length=32)
-    sku = models.IntegerField()
+    sku = models.IntegerField(unique=True)
     category = models.ForeignKey(
         Category,
         on_delete=models.PROTECT,
@@ -58,6 +102,20 @@ class Item(models.Model):
         null=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['category', 'size_class'],
+                name='item_category_size_class_idx'
+            ),
+            models.Index(fields=['size_class'], name='item_size_class_idx'),
+            models.Index(fields=['brand'], name='item_brand_idx')
+        ]
+
+    def save(self, *args, **kwargs):
+        self.size_class = item_size_class(self.size)
+        return super(Item, self).save(*args, **kwargs)
+
     def serialize(self):
         return {
             "name": self.name,
@@ -65,7 +123,7 @@ class Item(models.Model):
             "size": self.size,
             "color": self.color,
             "sku": self.sku,
-            "category_id": self.category.id
+            "category_id": self.category_id
         }
 
     def referenced_by_others(self, user_id: int) -> bool:
@@ -74,6 +132,84 @@ class Item(models.Model):
         ).count() > 0
 
 
+class PublicationQuerySet(models.QuerySet):
+    def with_general_item_info(self):
+        # Annotate what general_item_info and photo_uris need so listing
+        # publications does not run a query per publication.
+        publication_items = PublicationItem.objects.filter(
+            publication=OuterRef('pk')
+        )
+        sample_item = publication_items.order_by('id')
+
+        def item_field(field: str) -> Subquery:
+            return Subquery(sample_item.values(f'item__{field}')[:1])
+
+        def items_sum(field: str) -> Coalesce:
+            return Coalesce(
+                Subquery(
+                    publication_items
+                    .order_by()
+                    .values('publication')
+                    .annotate(total=Sum(field))
+                    .values('total')
+                ),
+                Value(0)
+            )
+
+        return self.annotate(
+            sample_item_name=item_field('name'),
+            sample_item_brand=item_field('brand'),
+            sample_category_id=item_field('category__id'),
+            sample_category_name=item_field('category__name'),
+            sample_category_image_uri=item_field('category__image_uri'),
+            total_amount=items_sum('amount'),
+            total_reserved=items_sum('reserved')
+        ).prefetch_related('photos')
+
+    def with_details(self):
+        # Prefetch what PublicationSchema renders for every item
+        return self.prefetch_related(
+            models.Prefetch(
+                'publication_items',
+                PublicationItem.objects.select_related('item__category')
+            ),
+            'photos'
+        )
+
+    def content_version(self) -> dict:
+        # When the publications, their items and their photos last changed,
+        # and how many of each there are so deleting one changes it too.
+        def per_publication(model, aggregate) -> Subquery:
+            return Subquery(
+                model.objects
+                .filter(publication=OuterRef('pk'))
+                .order_by()
+                .values('publication')
+                .annotate(value=aggregate)
+                .values('value')
+            )
+
+        return self.order_by().annotate(
+            item_count=per_publication(PublicationItem, Count('id')),
+            item_updated_at=per_publication(
+                PublicationItem,
+                Max('updated_at')
+            ),
+            photo_count=per_publication(PublicationPhoto, Count('id')),
+            photo_updated_at=per_publication(
+                PublicationPhoto,
+                Max('updated_at')
+            )
+        ).aggregate(
+            publications=Count('id'),
+            updated_at=Max('updated_at'),
+            items=Sum('item_count'),
+            items_updated_at=Max('item_updated_at'),
+            photos=Sum('photo_count'),
+            photos_updated_at=Max('photo_updated_at')
+        )
+
+
 class Publication(models.Model):
     seller = models.ForeignKey(
         get_user_model(),
@@ -85,9 +221,55 @@ class Publication(models.Model):
     is_active = models.BooleanField(default=False)
     is_accepted = models.BooleanField(default=False)
     description = models.TextField(default="")
+    updated_at = models.DateTimeField(auto_now=True)
+    # Kept up to date by publications.helpers.search
+    search_vector = SearchVectorField(null=True, editable=False)
+    # When its price, description, items or activity last changed, unlike
+    # updated_at reservations leave it alone
+    content_updated_at = models.DateTimeField(default=now, editable=False)
+    # When build_similar_publications last found its similar publications
+    similar_indexed_at = models.DateTimeField(null=True, editable=False)
+
+    objects = PublicationQuerySet.as_manager()
+
+    class Meta:
+        # Back the publication listings, catalogue filters and search
+        indexes = [
+            models.Index(
+                fields=['-publish_date', '-id'],
+                name='publication_recent_idx'
+            ),
+            models.Index(
+                fields=['is_active', '-publish_date', '-id'],
+                name='publication_active_recent_idx'
+            ),
+            models.Index(
+                fields=['is_active', 'price'],
+                name='publication_active_price_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='publication_search_idx'
+            )
+        ]
 
     @property
     def general_item_info(self):
+        if hasattr(self, 'sample_item_name'):
+            # Reuse the annotations of with_general_item_info
+            category = None
+            if self.sample_category_id is not None:
+                category = Category(
+                    id=self.sample_category_id,
+                    name=self.sample_category_name,
+                    image_uri=self.sample_category_image_uri
+                )
+            return {
+                'name': self.sample_item_name,
+                'brand': self.sample_item_brand,
+                'category': category,
+                'total_amount': self.total_amount - self.total_reserved
+            }
         publication_items_query = self.publication_items.all()
         sample_item = publication_items_query.first().item
         total_amount = publication_items_query.aggregate(
@@ -124,9 +306,17 @@ class PublicationItem(models.Model):
     )
     amount = models.IntegerField(default=0)
     reserved = models.IntegerField(default=0)
+    # Set by hand on bulk updates, which skip auto_now
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('item', 'publication')
+        constraints = [
+            models.CheckConstraint(
+                check=Q(reserved__gte=0) & Q(reserved__lte=F('amount')),
+                name='publicationitem_reserved_within_amount'
+            )
+        ]
 
     @property
     def available(self):
@@ -148,6 +338,7 @@ class PublicationPhoto(models.Model):
     )
     image = models.FileField(blank=True, null=True)
     image_uri = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class ShoppingCartPointer(models.Model):
@@ -165,3 +356,81 @@ class ShoppingCartPointer(models.Model):
 
     class Meta:
         unique_together = ("cart_owner", "publication_item")
+
+
+class UserRecommendation(models.Model):
+    # Filled by the refresh_recommendations command
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    publication = models.ForeignKey(
+        Publication,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'publication')
+        # Back the recommendations of a user, best first
+        indexes = [
+            models.Index(
+                fields=['user', '-score', 'publication'],
+                name='recommendation_user_score_idx'
+            )
+        ]
+
+
+class RelatedPublication(models.Model):
+    # Publications bought together, the most frequent ones for each
+    # publication are kept by the build_related_publications command
+    publication = models.ForeignKey(
+        Publication,
+        on_delete=models.CASCADE,
+        related_name='related_publications'
+    )
+    related = models.ForeignKey(
+        Publication,
+        on_delete=models.CASCADE,
+        related_name='related_to'
+    )
+    # Successful sales including both publications
+    purchases = models.IntegerField()
+
+    class Meta:
+        unique_together = ('publication', 'related')
+        indexes = [
+            models.Index(
+                fields=['publication', '-purchases', 'related'],
+                name='related_publication_top_idx'
+            )
+        ]
+
+
+class SimilarPublication(models.Model):
+    # Publications alike in name, brand, category, size and price, the
+    # closest ones for each publication are kept by the
+    # build_similar_publications command
+    publication = models.ForeignKey(
+        Publication,
+        on_delete=models.CASCADE,
+        related_name='similar_publications'
+    )
+    similar = models.ForeignKey(
+        Publication,
+        on_delete=models.CASCADE,
+        related_name='similar_to'
+    )
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('publication', 'similar')
+        indexes = [
+            models.Index(
+                fields=['publication', '-score', 'similar'],
+                name='similar_publication_top_idx'
+            )
+        ]
@@ -7,7 +7,7 @@ from publications.models import (
     ShoppingCartPointer,
     Category
 )
-from typing import Union
+from typing import Optional, Union
 
 
 CategorySchema = create_schema(
@@ -34,18 +34,34 @@ CategoryCreationSchema = create_schema(
 ItemSchema = create_schema(
     Item,
     name='ItemSchema',
-    exclude=('id',)
+    exclude=('id', 'size_class')
 )
 
 
 DetailedItemSchema = create_schema(
     Item,
     name='DetailedItemSchema',
-    exclude=['category'],
+    exclude=['category', 'size_class'],
     custom_fields=[('category', SuccinctCategorySchema, None)]
 )
 
 
+ItemLookupSchema = create_schema(
+    Item,
+    name='ItemLookupSchema',
+    exclude=['category', 'size_class'],
+    custom_fields=[
+        ('category', SuccinctCategorySchema, None),
+        ('publication_ids', list[int], None)
+    ]
+)
+
+
+class ItemLookupResultSchema(Schema):
+    items: list[ItemLookupSchema]
+    missing_skus: list[int]
+
+
 ItemCreationSchema = create_schema(
     Item,
     name='ItemCreate',
@@ -72,7 +88,7 @@ class PublicationItemGeneralInfoSchema(Schema):
 PublicationItemSchema = create_schema(
     PublicationItem,
     name='PublicationItemSchema',
-    exclude=['item', 'amount', 'reserved'],
+    exclude=['item', 'amount', 'reserved', 'updated_at'],
     custom_fields=[
         ('item', DetailedItemSchema, None),
         ('available', int, None)
@@ -94,6 +110,12 @@ class PublicationItemAddSchema(Schema):
 PublicationSchema = create_schema(
     Publication,
     name='PublicationsShow',
+    exclude=[
+        'search_vector',
+        'content_updated_at',
+        'similar_indexed_at',
+        'updated_at'
+    ],
     custom_fields=[
         ('publication_items', list[PublicationItemSchema], None),
         ('photo_uris', list[str], None)
@@ -112,6 +134,42 @@ SuccinctPublicationSchema = create_schema(
 )
 
 
+class SuccinctPublicationPageSchema(Schema):
+    items: list[SuccinctPublicationSchema]
+    next: Optional[str]
+
+
+class PublicationFilterSchema(Schema):
+    category: Optional[int] = None
+    brand: Optional[str] = None
+    size_class: Optional[str] = None
+    color: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: bool = False
+
+
+class FacetCountSchema(Schema):
+    value: str
+    count: int
+
+
+class CategoryFacetCountSchema(Schema):
+    value: int
+    count: int
+
+
+class PublicationFacetsSchema(Schema):
+    categories: list[CategoryFacetCountSchema]
+    brands: list[FacetCountSchema]
+    size_classes: list[FacetCountSchema]
+    colors: list[FacetCountSchema]
+
+
+class FilteredPublicationPageSchema(SuccinctPublicationPageSchema):
+    facets: PublicationFacetsSchema
+
+
 class PublicationCreationSchema(Schema):
     price: float
     description: str
@@ -153,7 +211,7 @@ class PublictionItemPublictionInfo(Schema):
 DetailedPublicationItemSchema = create_schema(
     PublicationItem,
     name='DetailedPublicationItemSchema',
-    exclude=['item', 'amount', 'reserved'],
+    exclude=['item', 'amount', 'reserved', 'updated_at'],
     custom_fields=[
         ('item', DetailedItemSchema, None),
         ('available', int, None),
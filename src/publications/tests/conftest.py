@@ -33,3 +33,15 @@ def generate_seller_permissions() -> None:
         content_type=ContentType.objects.get_for_model(Publication)
     )
     seller_group.permissions.add(pub_permission)
+
+
+@pytest.fixture(scope="function")
+def generate_seller_update_permissions(generate_seller_permissions) -> None:
+    seller_group = Group.objects.get(name='Seller')
+    update_permission, _ = Permission.objects.get_or_create(
+        id=1001,
+        codename='can_update',
+        name='Can update publication',
+        content_type=ContentType.objects.get_for_model(Publication)
+    )
+    seller_group.permissions.add(update_permission)
@@ -2,8 +2,23 @@ import pytest
 import json
 from copy import deepcopy
 from datetime import date
+from django.contrib.postgres.search import SearchQuery
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.utils.datastructures import MultiValueDict
+from django.utils import timezone
+from publications.models import (
+    Item,
+    Publication,
+    PublicationItem,
+    PublicationPhoto,
+    ShoppingCartPointer
+)
+from publications.helpers.search import SEARCH_CONFIG
+from transactions.helpers.reservation import reserve_publication_items
+from unittest.mock import patch
+from urllib.parse import urlencode
 
 
 _IMAGE_URI = 'https://github.githubassets.com/images/modules/' \
@@ -232,6 +247,49 @@ def test_create_invalid_item(
     ).status_code == 409
 
 
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_create_item_created_meanwhile(
+    ninja_client,
+    user_one,
+    publication_creation_info,
+    publication_photo_file,
+    generate_basic_publications
+):
+    pub_info = deepcopy(publication_creation_info)
+    pub_info['item_name'] = 'Polera'
+    pub_info['publication_items'][0]['sku'] = 300
+
+    def create_item_meanwhile(publication_info: dict) -> dict:
+        # Another request creates the sku after the lookup
+        Item.objects.create(
+            name='camisa',
+            brand='adidas',
+            category_id=1,
+            size='40',
+            color='azul',
+            sku=300
+        )
+        return {}
+
+    with patch(
+        'publications.api.publications.get_items_by_sku',
+        side_effect=create_item_meanwhile
+    ):
+        response = ninja_client.post(
+            '/publications/publications/create',
+            data={
+                'body': json.dumps(pub_info),
+            },
+            FILES=publication_photo_file,
+            user=user_one
+        )
+    assert response.status_code == 409
+    assert response.json()['conflicts'][0]['current_item']['name'] \
+        == 'camisa'
+    assert Publication.objects.count() == 1
+    assert PublicationItem.objects.count() == 1
+
+
 @pytest.mark.django_db(transaction=True, reset_sequences=True)
 def test_create_publication_with_valid_existing_item(
     ninja_client,
@@ -544,3 +602,569 @@ def test_upload_wrong_publication_files(
         user=user_one
     )
     assert response.status_code == 400
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_active_publications_query_count(
+    ninja_client,
+    super_user,
+    user_one,
+    publication_creation_info,
+    publication_photo_file,
+    generate_basic_publications
+):
+    def get_active_publications():
+        with CaptureQueriesContext(connection) as context:
+            response = ninja_client.get('/publications/publications/active')
+        assert response.status_code == 200
+        assert response.json()['next'] is None
+        return response.json()['items'], len(context.captured_queries)
+
+    assert ninja_client.patch(
+        '/publications/publications/accept/1',
+        user=super_user
+    ).status_code == 200
+    publications, single_publication_queries = get_active_publications()
+    assert len(publications) == 1
+    assert publications[0]['general_item_info'] == {
+        'name': 'jockey',
+        'brand': 'adidas',
+        'category': {
+            'id': 1,
+            'name': 'categorytest',
+            'image_uri': _IMAGE_URI
+        },
+        'total_amount': 3
+    }
+    # Create and accept more publications
+    for i in range(2, 5):
+        pub_info = deepcopy(publication_creation_info)
+        pub_info['item_name'] = f'Jockey{i}'
+        pub_info['publication_items'][0]['sku'] = 222 + i
+        assert ninja_client.post(
+            '/publications/publications/create',
+            data={'body': json.dumps(pub_info)},
+            FILES=publication_photo_file,
+            user=user_one
+        ).status_code == 201
+        assert ninja_client.patch(
+            f'/publications/publications/accept/{i}',
+            user=super_user
+        ).status_code == 200
+    # Listing more publications does not run more queries
+    publications, many_publications_queries = get_active_publications()
+    assert len(publications) == 4
+    assert many_publications_queries == single_publication_queries
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_search_publications(
+    ninja_client,
+    super_user,
+    user_one,
+    publication_creation_info,
+    publication_photo_file,
+    generate_basic_publications,
+    generate_seller_update_permissions
+):
+    def search(text: str) -> list[int]:
+        response = ninja_client.get(
+            f'/publications/publications/search?{urlencode({"q": text})}'
+        )
+        assert response.status_code == 200
+        return [publication['id'] for publication in response.json()]
+
+    pub_info = deepcopy(publication_creation_info)
+    pub_info['item_name'] = 'Zapatillas'
+    pub_info['item_brand'] = 'Nike'
+    pub_info['description'] = 'Livianas y cómodas'
+    pub_info['publication_items'][0]['sku'] = 223
+    assert ninja_client.post(
+        '/publications/publications/create',
+        data={'body': json.dumps(pub_info)},
+        FILES=publication_photo_file,
+        user=user_one
+    ).status_code == 201
+    # Only active publications are searched
+    assert ninja_client.patch(
+        '/publications/publications/accept/1',
+        user=super_user
+    ).status_code == 200
+    assert search('jockey or zapatillas') == [1]
+    assert ninja_client.patch(
+        '/publications/publications/accept/2',
+        user=super_user
+    ).status_code == 200
+    # Names and brands are stemmed and case insensitive
+    assert search('Zapatilla') == [2]
+    assert search('ADIDAS') == [1]
+    assert search('cómodas -adidas') == [2]
+    assert search('   ') == []
+    # Matches on the name rank above matches on the description
+    assert ninja_client.patch(
+        '/publications/publications/update_publication/1',
+        json={'price': 25000, 'description': 'Combina con zapatillas'},
+        user=user_one
+    ).status_code == 200
+    assert search('zapatillas') == [2, 1]
+    # Adding items refreshes a publication left without its vector
+    Publication.objects.filter(id=2).update(search_vector=None)
+    assert ninja_client.post(
+        '/publications/publications/add_publication_item/2',
+        json={'publication_items': [
+            {'size': '42', 'color': 'negro', 'sku': 224, 'amount': 1}
+        ]},
+        user=user_one
+    ).status_code == 200
+    assert Publication.objects.filter(
+        id=2,
+        search_vector=SearchQuery('nike', config=SEARCH_CONFIG)
+    ).exists()
+    assert search('nike') == [2]
+
+
+def _create_trigram_extension() -> bool:
+    # Migrations create pg_trgm, tests without them create it here when
+    # the database has it
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    return True
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_search_publications_with_typos(
+    ninja_client,
+    super_user,
+    user_one,
+    publication_creation_info,
+    publication_photo_file,
+    generate_basic_publications
+):
+    if not _create_trigram_extension():
+        pytest.skip('The database does not have pg_trgm.')
+
+    def search(text: str) -> list[int]:
+        response = ninja_client.get(
+            f'/publications/publications/search?{urlencode({"q": text})}'
+        )
+        assert response.status_code == 200
+        return [publication['id'] for publication in response.json()]
+
+    pub_info = deepcopy(publication_creation_info)
+    pub_info['item_name'] = 'Zapatillas'
+    pub_info['item_brand'] = 'Nike'
+    pub_info['publication_items'][0]['sku'] = 223
+    assert ninja_client.post(
+        '/publications/publications/create',
+        data={'body': json.dumps(pub_info)},
+        FILES=publication_photo_file,
+        user=user_one
+    ).status_code == 201
+    for publication_id in (1, 2):
+        assert ninja_client.patch(
+            f'/publications/publications/accept/{publication_id}',
+            user=super_user
+        ).status_code == 200
+    # Misspelled words miss the search vectors and fall back to trigrams
+    assert not Publication.objects.filter(
+        search_vector=SearchQuery('zapatilas', config=SEARCH_CONFIG)
+    ).exists()
+    assert search('zapatilas') == [2]
+    assert search('adiddas') == [1]
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_filter_publications_with_facets(
+    ninja_client,
+    super_user,
+    user_one,
+    publication_creation_info,
+    publication_photo_file,
+    generate_basic_publications
+):
+    def filter_publications(**filters) -> tuple[list[int], dict]:
+        with CaptureQueriesContext(connection) as context:
+            response = ninja_client.get(
+                f'/publications/publications/filter?{urlencode(filters)}'
+            )
+        assert response.status_code == 200
+        # Page, photos and every facet count
+        assert len(context.captured_queries) <= 3
+        body = response.json()
+        return [publication['id'] for publication in body['items']], \
+            body['facets']
+
+    sneakers_info = deepcopy(publication_creation_info)
+    sneakers_info |= {
+        'item_name': 'Zapatillas',
+        'item_brand': 'Nike',
+        'price': 10000
+    }
+    sneakers_info['publication_items'] = [
+        {'size': 'm', 'color': 'rojo', 'sku': 223, 'amount': 1}
+    ]
+    shirts_info = deepcopy(publication_creation_info)
+    shirts_info |= {'item_name': 'Polera', 'item_brand': 'Adidas'}
+    shirts_info['publication_items'] = [
+        {'size': 'l', 'color': 'azul', 'sku': 224, 'amount': 1},
+        {'size': '42', 'color': 'rojo', 'sku': 225, 'amount': 2}
+    ]
+    for pub_info in (sneakers_info, shirts_info):
+        assert ninja_client.post(
+            '/publications/publications/create',
+            data={'body': json.dumps(pub_info)},
+            FILES=publication_photo_file,
+            user=user_one
+        ).status_code == 201
+    for publication_id in (1, 2, 3):
+        assert ninja_client.patch(
+            f'/publications/publications/accept/{publication_id}',
+            user=super_user
+        ).status_code == 200
+    publications, facets = filter_publications()
+    assert publications == [3, 2, 1]
+    assert facets == {
+        'categories': [{'value': 1, 'count': 3}],
+        'brands': [
+            {'value': 'adidas', 'count': 2},
+            {'value': 'nike', 'count': 1}
+        ],
+        'size_classes': [
+            {'value': 'm', 'count': 2},
+            {'value': 'l', 'count': 1},
+            {'value': 's', 'count': 1}
+        ],
+        'colors': [
+            {'value': 'azul', 'count': 2},
+            {'value': 'rojo', 'count': 2}
+        ]
+    }
+    # Every filter has to match the same item of a publication
+    publications, facets = filter_publications(brand='ADIDAS', size_class='m')
+    assert publications == [3]
+    assert facets == {
+        'categories': [{'value': 1, 'count': 1}],
+        'brands': [{'value': 'adidas', 'count': 1}],
+        'size_classes': [{'value': 'm', 'count': 1}],
+        'colors': [{'value': 'rojo', 'count': 1}]
+    }
+    publications, facets = filter_publications(min_price=20000, color='rojo')
+    assert publications == [3]
+    publications, facets = filter_publications(max_price=100, in_stock=True)
+    assert publications == []
+    assert facets['brands'] == []
+    assert ninja_client.get(
+        '/publications/publications/filter?size_class=huge'
+    ).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_create_publication_query_count(
+    ninja_client,
+    user_one,
+    publication_creation_info,
+    publication_photo_file,
+    generate_basic_publications
+):
+    def create_publication(name: str, first_sku: int, variants: int) -> int:
+        pub_info = deepcopy(publication_creation_info)
+        pub_info['item_name'] = name
+        pub_info['publication_items'] = [
+            {'size': 'm', 'color': f'color{i}', 'sku': first_sku + i, 'amount': 1}
+            for i in range(variants)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = ninja_client.post(
+                '/publications/publications/create',
+                data={'body': json.dumps(pub_info)},
+                FILES=publication_photo_file,
+                user=user_one
+            )
+        assert response.status_code == 201
+        assert len(response.json()['publication_items']) == variants
+        return len(context.captured_queries)
+
+    # Creating many variants costs as many queries as creating one
+    assert create_publication('Polera', 1000, 1) \
+        == create_publication('Camisa', 2000, 40)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_lookup_items_by_sku(
+    ninja_client,
+    user_one,
+    publication_creation_info,
+    publication_photo_file,
+    generate_basic_publications
+):
+    pub_info = deepcopy(publication_creation_info)
+    pub_info['item_name'] = 'Polera'
+    pub_info['publication_items'] = [
+        {'size': 'm', 'color': 'rojo', 'sku': 300, 'amount': 1}
+    ]
+    assert ninja_client.post(
+        '/publications/publications/create',
+        data={'body': json.dumps(pub_info)},
+        FILES=publication_photo_file,
+        user=user_one
+    ).status_code == 201
+    with CaptureQueriesContext(connection) as context:
+        response = ninja_client.get(
+            '/publications/items/lookup?skus=300,222,404',
+            user=user_one
+        )
+    assert len(context.captured_queries) == 1
+    assert response.status_code == 200
+    assert response.json() == {
+        'items': [
+            {
+                'id': 1,
+                'name': 'jockey',
+                'brand': 'adidas',
+                'size': '40',
+                'color': 'azul',
+                'sku': 222,
+                'category': {'id': 1, 'name': 'categorytest'},
+                'publication_ids': [1]
+            },
+            {
+                'id': 2,
+                'name': 'polera',
+                'brand': 'adidas',
+                'size': 'm',
+                'color': 'rojo',
+                'sku': 300,
+                'category': {'id': 1, 'name': 'categorytest'},
+                'publication_ids': [2]
+            }
+        ],
+        'missing_skus': [404]
+    }
+    assert ninja_client.get(
+        '/publications/items/lookup?skus=300,abc',
+        user=user_one
+    ).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_public_catalogue_cache(
+    ninja_client,
+    super_user,
+    user_one,
+    publication_creation_info,
+    publication_photo_file,
+    category_photo_file,
+    generate_basic_publications,
+    generate_seller_update_permissions
+):
+    def get_cached(path: str, queries: int = 0) -> dict:
+        # At most the version query of an ETag reaches the database
+        with CaptureQueriesContext(connection) as context:
+            response = ninja_client.get(path)
+        assert response.status_code in (200, 404)
+        assert len(context.captured_queries) == queries
+        return response.json()
+
+    publication_path = '/publications/publications/obtener/1'
+    # Misses are cached as well, until the publication is accepted
+    assert ninja_client.get(publication_path).status_code == 404
+    get_cached(publication_path, 1)
+    assert ninja_client.patch(
+        '/publications/publications/accept/1',
+        user=super_user
+    ).status_code == 200
+    publication = ninja_client.get(publication_path).json()
+    assert publication['publication_items'][0]['available'] == 3
+    assert get_cached(publication_path, 1) == publication
+    active = ninja_client.get('/publications/publications/active').json()
+    assert get_cached('/publications/publications/active', 1) == active
+    # Updating an item changes what is available
+    assert ninja_client.patch(
+        '/publications/publications/update_publication_item/1',
+        json={'amount': 5},
+        user=user_one
+    ).status_code == 200
+    publication = ninja_client.get(publication_path).json()
+    assert publication['publication_items'][0]['available'] == 5
+    active = ninja_client.get('/publications/publications/active').json()
+    assert active['items'][0]['general_item_info']['total_amount'] == 5
+    # New publications can add brands
+    brands_path = '/publications/publications/existing_brands'
+    assert ninja_client.get(brands_path).json() == ['adidas']
+    assert get_cached(brands_path) == ['adidas']
+    pub_info = deepcopy(publication_creation_info)
+    pub_info['item_brand'] = 'Nike'
+    pub_info['publication_items'][0]['sku'] = 333
+    assert ninja_client.post(
+        '/publications/publications/create',
+        data={'body': json.dumps(pub_info)},
+        FILES=publication_photo_file,
+        user=user_one
+    ).status_code == 201
+    assert sorted(ninja_client.get(brands_path).json()) == ['adidas', 'nike']
+    # So do categories
+    categories_path = '/publications/categories/all'
+    assert len(ninja_client.get(categories_path).json()) == 1
+    assert len(get_cached(categories_path)) == 1
+    assert ninja_client.post(
+        '/publications/categories/create',
+        data={'body': json.dumps({'name': 'othercategory'})},
+        FILES={'file': category_photo_file},
+        user=super_user
+    ).status_code == 200
+    assert len(ninja_client.get(categories_path).json()) == 2
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_conditional_catalogue_requests(
+    ninja_client,
+    super_user,
+    user_one,
+    generate_basic_publications
+):
+    def get(path: str, etag: str = None):
+        headers = {} if etag is None else {'If-None-Match': etag}
+        with CaptureQueriesContext(connection) as context:
+            response = ninja_client.get(path, headers=headers)
+        return response, len(context.captured_queries)
+
+    publication_path = '/publications/publications/obtener/1'
+    active_path = '/publications/publications/active'
+    # Inactive publications are not tagged
+    response, _ = get(publication_path)
+    assert response.status_code == 404
+    with pytest.raises(KeyError):
+        response['ETag']
+    assert ninja_client.patch(
+        '/publications/publications/accept/1',
+        user=super_user
+    ).status_code == 200
+    response, _ = get(publication_path)
+    assert response.status_code == 200
+    etag = response['ETag']
+    # A matching ETag only costs the version query
+    response, queries = get(publication_path, etag)
+    assert (response.status_code, response.content, queries) == (304, b'', 1)
+    assert response['ETag'] == etag
+    response, _ = get(publication_path, f'"other", W/{etag}')
+    assert response.status_code == 304
+    active, _ = get(active_path)
+    active_etag = active['ETag']
+    response, queries = get(active_path, active_etag)
+    assert (response.status_code, queries) == (304, 1)
+    # Other pages have their own ETag
+    response, _ = get(f'{active_path}?{urlencode({"limit": 1})}', active_etag)
+    assert response.status_code == 200
+    # Stock taken by another process changes it without any invalidation
+    PublicationItem.objects.filter(publication_id=1).update(
+        updated_at=timezone.now()
+    )
+    response, _ = get(active_path, active_etag)
+    assert response.status_code == 200
+    active_etag = response['ETag']
+    # Reserving stock, adding photos and removing publications change them
+    with transaction.atomic():
+        reserve_publication_items({1: 1})
+    response, _ = get(publication_path, etag)
+    assert response.status_code == 200
+    assert response.json()['publication_items'][0]['available'] == 2
+    etag = response['ETag']
+    PublicationPhoto.objects.create(publication_id=1, image_uri='photo')
+    response, _ = get(publication_path, etag)
+    assert response.status_code == 200
+    assert len(response.json()['photo_uris']) == 2
+    assert ninja_client.delete(
+        '/publications/publications/remove_publication/1',
+        user=super_user
+    ).status_code == 204
+    response, _ = get(active_path, active_etag)
+    assert response.status_code == 200
+    assert response.json()['items'] == []
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_publication_and_cart_query_budgets(
+    ninja_client,
+    super_user,
+    user_one,
+    assert_query_budget,
+    generate_basic_publications
+):
+    assert ninja_client.patch(
+        '/publications/publications/accept/1',
+        user=super_user
+    ).status_code == 200
+
+    def add_publication_items(size: int) -> None:
+        for sku in range(PublicationItem.objects.count(), size):
+            item = Item.objects.create(
+                name='jockey',
+                brand='adidas',
+                color='azul',
+                size='40',
+                sku=1000 + sku,
+                category_id=1
+            )
+            PublicationItem.objects.create(
+                item=item,
+                publication_id=1,
+                amount=3
+            )
+
+    assert_query_budget(
+        lambda: ninja_client.get('/publications/publications/obtener/1'),
+        add_publication_items,
+        budget=4
+    )
+
+    def add_active_publications(size: int) -> None:
+        for i in range(Publication.objects.count(), size):
+            publication = Publication.objects.create(
+                seller_id=user_one.id,
+                price=25000,
+                is_active=True
+            )
+            PublicationItem.objects.create(
+                item=Item.objects.create(
+                    name='jockey',
+                    brand='adidas',
+                    color='azul',
+                    size='40',
+                    sku=2000 + i,
+                    category_id=1
+                ),
+                publication=publication,
+                amount=3
+            )
+
+    # The ETag of the listing only reads the rows of the page
+    assert_query_budget(
+        lambda: ninja_client.get('/publications/publications/active'),
+        add_active_publications,
+        budget=3,
+        sizes=(1, 50, 200)
+    )
+
+    def fill_cart(size: int) -> None:
+        add_publication_items(size)
+        in_cart = ShoppingCartPointer.objects.count()
+        for pub_item in PublicationItem.objects.order_by('id')[in_cart:size]:
+            ShoppingCartPointer.objects.create(
+                cart_owner_id=user_one.id,
+                publication_item=pub_item,
+                amount=1
+            )
+
+    assert_query_budget(
+        lambda: ninja_client.get(
+            '/publications/shopping_cart/shopping_cart/me',
+            user=user_one
+        ),
+        fill_cart,
+        budget=2
+    )
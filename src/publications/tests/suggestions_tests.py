@@ -1,5 +1,31 @@
 import pytest
+from django.core.management import call_command
+from publications.helpers.recommendations import (
+    BuyerProfile,
+    Candidate,
+    CategoryCandidates,
+    score_candidates
+)
+from publications.helpers.similar import mark_content_changed
+from publications.models import (
+    _ITEM_SIZE_CHOICES,
+    _SIZE_IDENTITY_CLASSES,
+    Category,
+    Item,
+    Publication,
+    PublicationItem,
+    RelatedPublication,
+    item_size_class
+)
+from transactions.models import (
+    AcountlessTransaction,
+    AcountlessTransactionPointer,
+    Transaction,
+    TransactionPointer
+)
+from user_profiles.models import UserProfile, UserShippingAddress
 from unittest.mock import Mock, patch
+from io import StringIO
 import json
 
 
@@ -206,9 +232,262 @@ def test_get_recommendation(
         json={'shipping_address_id': 1},
         user=user_one
     ).status_code == 200
+    # Until recommendations are refreshed the newest publications are shown
+    response = ninja_client.get(
+        '/publications/publications/recommendations?amount=3',
+        user=user_one
+    )
+    assert [pub['id'] for pub in response.json()] == [5, 4, 3]
+    call_command('refresh_recommendations', '--once', stdout=StringIO())
     # Get recommendations
     response = ninja_client.get(
         '/publications/publications/recommendations?amount=3',
         user=user_one
     )
     assert response.json() == publication_recommendation_get_info
+
+
+def test_recommendation_scores():
+    profile = BuyerProfile(
+        categories={1: 0.75, 2: 0.25},
+        size_classes={'m': 1.0},
+        average_price=10000
+    )
+    candidates = {
+        1: CategoryCandidates.by_price([
+            Candidate(1, 10000, 1.0, frozenset({'s'})),
+            Candidate(2, 10000, 1.0, frozenset({'m'})),
+            # Out of the price band
+            Candidate(3, 16000, 1.0, frozenset({'m'}))
+        ]),
+        2: CategoryCandidates.by_price([
+            Candidate(4, 10000, 1.0, frozenset({'m'}))
+        ]),
+        3: CategoryCandidates.by_price([
+            Candidate(5, 10000, 1.0, frozenset({'m'}))
+        ])
+    }
+    scores = score_candidates(profile, candidates, 10)
+    assert [pub_id for pub_id, _ in scores] == [2, 4, 1]
+    assert score_candidates(profile, candidates, 1) == scores[:1]
+
+
+def _create_publication(
+    seller: UserProfile,
+    sku: int,
+    category: Category,
+    name: str = 'Item',
+    brand: str = 'Brand',
+    size: str = 'm',
+    price: float = 25000
+) -> Publication:
+    publication = Publication.objects.create(
+        seller=seller,
+        price=price,
+        is_active=True
+    )
+    PublicationItem.objects.create(
+        item=Item.objects.create(
+            name=name,
+            brand=brand,
+            size=size,
+            color='Color',
+            sku=sku,
+            category=category
+        ),
+        publication=publication,
+        amount=10
+    )
+    return publication
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_related_publications(ninja_client, user_one_creation_info):
+    buyer = UserProfile.objects.create_user(
+        username=user_one_creation_info['username'],
+        password=user_one_creation_info['password1'],
+        rut=user_one_creation_info['rut'],
+        birthdate=user_one_creation_info['birthdate']
+    )
+    address = UserShippingAddress.objects.create(
+        user=buyer,
+        region='region',
+        commune='commune',
+        address='address'
+    )
+    category = Category.objects.create(name='category')
+    for i in range(1, 5):
+        _create_publication(buyer, i, category, name=f'Item{i}')
+
+    def sell(status: str, *publication_ids: int) -> None:
+        sale = Transaction.objects.create(
+            buyer=buyer,
+            shipping_address=address,
+            payment_id=f'related{Transaction.objects.count()}',
+            status=status
+        )
+        for publication_id in publication_ids:
+            TransactionPointer.objects.create(
+                transaction=sale,
+                publication_item_id=publication_id,
+                amount=1,
+                price_per_unit=25000
+            )
+
+    def related_ids(publication_id: int, limit: int = 10) -> list[int]:
+        response = ninja_client.get(
+            f'/publications/publications/{publication_id}/related'
+            f'?limit={limit}'
+        )
+        assert response.status_code == 200
+        return [pub['id'] for pub in response.json()]
+
+    sell('SUCCEDED', 1, 2, 3)
+    sell('SUCCEDED', 1, 2)
+    # Failed sales are not counted
+    sell('FAILED', 1, 4)
+    for i in range(2):
+        sale = AcountlessTransaction.objects.create(
+            payment_id=f'accountlessrelated{i}',
+            status='SUCCEDED',
+            buyer_name='John',
+            buyer_lastname='Smith',
+            phone_number='+569000002',
+            address='address',
+            region='region',
+            commune='commune'
+        )
+        AcountlessTransactionPointer.objects.create(
+            transaction=sale,
+            publication_item_id=3,
+            amount=1,
+            price_per_unit=25000
+        )
+        AcountlessTransactionPointer.objects.create(
+            transaction=sale,
+            publication_item_id=1,
+            amount=1,
+            price_per_unit=25000
+        )
+    assert related_ids(1) == []
+    call_command('build_related_publications', '--once', stdout=StringIO())
+    assert related_ids(1) == [3, 2]
+    assert related_ids(1, limit=1) == [3]
+    assert related_ids(2) == [1, 3]
+    assert related_ids(4) == []
+    response = ninja_client.get('/publications/publications/99/related')
+    assert response.status_code == 404
+    # New sales are merged into the stored counts
+    sell('SUCCEDED', 2, 1)
+    sell('SUCCEDED', 2, 1)
+    call_command('build_related_publications', '--once', stdout=StringIO())
+    assert related_ids(1) == [2, 3]
+    assert not Transaction.objects.filter(
+        status='SUCCEDED',
+        related_indexed=False
+    ).exists()
+    stored = list(RelatedPublication.objects.order_by('id').values_list(
+        'publication_id',
+        'related_id',
+        'purchases'
+    ))
+    call_command(
+        'build_related_publications',
+        '--once',
+        '--rebuild',
+        stdout=StringIO()
+    )
+    assert sorted(RelatedPublication.objects.values_list(
+        'publication_id',
+        'related_id',
+        'purchases'
+    )) == sorted(stored)
+    # Inactive publications are left out
+    Publication.objects.filter(id=2).update(is_active=False)
+    assert related_ids(1) == [3]
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_similar_publications(ninja_client, user_one_creation_info):
+    seller = UserProfile.objects.create_user(
+        username=user_one_creation_info['username'],
+        password=user_one_creation_info['password1'],
+        rut=user_one_creation_info['rut'],
+        birthdate=user_one_creation_info['birthdate']
+    )
+    shirts = Category.objects.create(name='shirts')
+    shoes = Category.objects.create(name='shoes')
+    _create_publication(seller, 1, shirts, 'Polera Sport', 'Nike', 'm', 10000)
+    _create_publication(
+        seller, 2, shirts, 'Polera Basica', 'Adidas', 'm', 11000
+    )
+    _create_publication(seller, 3, shoes, 'Zapatilla', 'Nike', '42', 10000)
+    _create_publication(seller, 4, shoes, 'Pantalon', 'Levis', 'xl', 50000)
+
+    def build(*args: str) -> str:
+        output = StringIO()
+        call_command(
+            'build_similar_publications',
+            '--once',
+            *args,
+            stdout=output
+        )
+        return output.getvalue()
+
+    def related_ids(publication_id: int) -> list[int]:
+        response = ninja_client.get(
+            f'/publications/publications/{publication_id}/related'
+        )
+        assert response.status_code == 200
+        return [pub['id'] for pub in response.json()]
+
+    assert 'of 4 publications' in build()
+    # Same name and category first, then same brand and size class, while
+    # publications with nothing in common are left out
+    assert related_ids(1) == [2, 3]
+    assert related_ids(4) == [3]
+    # Only publications changed since the last run are updated, which
+    # reservations leave alone
+    assert 'of 0 publications' in build()
+    PublicationItem.objects.get(publication_id=3).save()
+    assert 'of 0 publications' in build()
+    # Along with the publications found alike and the ones keeping it
+    Item.objects.filter(sku=4).update(name='Polera', category=shirts)
+    mark_content_changed([4])
+    assert 'of 4 publications' in build()
+    assert related_ids(1) == [2, 3, 4]
+    assert related_ids(3) == [1, 2]
+    assert 'of 0 publications' in build()
+    assert 'of 4 publications' in build('--rebuild')
+    # Publications bought together come first
+    RelatedPublication.objects.create(
+        publication_id=1,
+        related_id=4,
+        purchases=1
+    )
+    assert related_ids(1) == [4, 2, 3]
+    Publication.objects.filter(id=2).update(is_active=False)
+    assert related_ids(1) == [4, 3]
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_item_size_class():
+    # Every size that can be stored belongs to a size class and back
+    sizes = {size.lower() for size, _ in _ITEM_SIZE_CHOICES}
+    assert sizes == set().union(*_SIZE_IDENTITY_CLASSES.values())
+    assert item_size_class('XL') == item_size_class('52') == 'xl'
+    assert item_size_class('') is None
+    item = Item.objects.create(
+        name='Item',
+        brand='Brand',
+        size='54',
+        color='Color',
+        sku=1
+    )
+    assert Item.objects.get(size_class='xxl') == item
+    item.size = 'S'
+    item.save()
+    assert Item.objects.get(id=item.id).size_class == 's'
+    item.size = None
+    item.save()
+    assert Item.objects.get(id=item.id).size_class is None
@@ -1,20 +1,20 @@
+from django.db.transaction import atomic
 from ninja import Router
 from transactions.helpers.confirmation import (
-    confirm_transaction_payment,
     get_ambiguous_transaction,
-    cancel_transaction_payment
+    cancel_transaction_payment,
+    lock_transaction
 )
 from transactions.helpers.validation import validate_signature
 from transactions.mail import (
     get_email_and_send,
-    send_purchase_in_process_email,
-    send_purchase_succeded_email,
-    send_purchase_failed_email
+    send_purchase_in_process_email
 )
 from transactions.models import Transaction
 from transactions.schema import TransactionResolveSchema
+from transactions.webhooks import enqueue_webhook_event
 from publications.models import ShoppingCartPointer
-from utilities.errors import ErrorOut, not_found
+from utilities.errors import ErrorOut, bad_parameters, not_found
 
 
 router = Router()
@@ -24,37 +24,19 @@ router = Router()
     '/resolved',
     response={
         200: None,
-        400: None,
-        403: None,
-        404: ErrorOut
+        400: ErrorOut,
+        403: None
     }
 )
 def resolve_transaction(request, body: TransactionResolveSchema):
     if not validate_signature(request):
         return 403, None
-    data = body.dict()
-    transaction, pointer_type = get_ambiguous_transaction(data['id'])
-    if transaction is None or pointer_type is None:
-        return 404, not_found(
-            f'No existe una transaccion con payment_id:{data["id"]}'
-        )
-    if transaction.status in ('SUCCEDED', 'FAILED'):
-        return 400, None
-    if data['type'] == 'payment_intent.succeeded':
-        confirm_transaction_payment(transaction, pointer_type)
-        get_email_and_send(
-            request,
-            transaction,
-            send_purchase_succeded_email
-        )
-    elif data['type'] in ('payment_intent.failed', 'payment_intent.rejected'):
-        transaction.status = 'FAILED'
-        transaction.save()
-        get_email_and_send(
-            request,
-            transaction,
-            send_purchase_failed_email
-        )
+    payment_id = None if body.data is None else body.data.get('id')
+    if not isinstance(payment_id, str):
+        return 400, bad_parameters()
+    # Fintoc is answered as soon as the event is stored, the
+    # process_webhooks command confirms the payment and sends the email.
+    enqueue_webhook_event(body.id, payment_id, body.type, body.dict())
     return 200, None
 
 
@@ -62,6 +44,7 @@ def resolve_transaction(request, body: TransactionResolveSchema):
     '/confirm_request/{payment_id}',
     response={
         200: None,
+        400: ErrorOut,
         404: ErrorOut,
     }
 )
@@ -71,15 +54,26 @@ def confirm_transaction_request(request, payment_id: str):
         return 404, not_found(
             f'No existe una transaccion con payment_id:{payment_id}'
         )
-    transaction.status = 'REQUESTED'
-    transaction.save()
-    if (isinstance(transaction, Transaction)
-            and request.user.id == transaction.buyer.id):
-        for cart_item in ShoppingCartPointer.objects.filter(
-            cart_owner__id=request.user.id
-        ):
-            cart_item.delete()
-    get_email_and_send(request, transaction, send_purchase_in_process_email)
+    with atomic():
+        transaction = lock_transaction(transaction)
+        if transaction.status in ('CANCELED', 'FAILED'):
+            return 400, {'message': 'Transaction has already been resolved.'}
+        # The webhook may have confirmed the payment already, only a
+        # transaction still waiting for the buyer is marked as requested
+        if transaction.status == 'CREATED':
+            transaction.status = 'REQUESTED'
+            transaction.save(update_fields=['status'])
+            get_email_and_send(
+                request,
+                transaction,
+                send_purchase_in_process_email
+            )
+        if (isinstance(transaction, Transaction)
+                and request.user.id == transaction.buyer_id):
+            for cart_item in ShoppingCartPointer.objects.filter(
+                cart_owner__id=request.user.id
+            ):
+                cart_item.delete()
     return 200, transaction
 
 
@@ -97,4 +91,5 @@ def cancel_transaction(request, payment_id: str):
         return 404, not_found(
             f'No existe una transaccion con payment_id:{payment_id}'
         )
-    return cancel_transaction_payment(transaction)
+    with atomic():
+        return cancel_transaction_payment(lock_transaction(transaction))
@@ -1,16 +1,19 @@
 from ninja import Router
 from ninja.security import django_auth
-from django.contrib.auth import get_user_model
 from transactions.models import (
     Coupon
 )
+from user_profiles.principal import get_principal
 from utilities.errors import (
     ErrorOut,
     ErrorsOut,
+    bad_parameters,
     missing_permission,
     not_found
 )
+from utilities.pagination import InvalidCursor, paginate_queryset
 from transactions.schema import (
+    CouponPageSchema,
     CouponSchema,
     CouponCreationSchema,
     MassCouponCreationSchema
@@ -20,6 +23,7 @@ from transactions.forms import (
     MassCouponCreationForm
 )
 from transactions.helpers.generation import generate_coupons
+from typing import Optional
 
 
 router = Router()
@@ -27,14 +31,25 @@ router = Router()
 
 @router.get(
     "/all",
-    response={200: list[CouponSchema], 403: ErrorOut},
+    response={200: CouponPageSchema, 400: ErrorOut, 403: ErrorOut},
     auth=django_auth
 )
-def get_all_coupons(request):
-    user = get_user_model().objects.get(pk=request.user.id)
-    if not user.has_perm('transactions.can_manage_coupon'):
+def get_all_coupons(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    if not get_principal(request).has_perm('transactions.can_manage_coupon'):
         return 403, missing_permission()
-    return 200, Coupon.objects.all()
+    try:
+        return 200, paginate_queryset(
+            Coupon.objects.all(),
+            ('id',),
+            cursor,
+            limit
+        )
+    except InvalidCursor:
+        return 400, bad_parameters()
 
 
 @router.post(
@@ -47,8 +62,7 @@ def get_all_coupons(request):
     auth=django_auth
 )
 def create_coupon(request, body: CouponCreationSchema):
-    user = get_user_model().objects.get(pk=request.user.id)
-    if not user.has_perm('transactions.can_manage_coupon'):
+    if not get_principal(request).has_perm('transactions.can_manage_coupon'):
         return 403, missing_permission()
     form = CouponCreationForm(body.dict())
     if form.is_valid():
@@ -67,8 +81,7 @@ def create_coupon(request, body: CouponCreationSchema):
     auth=django_auth
 )
 def mass_create_coupon(request, body: MassCouponCreationSchema):
-    user = get_user_model().objects.get(pk=request.user.id)
-    if not user.has_perm('transactions.can_manage_coupon'):
+    if not get_principal(request).has_perm('transactions.can_manage_coupon'):
         return 403, missing_permission()
     form = MassCouponCreationForm(body.dict())
     if not form.is_valid():
@@ -87,8 +100,7 @@ def mass_create_coupon(request, body: MassCouponCreationSchema):
     auth=django_auth
 )
 def activate_coupon(request, coupon_id: int):
-    user = get_user_model().objects.get(pk=request.user.id)
-    if not user.has_perm('transactions.can_manage_coupon'):
+    if not get_principal(request).has_perm('transactions.can_manage_coupon'):
         return 403, missing_permission()
 
     coupon_query = Coupon.objects.filter(id=coupon_id)
@@ -111,8 +123,7 @@ def activate_coupon(request, coupon_id: int):
     auth=django_auth
 )
 def deactivate_coupon(request, coupon_id: int):
-    user = get_user_model().objects.get(pk=request.user.id)
-    if not user.has_perm('transactions.can_manage_coupon'):
+    if not get_principal(request).has_perm('transactions.can_manage_coupon'):
         return 403, missing_permission()
 
     coupon_query = Coupon.objects.filter(id=coupon_id)
@@ -135,8 +146,7 @@ def deactivate_coupon(request, coupon_id: int):
     auth=django_auth
 )
 def delete_coupon(request, coupon_id: int):
-    user = get_user_model().objects.get(pk=request.user.id)
-    if not user.has_perm('transactions.can_manage_coupon'):
+    if not get_principal(request).has_perm('transactions.can_manage_coupon'):
         return 403, missing_permission()
 
     coupon_query = Coupon.objects.filter(id=coupon_id)
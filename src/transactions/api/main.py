@@ -2,6 +2,7 @@ from ninja import Router
 from transactions.api.transactions import router as transaction_router
 from transactions.api.confirmation import router as confirmation_router
 from transactions.api.coupons import router as coupon_router
+from transactions.api.sales import router as sales_router
 
 
 _TGS = ['Transactions']
@@ -23,4 +24,9 @@ router.add_router(
     'coupons',
     coupon_router,
     tags=_TGS
-)
\ No newline at end of file
+)
+router.add_router(
+    'sales',
+    sales_router,
+    tags=_TGS
+)
@@ -0,0 +1,64 @@
+from django.http import FileResponse
+from django.utils.timezone import now
+from ninja import Query, Router
+from ninja.security import django_auth
+from transactions.helpers.export import (
+    EXPORT_CONTENT_TYPES,
+    export_querysets,
+    write_export
+)
+from transactions.helpers.sales import sales_summary
+from transactions.schema import (
+    SalesExportFilterSchema,
+    SalesSummaryFilterSchema,
+    SalesSummarySchema
+)
+from user_profiles.principal import get_principal
+from utilities.errors import ErrorOut, missing_permission
+
+
+router = Router()
+
+
+@router.get(
+    '/summary',
+    response={200: SalesSummarySchema},
+    auth=django_auth
+)
+def get_sales_summary(
+    request,
+    filters: SalesSummaryFilterSchema = Query(...)
+):
+    return 200, sales_summary(
+        request.user.id,
+        filters.group_by,
+        filters.date_from,
+        filters.date_to
+    )
+
+
+@router.get(
+    '/export',
+    response={403: ErrorOut},
+    auth=django_auth
+)
+def export_sales(
+    request,
+    filters: SalesExportFilterSchema = Query(...)
+):
+    seller_id = request.user.id
+    if filters.scope == 'all':
+        if not get_principal(request).has_perm('transactions.can_read'):
+            return 403, missing_permission()
+        seller_id = None
+    export = write_export(
+        export_querysets(seller_id, filters.date_from, filters.date_to),
+        filters.format
+    )
+    filename = f'{filters.scope}-{now():%Y%m%d%H%M%S}.{filters.format}'
+    return FileResponse(
+        export,
+        as_attachment=True,
+        filename=filename,
+        content_type=EXPORT_CONTENT_TYPES[filters.format]
+    )
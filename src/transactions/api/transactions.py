@@ -1,14 +1,14 @@
 from ninja import Router
 from ninja.security import django_auth
-from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import Prefetch
 from transactions.models import (
     Coupon,
     Transaction,
     TransactionPointer,
     AcountlessTransactionPointer
 )
-from transactions.helpers.generation import send_payment_intent
+from transactions.payments import send_payment_intent
 from transactions.helpers.validation import (
     validate_transaction,
     validate_accountless_transaction
@@ -21,7 +21,7 @@ from transactions.helpers.atomic import (
 )
 from transactions.schema import (
     AllSellerTransactionsSchema,
-    TransactionSchema,
+    TransactionPageSchema,
     TransactionAcountlessCreateSchema,
     TransactionCreateResponseSchema,
     TransactionCreateSchema
@@ -29,8 +29,16 @@ from transactions.schema import (
 from user_profiles.models import UserShippingAddress
 from utilities.errors import (
     ErrorOut,
-    ErrorsOut
+    ErrorsOut,
+    bad_parameters
 )
+from utilities.idempotency import idempotent
+from utilities.pagination import (
+    InvalidCursor,
+    paginate_queryset,
+    paginate_querysets
+)
+from typing import Optional
 
 
 router = Router()
@@ -38,35 +46,83 @@ router = Router()
 
 @router.get(
     '/my-purchases',
-    response={200: list[TransactionSchema]},
+    response={200: TransactionPageSchema, 400: ErrorOut},
     auth=django_auth
 )
-def get_my_purchases(request):
+def get_my_purchases(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    # Load what TransactionSchema nests for a whole page at once
     transactions = Transaction.objects.filter(
         buyer_id=request.user.id,
         status='SUCCEDED'
+    ).select_related(
+        'coupon',
+        'shipping_address'
+    ).prefetch_related(
+        Prefetch(
+            'transaction_pointers',
+            TransactionPointer.objects.select_related(
+                'publication_item__item__category',
+                'publication_item__publication'
+            ).order_by('id')
+        ),
+        'transaction_pointers__publication_item__publication__photos'
     )
-    return 200, transactions
+    try:
+        return 200, paginate_queryset(
+            transactions,
+            ('-created_at', '-id'),
+            cursor,
+            limit
+        )
+    except InvalidCursor:
+        return 400, bad_parameters()
 
 
 @router.get(
     '/my-sells',
-    response={200: AllSellerTransactionsSchema},
+    response={200: AllSellerTransactionsSchema, 400: ErrorOut},
     auth=django_auth
 )
-def get_my_sells(request):
+def get_my_sells(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    # Join everything the schemas nest, a page is read in one query per list
     transactions = TransactionPointer.objects.filter(
         publication_item__publication__seller_id=request.user.id,
         transaction__status='SUCCEDED'
+    ).select_related(
+        'transaction__buyer',
+        'transaction__coupon',
+        'transaction__shipping_address',
+        'publication_item__item__category'
     )
     accountless_transactions = AcountlessTransactionPointer.objects.filter(
         publication_item__publication__seller_id=request.user.id,
         transaction__status='SUCCEDED'
+    ).select_related(
+        'transaction__coupon',
+        'publication_item__item__category'
     )
-    return 200, {
-        'transaction_pointers': list(transactions),
-        'accountless_transaction_pointers': list(accountless_transactions)
-    }
+    # Pointers are created with their transaction, so the pointer id
+    # follows the transaction creation order.
+    try:
+        return 200, paginate_querysets(
+            {
+                'transaction_pointers': transactions,
+                'accountless_transaction_pointers': accountless_transactions
+            },
+            ('-id',),
+            cursor,
+            limit
+        )
+    except InvalidCursor:
+        return 400, bad_parameters()
 
 
 @router.post(
@@ -75,22 +131,25 @@ def get_my_sells(request):
         200: TransactionCreateResponseSchema,
         400: ErrorsOut,
         404: ErrorsOut,
+        409: ErrorOut,
+        422: ErrorOut,
         503: ErrorOut
     },
     auth=django_auth
 )
+@idempotent
 @transaction.non_atomic_requests
 def create_transaction(request, body: TransactionCreateSchema):
     code, error_or_none = validate_transaction(request.user, body)
     if error_or_none is not None:
         return code, error_or_none
-    user = get_user_model().objects.get(pk=request.user.id)
+    # The user is loaded again inside the generation transaction
     (
         error_or_none,
         price,
         transaction_obj,
         transaction_pointers
-    ) = atomic_transaction_generation(user)
+    ) = atomic_transaction_generation(request.user)
     if error_or_none is not None or price is None or transaction_obj is None:
         return 400, error_or_none
 
@@ -125,9 +184,12 @@ def create_transaction(request, body: TransactionCreateSchema):
         200: TransactionCreateResponseSchema,
         400: ErrorsOut,
         404: ErrorsOut,
+        409: ErrorOut,
+        422: ErrorOut,
         503: ErrorOut
     }
 )
+@idempotent
 def create_accountless_transaction(
     request,
     body: TransactionAcountlessCreateSchema
@@ -163,4 +225,3 @@ def create_accountless_transaction(
         coupon
     )
     return 200, {'payment_id': payment_id, 'widget_token': widget_tkn}
-    # return generate_accountless_transaction(body.dict(), coupon)
@@ -1,70 +1,110 @@
+from django.conf import settings
 from django.db import transaction
-from django.utils.timezone import make_aware
-from publications.models import PublicationItem
+from django.db.models import Sum
+from django.utils.timezone import now
+from transactions.helpers.reservation import release_reserved_units
 from transactions.models import (
     Transaction,
     TransactionPointer,
     AcountlessTransaction,
     AcountlessTransactionPointer
 )
+from dataclasses import dataclass
 from typing import Type, Union
 from datetime import datetime, timedelta
-from math import floor, ceil
+import logging
 
 
-_PUBLICATIONS_TO_CLEAN = 100
-_EXP_SECONDS = 15 * 60
+logger = logging.getLogger(__name__)
 
 
-@transaction.atomic
-def clean_transactions(n: int) -> None:
-    fifteen_minutes_ago = datetime.now() - timedelta(seconds=_EXP_SECONDS)
-    time_limit = make_aware(fifteen_minutes_ago)
-    clean_pointers(floor(n), Transaction, TransactionPointer, time_limit)
-    clean_pointers(
-        ceil(n),
+@dataclass
+class SweepResult:
+    transactions: int = 0
+    units: int = 0
+
+    def __add__(self, other: 'SweepResult') -> 'SweepResult':
+        return SweepResult(
+            self.transactions + other.transactions,
+            self.units + other.units
+        )
+
+
+def expiration_time_limit() -> datetime:
+    return now() - timedelta(seconds=settings.RESERVATION_EXPIRY_SECONDS)
+
+
+def clean_transactions(batch_size: int) -> SweepResult:
+    time_limit = expiration_time_limit()
+    result = release_expired_reservations(
+        batch_size,
+        Transaction,
+        TransactionPointer,
+        time_limit
+    ) + release_expired_reservations(
+        batch_size,
         AcountlessTransaction,
         AcountlessTransactionPointer,
         time_limit
     )
+    if result.transactions > 0:
+        logger.info(
+            'Released %d reserved units from %d expired transactions.',
+            result.units,
+            result.transactions
+        )
+    return result
 
 
-def clean_pointers(
-    n: int,
+@transaction.atomic
+def release_expired_reservations(
+    batch_size: int,
     transaction_model: Union[Type[Transaction], Type[AcountlessTransaction]],
     pointer_model: Union[
         Type[TransactionPointer],
         Type[AcountlessTransactionPointer]
     ],
     time_limit: datetime
-):
-    pointers_to_clean = (
-        pointer_model
-        .objects
-        .select_related('transaction')
-        .select_related('publication_item')
-        .select_for_update('publication_item')
-    ).filter(
-        transaction__created_at__lte=time_limit,
-        transaction__status='CREATED'
-    )[:n // 2]
-    publication_items = set()
-    transactions = set()
-    for pointer in pointers_to_clean:
-        pointer.publication_item.reserved -= pointer.amount
-        pointer.transaction.status = 'CANCELED'
-        publication_items.add(pointer.publication_item)
-        transactions.add(pointer.transaction)
-    PublicationItem.objects.bulk_update(publication_items, ['reserved'])
-    transaction_model.objects.bulk_update(transactions, ['status'])
+) -> SweepResult:
+    # Lock a batch of expired transactions, skipping the rows locked by
+    # another sweeper or by a webhook, /cancel or /confirm_request, which
+    # lock the transaction before changing its status.
+    expired_ids = list(
+        transaction_model.objects
+        .select_for_update(skip_locked=True)
+        .filter(created_at__lte=time_limit, status='CREATED')
+        .order_by('id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if len(expired_ids) == 0:
+        return SweepResult()
+    # Add up the reserved units per publication item
+    released_units = {
+        row['publication_item_id']: row['units']
+        for row in (
+            pointer_model.objects
+            .filter(transaction_id__in=expired_ids)
+            .values('publication_item_id')
+            .annotate(units=Sum('amount'))
+            .order_by()
+        )
+    }
+    release_reserved_units(released_units)
+    transaction_model.objects.filter(
+        id__in=expired_ids,
+        status='CREATED'
+    ).update(status='CANCELED')
+    return SweepResult(len(expired_ids), sum(released_units.values()))
 
 
 class CleanTransactionMiddleWare:
+    # Only installed when CLEAN_TRANSACTIONS_ON_REQUEST is set, the
+    # clean_transactions command is the default way to expire reservations.
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
         # Clean Transactions Here
-        clean_transactions(_PUBLICATIONS_TO_CLEAN)
+        clean_transactions(settings.RESERVATION_SWEEP_BATCH_SIZE)
         return self.get_response(request)
@@ -1,11 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from publications.models import PublicationItem
 from transactions.models import Transaction, AcountlessTransaction
-from transactions.helpers import get_publication_items_with_amount_and_lock
-from transactions.helpers.validation import (
-    validate_publication_item_availablity
+from transactions.helpers.reservation import (
+    release_reserved_units,
+    reserve_publication_items
 )
+from transactions.helpers.confirmation import register_payment
 from transactions.helpers.generation import (
     generate_transaction_pointers,
     generate_accountless_transaction_pointers
@@ -15,54 +15,46 @@ from transactions.helpers.generation import (
 @transaction.atomic
 def atomic_transaction_generation(user):
     user = get_user_model().objects.get(pk=user.id)
-    # Get publication_items with amount and lock them
+    # Get publication_items with amount
     pub_items_id_with_amount = {
-        cart_item.publication_item.id: cart_item.amount
+        cart_item.publication_item_id: cart_item.amount
         for cart_item in user.cart_items.all()
     }
-    pub_items_with_amount = get_publication_items_with_amount_and_lock(
+    # Reserve them, validating their availability
+    pub_items_with_amount, error_or_none = reserve_publication_items(
         pub_items_id_with_amount
     )
-    # Validate availability
-    _, error_or_none = validate_publication_item_availablity(
-        pub_items_with_amount
-    )
     if error_or_none is not None:
         return error_or_none, None, None, None
     # Create transaction
     transaction = Transaction(buyer=user)
-    # Generate transaction pointers, total price and shallow update pubs.
-    price, transaction_pointers, publications = generate_transaction_pointers(
+    # Generate transaction pointers and total price
+    price, transaction_pointers = generate_transaction_pointers(
         transaction,
         pub_items_with_amount
     )
-    PublicationItem.objects.bulk_update(publications, ['reserved'])
     return None, price, transaction, transaction_pointers
 
 
 @transaction.atomic
 def atomic_publication_items_reversal(transaction_pointers):
-    publication_items = set()
+    released_units = {}
     for pointer in transaction_pointers:
-        pointer.publication_item.reserved -= pointer.amount
-        publication_items.add(pointer.publication_item)
-    PublicationItem.objects.bulk_update(publication_items, ['reserved'])
+        released_units[pointer.publication_item_id] = \
+            released_units.get(pointer.publication_item_id, 0) + pointer.amount
+    release_reserved_units(released_units)
 
 
 @transaction.atomic
 def atomic_accountless_transaction_generation(body):
-    # Get publication_items with amount and lock them
+    # Get publication_items with amount and reserve them
     pub_items_id_with_amount: dict[int, int] = {
         pub['id']: pub['amount']
         for pub in body['publication_items_list']
     }
-    pub_items_with_amount = get_publication_items_with_amount_and_lock(
+    pub_items_with_amount, error_or_none = reserve_publication_items(
         pub_items_id_with_amount
     )
-    # Validate availability
-    _, error_or_none = validate_publication_item_availablity(
-        pub_items_with_amount
-    )
     if error_or_none is not None:
         return error_or_none, None, None, None
     # Create transaction
@@ -74,11 +66,10 @@ def atomic_accountless_transaction_generation(body):
         commune=body["commune"],
         address=body["address"]
     )
-    price, transaction_ptrs, pubs = generate_accountless_transaction_pointers(
+    price, transaction_ptrs = generate_accountless_transaction_pointers(
         transaction,
         pub_items_with_amount
     )
-    PublicationItem.objects.bulk_update(pubs, ['reserved'])
     return None, price, transaction, transaction_ptrs
 
 
@@ -94,6 +85,7 @@ def atomic_save_transaction(
         coupon.active = False
         coupon.save()
     transaction.save()
+    register_payment(transaction)
     transaction_pointer_model.objects.bulk_create(
         transaction_pointers,
         len(transaction_pointers)
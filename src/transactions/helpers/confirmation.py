@@ -1,6 +1,11 @@
+from django.db.models import Sum
 from typing import Type, Union
-from publications.models import PublicationItem
+from transactions.helpers.reservation import (
+    consume_reserved_units,
+    release_reserved_units
+)
 from transactions.models import (
+    PaymentRegistry,
     Transaction,
     TransactionPointer,
     AcountlessTransaction,
@@ -8,27 +13,53 @@ from transactions.models import (
 )
 
 
+def reserved_units(
+    transaction: Union[Transaction, AcountlessTransaction]
+) -> dict[int, int]:
+    # Units held by the transaction for each publication item
+    return {
+        row['publication_item_id']: row['units']
+        for row in (
+            transaction.transaction_pointers
+            .values('publication_item_id')
+            .annotate(units=Sum('amount'))
+            .order_by()
+        )
+    }
+
+
+def lock_transaction(
+    transaction: Union[Transaction, AcountlessTransaction]
+) -> Union[Transaction, AcountlessTransaction]:
+    # Reloaded with its row locked until the atomic block ends, so the
+    # sweeper, a webhook or a cancel can not change its status between
+    # checking it and acting on it
+    return type(transaction).objects.select_for_update().get(
+        pk=transaction.pk
+    )
+
+
 def confirm_transaction_payment(
-    transaction: Union[Transaction, AcountlessTransaction],
-    ptr_class: Union[
-        Type[TransactionPointer],
-        Type[AcountlessTransactionPointer]
-    ]
+    transaction: Union[Transaction, AcountlessTransaction]
 ) -> None:
-    transactions_pointers = ptr_class.objects.filter(
-        transaction=transaction
-    )
-    publication_items = list()
-    for pointer in transactions_pointers:
-        pointer.publication_item.amount -= pointer.amount
-        pointer.publication_item.reserved -= pointer.amount
-        publication_items.append(pointer.publication_item)
-    PublicationItem.objects.bulk_update(
-        publication_items,
-        ['amount', 'reserved']
-    )
+    # The transaction must be locked with lock_transaction
+    consume_reserved_units(reserved_units(transaction))
     transaction.status = 'SUCCEDED'
-    transaction.save()
+    transaction.save(update_fields=['status'])
+
+
+def register_payment(
+    transaction: Union[Transaction, AcountlessTransaction]
+) -> PaymentRegistry:
+    if isinstance(transaction, Transaction):
+        return PaymentRegistry.objects.create(
+            payment_id=transaction.payment_id,
+            transaction=transaction
+        )
+    return PaymentRegistry.objects.create(
+        payment_id=transaction.payment_id,
+        accountless_transaction=transaction
+    )
 
 
 def get_ambiguous_transaction(payment_id: str) -> Union[
@@ -38,36 +69,29 @@ def get_ambiguous_transaction(payment_id: str) -> Union[
     ],
     tuple[None, None]
 ]:
-    # Find transaction or accountless_transactions
-    transaction_query = Transaction.objects.filter(payment_id=payment_id)
-    accountless_transaction_query = AcountlessTransaction.objects.filter(
-        payment_id=payment_id
-    )
-    # Return one is found
-    if transaction_query.exists():
-        return transaction_query.get(), TransactionPointer
-    elif accountless_transaction_query.exists():
-        return (
-            accountless_transaction_query.get(),
-            AcountlessTransactionPointer
-        )
-    # Return empty tuple
-    return None, None
+    # Both kinds of transaction are registered by payment_id
+    registry = PaymentRegistry.objects.select_related(
+        'transaction',
+        'accountless_transaction'
+    ).filter(payment_id=payment_id).first()
+    if registry is None:
+        return None, None
+    if registry.transaction is not None:
+        return registry.transaction, TransactionPointer
+    return registry.accountless_transaction, AcountlessTransactionPointer
 
 
 def cancel_transaction_payment(
     transaction: Union[Transaction, AcountlessTransaction]
 ) -> tuple[int, Union[None, dict[str, str]]]:
+    # The transaction must be locked with lock_transaction, its units are
+    # released once
     if transaction.status in ('REQUESTED', 'SUCCEDED', 'CANCELED'):
         return (
             400,
             {'message': 'Transaction has already been resolved.'}
         )
     transaction.status = 'CANCELED'
-    publication_items = set()
-    for pointer in transaction.transaction_pointers.all():
-        pointer.publication_item.reserved -= pointer.amount
-        publication_items.add(pointer.publication_item)
-    PublicationItem.objects.bulk_update(publication_items, ['reserved'])
-    transaction.save()
+    release_reserved_units(reserved_units(transaction))
+    transaction.save(update_fields=['status'])
     return 200, None
@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django.utils.timezone import now
+from publications.helpers.cache import (
+    invalidate_publication_items,
+    invalidate_publications
+)
+from publications.models import Publication, PublicationItem
+from transactions.helpers import (
+    PublicationItemWithAmount,
+    get_publication_items_with_amount,
+    get_publication_items_with_amount_and_lock
+)
+from transactions.helpers.validation import (
+    validate_publication_item_availablity
+)
+from typing import Optional, Union
+
+
+def reserve_with_locks(
+    id_amount_dict: dict[int, int]
+) -> tuple[list[PublicationItemWithAmount], Union[None, dict]]:
+    # Lock every item, validate them and write the new reserved amounts
+    pub_items_with_amount = get_publication_items_with_amount_and_lock(
+        id_amount_dict
+    )
+    _, error_or_none = validate_publication_item_availablity(
+        pub_items_with_amount
+    )
+    if error_or_none is not None:
+        return [], error_or_none
+    for item in pub_items_with_amount:
+        item.pub_item.reserved += item.amount
+        item.pub_item.updated_at = now()
+    PublicationItem.objects.bulk_update(
+        [item.pub_item for item in pub_items_with_amount],
+        ['reserved', 'updated_at']
+    )
+    return pub_items_with_amount, None
+
+
+def reserve_conditionally(
+    id_amount_dict: dict[int, int]
+) -> tuple[list[PublicationItemWithAmount], Union[None, dict]]:
+    # Each item is reserved by an UPDATE that only matches while there is
+    # stock, so checkouts never wait on a SELECT FOR UPDATE. Items go in id
+    # order so concurrent checkouts take the row locks in the same order.
+    # Prices and error details are read beforehand, without any lock.
+    pub_items_with_amount = get_publication_items_with_amount(id_amount_dict)
+    active_publications = Publication.objects.filter(
+        is_active=True
+    ).values('id')
+    reserved_units = {}
+    for pub_item_id, amount in sorted(id_amount_dict.items()):
+        # The stock condition has to be on the updated row itself, postgres
+        # only checks it again after waiting for the row lock if it is not
+        # behind a join.
+        reserved = PublicationItem.objects.filter(
+            id=pub_item_id,
+            publication_id__in=active_publications,
+            amount__gte=F('reserved') + amount
+        ).update(
+            reserved=F('reserved') + amount,
+            updated_at=now()
+        )
+        if reserved == 0:
+            # Undo the items reserved so far and explain the failure like
+            # the locking engine does
+            release_reserved_units(reserved_units)
+            _, error_or_none = validate_publication_item_availablity(
+                pub_items_with_amount
+            )
+            if error_or_none is None:
+                # The stock ran out after it was read
+                error_or_none = {'errors': {
+                    f'publication_{pub_item_id}': [
+                        'No hay suficientes unidades disponibles.'
+                    ]
+                }}
+            return [], error_or_none
+        reserved_units[pub_item_id] = amount
+    for item in pub_items_with_amount:
+        item.pub_item.reserved += item.amount
+    return pub_items_with_amount, None
+
+
+_RESERVATION_ENGINES = {
+    'locking': reserve_with_locks,
+    'conditional': reserve_conditionally
+}
+
+
+def reserve_publication_items(
+    id_amount_dict: dict[int, int],
+    engine: Optional[str] = None
+) -> tuple[list[PublicationItemWithAmount], Union[None, dict]]:
+    reserve = _RESERVATION_ENGINES[engine or settings.RESERVATION_ENGINE]
+    pub_items_with_amount, error_or_none = reserve(id_amount_dict)
+    if error_or_none is None:
+        # What is available changes for the cached catalogue
+        invalidate_publications(
+            item.pub_item.publication_id for item in pub_items_with_amount
+        )
+    return pub_items_with_amount, error_or_none
+
+
+def release_reserved_units(units_by_pub_item: dict[int, int]) -> None:
+    # Release every publication item in a single statement, relative to the
+    # current value so it is safe without locking the rows first.
+    if not units_by_pub_item:
+        return
+    PublicationItem.objects.filter(
+        id__in=units_by_pub_item.keys()
+    ).update(
+        reserved=F('reserved') - Case(
+            *(
+                When(id=pub_item_id, then=Value(units))
+                for pub_item_id, units in units_by_pub_item.items()
+            ),
+            default=Value(0)
+        ),
+        updated_at=now()
+    )
+    invalidate_publication_items(units_by_pub_item.keys())
+
+
+def consume_reserved_units(units_by_pub_item: dict[int, int]) -> None:
+    # Sold units leave both the stock and the reservation, in a single
+    # statement relative to the current values like release_reserved_units.
+    if not units_by_pub_item:
+        return
+    units = Case(
+        *(
+            When(id=pub_item_id, then=Value(units))
+            for pub_item_id, units in units_by_pub_item.items()
+        ),
+        default=Value(0)
+    )
+    PublicationItem.objects.filter(
+        id__in=units_by_pub_item.keys()
+    ).update(
+        amount=F('amount') - units,
+        reserved=F('reserved') - units,
+        updated_at=now()
+    )
+    invalidate_publication_items(units_by_pub_item.keys())
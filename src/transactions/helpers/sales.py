@@ -0,0 +1,98 @@
+from django.db import connection
+from django.db.models import CharField, F, QuerySet, Value
+from django.db.models.functions import TruncDate
+from transactions.models import (
+    TransactionPointer,
+    AcountlessTransactionPointer
+)
+from datetime import date
+from typing import Optional, Type, Union
+
+
+# Grouping key and label of each kind of sales summary
+_SALES_GROUPS = {
+    'day': ('day', None),
+    'category': ('category_id', 'category_name'),
+    'publication': ('publication_id', None)
+}
+
+
+def _sold_pointers(
+    pointer_model: Union[
+        Type[TransactionPointer],
+        Type[AcountlessTransactionPointer]
+    ],
+    kind: str,
+    seller_id: int,
+    date_from: Optional[date],
+    date_to: Optional[date]
+) -> QuerySet:
+    pointers = pointer_model.objects.filter(
+        publication_item__publication__seller_id=seller_id,
+        transaction__status='SUCCEDED'
+    )
+    if date_from is not None:
+        pointers = pointers.filter(transaction__created_at__date__gte=date_from)
+    if date_to is not None:
+        pointers = pointers.filter(transaction__created_at__date__lte=date_to)
+    # Both tables have to produce the same columns for the UNION ALL
+    return pointers.values(
+        'transaction_id',
+        'amount',
+        kind=Value(kind, output_field=CharField()),
+        day=TruncDate('transaction__created_at'),
+        category_id=F('publication_item__item__category_id'),
+        category_name=F('publication_item__item__category__name'),
+        publication_id=F('publication_item__publication_id'),
+        revenue=F('amount') * F('price_per_unit')
+    ).order_by()
+
+
+def sales_summary(
+    seller_id: int,
+    group_by: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> dict[str, Union[dict, list[dict]]]:
+    # Revenue, units and orders of the seller per group, plus the totals,
+    # with one GROUP BY over the sales of both kinds of transaction.
+    sold_sql, params = _sold_pointers(
+        TransactionPointer,
+        'account',
+        seller_id,
+        date_from,
+        date_to
+    ).union(
+        _sold_pointers(
+            AcountlessTransactionPointer,
+            'accountless',
+            seller_id,
+            date_from,
+            date_to
+        ),
+        all=True
+    ).query.sql_with_params()
+    key, label = _SALES_GROUPS[group_by]
+    group = key if label is None else f'{key}, {label}'
+    with connection.cursor() as cursor:
+        # The empty grouping set adds the totals row, even without sales
+        cursor.execute(
+            f'SELECT {key}, {label or "NULL"}, GROUPING({key}), '
+            'COALESCE(SUM(revenue), 0), COALESCE(SUM(amount), 0), '
+            'COUNT(DISTINCT (kind, transaction_id)) '
+            f'FROM ({sold_sql}) AS sales '
+            f'GROUP BY GROUPING SETS (({group}), ()) '
+            f'ORDER BY GROUPING({key}), {key}',
+            params
+        )
+        rows = cursor.fetchall()
+    summary = {'group_by': group_by, 'rows': []}
+    for row_key, row_label, is_total, revenue, units, orders in rows:
+        values = {'revenue': revenue, 'units': units, 'orders': orders}
+        if is_total:
+            summary['totals'] = values
+        else:
+            summary['rows'].append(
+                {'key': str(row_key), 'label': row_label} | values
+            )
+    return summary
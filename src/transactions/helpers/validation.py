@@ -68,13 +68,23 @@ def validate_publication_item_availablity(
 
 
 def validate_signature(request) -> bool:
-    timestamp, event_signature = [
-        x.split('=')[1]
-        for x in request.headers.get('Finctoc-Signature').split(',')
-    ]
-    message = f'{timestamp}.{request.body().decode("utf-8")}'
+    # Fintoc-Signature: t=<timestamp>,v1=<signature>
+    header = request.headers.get('Fintoc-Signature')
+    if header is None:
+        return False
+    try:
+        timestamp, event_signature = [
+            x.split('=', 1)[1]
+            for x in header.split(',')
+        ]
+    except (IndexError, ValueError):
+        return False
+    body = request.body
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    message = f'{timestamp}.{body}'
     signature = hmac.new(
-        settings.fintoc_webhook_secret.encode('utf-8'),
+        settings.FINTOC_WEBHOOK_SECRET.encode('utf-8'),
         msg=message.encode('utf-8'),
         digestmod=sha256
     ).hexdigest()
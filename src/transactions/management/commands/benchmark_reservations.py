@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from publications.models import Item, Publication, PublicationItem
+from transactions.helpers.reservation import reserve_publication_items
+from utilities.benchmark import percentile
+from threading import Lock, Thread
+from time import monotonic, sleep
+from datetime import date
+from uuid import uuid4
+
+
+_ENGINES = ('locking', 'conditional')
+
+
+class Command(BaseCommand):
+
+    help: str = 'Compare the reservation engines under concurrent checkouts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--engines',
+            nargs='+',
+            choices=_ENGINES,
+            default=list(_ENGINES),
+            help='Reservation engines to benchmark.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent checkouts, each with its own connection.'
+        )
+        parser.add_argument(
+            '--checkouts',
+            type=int,
+            default=400,
+            help='Checkouts attempted against a single hot item.'
+        )
+        parser.add_argument(
+            '--stock',
+            type=int,
+            default=300,
+            help='Units of the hot item, the rest of checkouts must fail.'
+        )
+        parser.add_argument(
+            '--hold-ms',
+            type=float,
+            default=0,
+            help='Time each checkout keeps its transaction open after '
+                 'reserving, standing in for the rest of the checkout.'
+        )
+
+    def handle(self, *args, **options):
+        if settings.PROD:
+            raise CommandError(
+                'This command can not be executed in a production enviroment.'
+            )
+        for engine in options['engines']:
+            pub_item = self.create_hot_item(options['stock'])
+            try:
+                self.benchmark(engine, pub_item, options)
+            finally:
+                self.delete_hot_item(pub_item)
+
+    def create_hot_item(self, stock: int) -> PublicationItem:
+        tag = uuid4().hex[:12]
+        seller = get_user_model().objects.create(
+            username=f'benchmark-{tag}',
+            email=f'benchmark-{tag}@email.com',
+            rut=tag,
+            birthdate=date.today()
+        )
+        publication = Publication.objects.create(
+            seller=seller,
+            price=1,
+            is_active=True,
+            is_accepted=True
+        )
+        item = Item.objects.create(
+            name='benchmark',
+            brand='benchmark',
+            color='benchmark',
+            # Negative so it can not clash with a real sku
+            sku=-(int(tag, 16) % 2 ** 31)
+        )
+        return PublicationItem.objects.create(
+            item=item,
+            publication=publication,
+            amount=stock
+        )
+
+    def delete_hot_item(self, pub_item: PublicationItem) -> None:
+        publication = pub_item.publication
+        pub_item.delete()
+        pub_item.item.delete()
+        publication.delete()
+        publication.seller.delete()
+
+    def benchmark(
+        self,
+        engine: str,
+        pub_item: PublicationItem,
+        options: dict
+    ) -> None:
+        pending = [options['checkouts']]
+        latencies: list[float] = []
+        outcomes = {'reserved': 0, 'rejected': 0}
+        lock = Lock()
+
+        def checkout() -> bool:
+            with transaction.atomic():
+                _, error_or_none = reserve_publication_items(
+                    {pub_item.id: 1},
+                    engine
+                )
+                sleep(options['hold_ms'] / 1000)
+            return error_or_none is None
+
+        def worker() -> None:
+            try:
+                while True:
+                    with lock:
+                        if pending[0] == 0:
+                            return
+                        pending[0] -= 1
+                    start = monotonic()
+                    reserved = checkout()
+                    elapsed = monotonic() - start
+                    with lock:
+                        latencies.append(elapsed)
+                        outcomes['reserved' if reserved else 'rejected'] += 1
+            finally:
+                connection.close()
+
+        threads = [Thread(target=worker) for _ in range(options['workers'])]
+        start = monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = monotonic() - start
+        pub_item.refresh_from_db()
+        self.stdout.write(
+            f'{engine}: {len(latencies)} checkouts '
+            f'({outcomes["reserved"]} reserved, '
+            f'{outcomes["rejected"]} rejected) in {elapsed:.3f}s, '
+            f'{len(latencies) / elapsed:.1f} checkouts/s, '
+            f'p50 {percentile(latencies, 0.5) * 1000:.1f}ms, '
+            f'p95 {percentile(latencies, 0.95) * 1000:.1f}ms, '
+            f'p99 {percentile(latencies, 0.99) * 1000:.1f}ms'
+        )
+        # Every reserved unit must be accounted for, and never oversold
+        expected = min(options['stock'], options['checkouts'])
+        if pub_item.reserved != outcomes['reserved'] \
+                or outcomes['reserved'] != expected:
+            raise CommandError(
+                f'{engine}: {pub_item.reserved} units reserved for '
+                f'{outcomes["reserved"]} successful checkouts, '
+                f'expected {expected}.'
+            )
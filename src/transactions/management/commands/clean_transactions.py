@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from transactions.clean_transactions import SweepResult, clean_transactions
+from utilities.idempotency import delete_expired_idempotency_keys
+from utilities.workers import run_periodically
+from time import monotonic
+
+
+class Command(BaseCommand):
+
+    help: str = 'Release the stock reserved by expired transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single sweep and exit.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.RESERVATION_SWEEP_INTERVAL,
+            help='Seconds to wait between sweeps.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.RESERVATION_SWEEP_BATCH_SIZE,
+            help='Transactions of each kind released per batch.'
+        )
+
+    def handle(self, *args, **options):
+        run_periodically(
+            'clean_transactions',
+            lambda: self.sweep(options['batch_size']),
+            options['interval'],
+            options['once']
+        )
+
+    def sweep(self, batch_size: int) -> SweepResult:
+        start = monotonic()
+        result = SweepResult()
+        # Keep going while batches come back full
+        while True:
+            batch_result = clean_transactions(batch_size)
+            result = result + batch_result
+            if batch_result.transactions < batch_size:
+                break
+        self.stdout.write(
+            f'Released {result.units} reserved units from '
+            f'{result.transactions} expired transactions '
+            f'in {monotonic() - start:.3f}s.'
+        )
+        # Stored checkout responses expire on the same schedule
+        delete_expired_idempotency_keys()
+        return result
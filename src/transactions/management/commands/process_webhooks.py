@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from transactions.webhooks import (
+    WebhookResult,
+    process_webhook_events,
+    webhook_queue_stats
+)
+from utilities.workers import run_periodically
+from time import monotonic
+
+
+class Command(BaseCommand):
+
+    help: str = 'Apply the Fintoc webhook events waiting in the queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue once and exit.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.WEBHOOK_EVENTS_INTERVAL,
+            help='Seconds to wait between checks of the queue.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.WEBHOOK_EVENTS_BATCH_SIZE,
+            help='Events applied per database transaction.'
+        )
+
+    def handle(self, *args, **options):
+        run_periodically(
+            'process_webhooks',
+            lambda: self.drain(options['batch_size']),
+            options['interval'],
+            options['once']
+        )
+
+    def drain(self, batch_size: int) -> WebhookResult:
+        start = monotonic()
+        result = WebhookResult()
+        # Keep going while batches come back full
+        while True:
+            batch_result = process_webhook_events(batch_size)
+            result = result + batch_result
+            if batch_result.handled < batch_size:
+                break
+        if result.handled > 0:
+            stats = webhook_queue_stats()
+            self.stdout.write(
+                f'Applied {result.processed} webhook events, '
+                f'{result.ignored} ignored, {result.review} to review, '
+                f'{result.failed} failed, '
+                f'{result.retried} to retry in {monotonic() - start:.3f}s, '
+                f'max lag {result.max_lag:.3f}s. Queue depth {stats.depth}, '
+                f'oldest pending {stats.lag:.3f}s.'
+            )
+        return result
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0016_alter_coupon_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['buyer', 'status', '-created_at', '-id'], name='transaction_buyer_recent_idx'),
+        ),
+    ]
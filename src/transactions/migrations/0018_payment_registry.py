@@ -0,0 +1,61 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def register_existing_payments(apps, schema_editor):
+    PaymentRegistry = apps.get_model('transactions', 'PaymentRegistry')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    AcountlessTransaction = apps.get_model(
+        'transactions',
+        'AcountlessTransaction'
+    )
+    PaymentRegistry.objects.bulk_create(
+        PaymentRegistry(payment_id=payment_id, transaction_id=pk)
+        for pk, payment_id in Transaction.objects.values_list(
+            'id',
+            'payment_id'
+        ).iterator()
+    )
+    # A payment_id used by both kinds kept resolving to the Transaction
+    PaymentRegistry.objects.bulk_create(
+        (
+            PaymentRegistry(
+                payment_id=payment_id,
+                accountless_transaction_id=pk
+            )
+            for pk, payment_id in AcountlessTransaction.objects.values_list(
+                'id',
+                'payment_id'
+            ).iterator()
+        ),
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0017_transaction_transaction_buyer_recent_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentRegistry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_id', models.CharField(max_length=60, unique=True)),
+                ('accountless_transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payment_registry', to='transactions.acountlesstransaction')),
+                ('transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payment_registry', to='transactions.transaction')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='paymentregistry',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('accountless_transaction__isnull', True), ('transaction__isnull', False)), models.Q(('accountless_transaction__isnull', False), ('transaction__isnull', True)), _connector='OR'), name='paymentregistry_single_transaction'),
+        ),
+        migrations.RunPython(
+            register_existing_payments,
+            migrations.RunPython.noop
+        ),
+    ]
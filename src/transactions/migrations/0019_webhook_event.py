@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0018_payment_registry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=64, unique=True)),
+                ('payment_id', models.CharField(max_length=60)),
+                ('type', models.CharField(max_length=64)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('PENDING', 'pending'), ('PROCESSED', 'processed'), ('IGNORED', 'ignored'), ('FAILED', 'failed')], default='PENDING', max_length=9)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['payment_id', 'id'], name='webhookevent_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0019_webhook_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='acountlesstransaction',
+            name='related_indexed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='related_indexed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='acountlesstransaction',
+            index=models.Index(condition=models.Q(('related_indexed', False), ('status', 'SUCCEDED')), fields=['id'], name='acountless_unindexed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('related_indexed', False), ('status', 'SUCCEDED')), fields=['id'], name='transaction_unindexed_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0020_related_indexed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhookevent',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'pending'), ('PROCESSED', 'processed'), ('IGNORED', 'ignored'), ('REVIEW', 'needs review'), ('FAILED', 'failed')], default='PENDING', max_length=9),
+        ),
+    ]
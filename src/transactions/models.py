@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils.timezone import now
 from django.contrib.auth import get_user_model
 from publications.models import PublicationItem
 from user_profiles.models import UserShippingAddress
@@ -13,6 +14,15 @@ _TRANSACTION_STATUS = (
     ('FAILED', 'failed')
 )
 
+_WEBHOOK_EVENT_STATUS = (
+    ('PENDING', 'pending'),
+    ('PROCESSED', 'processed'),
+    ('IGNORED', 'ignored'),
+    # Paid after the transaction was canceled, to refund by hand
+    ('REVIEW', 'needs review'),
+    ('FAILED', 'failed')
+)
+
 
 class Coupon(models.Model):
     name = models.CharField(max_length=128)
@@ -21,6 +31,15 @@ class Coupon(models.Model):
     active = models.BooleanField(default=True)
 
 
+def _unindexed_sales_index(name: str) -> models.Index:
+    # Successful sales build_related_publications has yet to count
+    return models.Index(
+        fields=['id'],
+        name=name,
+        condition=models.Q(status='SUCCEDED', related_indexed=False)
+    )
+
+
 class ProtoTransaction(models.Model):
     payment_id = models.CharField(max_length=60, unique=True)
     status = models.CharField(
@@ -29,6 +48,8 @@ class ProtoTransaction(models.Model):
         choices=_TRANSACTION_STATUS
     )
     created_at = models.DateTimeField(auto_now=True)
+    # Set once a successful sale is counted by build_related_publications
+    related_indexed = models.BooleanField(default=False)
 
     class Meta:
         abstract = True
@@ -54,6 +75,16 @@ class Transaction(ProtoTransaction):
         null=True
     )
 
+    class Meta:
+        # Back the keyset pagination of the purchases listing
+        indexes = [
+            models.Index(
+                fields=['buyer', 'status', '-created_at', '-id'],
+                name='transaction_buyer_recent_idx'
+            ),
+            _unindexed_sales_index('transaction_unindexed_idx')
+        ]
+
     @property
     def publications(self):
         return (
@@ -81,6 +112,74 @@ class AcountlessTransaction(ProtoTransaction):
         null=True
     )
 
+    class Meta:
+        indexes = [
+            _unindexed_sales_index('acountless_unindexed_idx')
+        ]
+
+
+class PaymentRegistry(models.Model):
+    # Maps every payment_id to the transaction of either kind that owns it,
+    # so a Fintoc payment resolves with a single indexed lookup.
+    payment_id = models.CharField(max_length=60, unique=True)
+    transaction = models.OneToOneField(
+        Transaction,
+        on_delete=models.CASCADE,
+        related_name='payment_registry',
+        blank=True,
+        null=True
+    )
+    accountless_transaction = models.OneToOneField(
+        AcountlessTransaction,
+        on_delete=models.CASCADE,
+        related_name='payment_registry',
+        blank=True,
+        null=True
+    )
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(
+                        transaction__isnull=False,
+                        accountless_transaction__isnull=True
+                    ) | models.Q(
+                        transaction__isnull=True,
+                        accountless_transaction__isnull=False
+                    )
+                ),
+                name='paymentregistry_single_transaction'
+            )
+        ]
+
+
+class WebhookEvent(models.Model):
+    # Fintoc events are stored as received and acknowledged, the
+    # process_webhooks command applies them in order for each payment.
+    event_id = models.CharField(max_length=64, unique=True)
+    payment_id = models.CharField(max_length=60)
+    type = models.CharField(max_length=64)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=9,
+        choices=_WEBHOOK_EVENT_STATUS,
+        default='PENDING'
+    )
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(default=now)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['payment_id', 'id'],
+                condition=models.Q(status='PENDING'),
+                name='webhookevent_pending_idx'
+            )
+        ]
+
 
 class TransactionPointer(models.Model):
     transaction = models.ForeignKey(
@@ -0,0 +1,242 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from dataclasses import dataclass, field, replace
+from threading import Lock
+from time import monotonic, sleep
+from typing import Optional, Union
+from random import uniform
+from utilities.metrics import (
+    record_payment_circuit,
+    record_payment_error,
+    record_payment_event,
+    record_payment_request
+)
+from uuid import uuid4
+import logging
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying, anything else is Fintoc's final answer
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Label of the metrics of the client
+_PROVIDER = 'fintoc'
+
+
+class PaymentProviderError(Exception):
+    pass
+
+
+class CircuitOpen(PaymentProviderError):
+    pass
+
+
+@dataclass
+class PaymentClientStats:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    rejected: int = 0
+    latency_seconds_total: float = 0
+    latency_seconds_max: float = 0
+    errors: dict[str, int] = field(default_factory=dict)
+
+
+class CircuitBreaker:
+    # Closed until `threshold` consecutive failures, then open: calls fail
+    # fast for `reset_seconds`, after which a single trial call is let
+    # through and its outcome closes or reopens the circuit.
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+        self.lock = Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_running \
+                    or monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.threshold:
+                self.opened_at = monotonic()
+            self.trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+
+class PaymentClient:
+
+    def __init__(self):
+        self.session = requests.Session()
+        # Keep connections to Fintoc alive between checkouts
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=10))
+        self.breaker = CircuitBreaker(
+            settings.FINTOC_BREAKER_THRESHOLD,
+            settings.FINTOC_BREAKER_RESET_SECONDS
+        )
+        self._stats = PaymentClientStats()
+        self._stats_lock = Lock()
+
+    def stats(self) -> PaymentClientStats:
+        with self._stats_lock:
+            return replace(self._stats, errors=dict(self._stats.errors))
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            setattr(self._stats, counter, getattr(self._stats, counter) + 1)
+        record_payment_event(_PROVIDER, counter)
+
+    def _count_error(self, kind: str) -> None:
+        with self._stats_lock:
+            self._stats.errors[kind] = self._stats.errors.get(kind, 0) + 1
+        record_payment_error(_PROVIDER, kind)
+
+    def _count_request(self, latency: float) -> None:
+        with self._stats_lock:
+            self._stats.requests += 1
+            self._stats.latency_seconds_total += latency
+            self._stats.latency_seconds_max = max(
+                self._stats.latency_seconds_max,
+                latency
+            )
+        record_payment_request(_PROVIDER, latency)
+
+    def _post(self, payload: dict, idempotency_key: str) -> requests.Response:
+        headers = {
+            'Accept': 'application/json',
+            'Authorization': settings.FINTOC_KEY,
+            'Idempotency-Key': idempotency_key
+        }
+        start = monotonic()
+        try:
+            return self.session.post(
+                settings.FINTOC_PAYMENT_URI,
+                json=payload,
+                headers=headers,
+                timeout=(
+                    settings.FINTOC_CONNECT_TIMEOUT,
+                    settings.FINTOC_READ_TIMEOUT
+                )
+            )
+        finally:
+            self._count_request(monotonic() - start)
+
+    def create_payment_intent(self, price: int) -> dict:
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpen('Fintoc circuit is open')
+        try:
+            return self._create_payment_intent(price)
+        except PaymentProviderError:
+            raise
+        except BaseException:
+            # Outcomes are recorded for every error, otherwise an unexpected
+            # one, such as a worker timeout, during the trial call would
+            # keep the circuit open for good
+            self._count('failures')
+            self.breaker.record_failure()
+            raise
+        finally:
+            record_payment_circuit(_PROVIDER, self.breaker.is_open)
+
+    def _create_payment_intent(self, price: int) -> dict:
+        payload = {
+            'amount': price,
+            'currency': 'clp',
+            'recipient_account': settings.FINTOC_ACCOUNT
+        }
+        # The same key on every attempt, Fintoc creates the intent once
+        idempotency_key = str(uuid4())
+        attempts = settings.FINTOC_MAX_RETRIES + 1
+        for attempt in range(attempts):
+            if attempt > 0:
+                self._count('retries')
+                # Exponential backoff with full jitter
+                sleep(uniform(0, settings.FINTOC_RETRY_BACKOFF * 2 ** attempt))
+            try:
+                response = self._post(payload, idempotency_key)
+            except requests.RequestException as error:
+                failure = type(error).__name__
+            else:
+                if response.status_code not in _RETRY_STATUSES:
+                    # Fintoc answered, even a rejection means it is healthy
+                    self.breaker.record_success()
+                    if response.status_code != 201:
+                        self._count_error(f'status_{response.status_code}')
+                        raise PaymentProviderError(
+                            f'Fintoc answered {response.status_code}'
+                        )
+                    try:
+                        return response.json()
+                    except ValueError:
+                        self._count_error('invalid_body')
+                        raise PaymentProviderError('Fintoc sent invalid json')
+                failure = f'status_{response.status_code}'
+            self._count_error(failure)
+            logger.warning(
+                'Fintoc payment intent attempt %d/%d failed: %s',
+                attempt + 1,
+                attempts,
+                failure
+            )
+        self._count('failures')
+        self.breaker.record_failure()
+        raise PaymentProviderError(f'Fintoc failed after {attempts} attempts')
+
+
+_client: Optional[PaymentClient] = None
+_client_lock = Lock()
+
+
+def payment_client() -> PaymentClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PaymentClient()
+        return _client
+
+
+def reset_payment_client() -> None:
+    # Drop the shared client, mostly so tests start from a closed circuit
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def send_payment_intent(
+    price: int
+) -> Union[tuple[str, str], tuple[None, None]]:
+    try:
+        response_info = payment_client().create_payment_intent(price)
+    except PaymentProviderError:
+        return None, None
+    return response_info['id'], response_info['widget_token']
+
+
+# For ASGI views: runs the blocking call in a worker thread so the event
+# loop keeps serving other requests while Fintoc answers.
+send_payment_intent_async = sync_to_async(
+    send_payment_intent,
+    thread_sensitive=False
+)
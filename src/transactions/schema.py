@@ -1,6 +1,7 @@
-from typing import Optional
+from typing import Any, Literal, Optional
 from ninja.orm import create_schema
-from ninja import Schema
+from ninja import Field, Schema
+from datetime import date
 from transactions.models import (
     Transaction,
     AcountlessTransaction,
@@ -37,6 +38,11 @@ CouponSchema = create_schema(
 )
 
 
+class CouponPageSchema(Schema):
+    items: list[CouponSchema]
+    next: Optional[str]
+
+
 SuccinctCouponSchema = create_schema(
     Coupon,
     name='SuccinctCouponSchema',
@@ -55,7 +61,14 @@ TransactionPointerSchema = create_schema(
 TransactionSchema = create_schema(
     Transaction,
     name='TransactionSchema',
-    exclude=['buyer', 'payment_id', 'created_at', 'status', 'coupon'],
+    exclude=[
+        'buyer',
+        'payment_id',
+        'created_at',
+        'status',
+        'coupon',
+        'related_indexed'
+    ],
     custom_fields=[
         ('transaction_pointers', list[TransactionPointerSchema], None),
         ('coupon', SuccinctCouponSchema, None)
@@ -64,6 +77,11 @@ TransactionSchema = create_schema(
 )
 
 
+class TransactionPageSchema(Schema):
+    items: list[TransactionSchema]
+    next: Optional[str]
+
+
 class TransactionCreateSchema(Schema):
     shipping_address_id: int
     coupon_id: Optional[int]
@@ -162,6 +180,38 @@ SellerAccountlessTransactionSchema = create_schema(
 class AllSellerTransactionsSchema(Schema):
     transaction_pointers: list[SellerTransactionSchema]
     accountless_transaction_pointers: list[SellerAccountlessTransactionSchema]
+    next: Optional[str]
+
+
+class SalesSummaryFilterSchema(Schema):
+    group_by: Literal['day', 'category', 'publication'] = 'day'
+    date_from: Optional[date] = Field(None, alias='from')
+    date_to: Optional[date] = Field(None, alias='to')
+
+
+class SalesExportFilterSchema(Schema):
+    format: Literal['csv', 'jsonl'] = 'csv'
+    # 'all' exports every transaction, for admins
+    scope: Literal['sales', 'all'] = 'sales'
+    date_from: Optional[date] = Field(None, alias='from')
+    date_to: Optional[date] = Field(None, alias='to')
+
+
+class SalesTotalsSchema(Schema):
+    revenue: int
+    units: int
+    orders: int
+
+
+class SalesSummaryRowSchema(SalesTotalsSchema):
+    key: str
+    label: Optional[str]
+
+
+class SalesSummarySchema(Schema):
+    group_by: str
+    totals: SalesTotalsSchema
+    rows: list[SalesSummaryRowSchema]
 
 
 class TransactionResolveSchema(Schema):
@@ -169,5 +219,5 @@ class TransactionResolveSchema(Schema):
     type: str
     mode: Optional[str]
     createdAt: Optional[str]
-    data: Optional[dict[str, str]]
+    data: Optional[dict[str, Any]]
     object: Optional[str]
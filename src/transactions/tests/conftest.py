@@ -133,3 +133,9 @@ def generate_coupon_permissions() -> None:
     )
     admin_group = Group.objects.create(name='Admin')
     admin_group.permissions.add(coupon_permission)
+
+
+@pytest.fixture(scope="function", params=['locking', 'conditional'])
+def reservation_engine(request, settings) -> str:
+    settings.RESERVATION_ENGINE = request.param
+    return request.param
@@ -122,7 +122,7 @@ def test_deactivate_activate_coupons(
     assert ninja_client.get(
         'transactions/coupons/all',
         user=user_one
-    ).json() == [deactivated_coupon_info]
+    ).json() == {'items': [deactivated_coupon_info], 'next': None}
     # Reactivate coupon
     assert ninja_client.patch(
         'transactions/coupons/activate/1',
@@ -0,0 +1,142 @@
+import pytest
+from requests import ConnectTimeout
+from transactions.payments import (
+    CircuitOpen,
+    PaymentProviderError,
+    payment_client,
+    reset_payment_client,
+    send_payment_intent,
+    send_payment_intent_async
+)
+from unittest.mock import Mock
+from utilities.metrics import collect, registry, render
+import asyncio
+
+
+def _response(status_code: int, body: dict = None) -> Mock:
+    return Mock(status_code=status_code, json=Mock(return_value=body))
+
+
+_CREATED = _response(201, {'id': 'pmntid', 'widget_token': 'wdgttkn'})
+
+
+@pytest.fixture(scope="function")
+def client(settings):
+    settings.FINTOC_MAX_RETRIES = 2
+    settings.FINTOC_RETRY_BACKOFF = 0
+    settings.FINTOC_BREAKER_THRESHOLD = 2
+    settings.FINTOC_BREAKER_RESET_SECONDS = 60
+    reset_payment_client()
+    client = payment_client()
+    client.session.post = Mock()
+    yield client
+    reset_payment_client()
+
+
+def test_payment_intent_retries_with_the_same_key(client):
+    client.session.post.side_effect = [
+        ConnectTimeout(),
+        _response(503),
+        _CREATED
+    ]
+    assert send_payment_intent(1000) == ('pmntid', 'wdgttkn')
+    calls = client.session.post.call_args_list
+    assert len(calls) == 3
+    assert len({call.kwargs['headers']['Idempotency-Key'] for call in calls}) == 1
+    assert all(call.kwargs['timeout'] is not None for call in calls)
+    stats = client.stats()
+    assert (stats.requests, stats.retries, stats.failures) == (3, 2, 0)
+    assert stats.errors == {'ConnectTimeout': 1, 'status_503': 1}
+
+
+def test_payment_intent_rejection_is_not_retried(client):
+    client.session.post.return_value = _response(400)
+    assert send_payment_intent(1000) == (None, None)
+    assert client.session.post.call_count == 1
+    assert not client.breaker.is_open
+
+
+def test_circuit_breaker_fails_fast(client):
+    client.session.post.return_value = _response(502)
+    for _ in range(2):
+        with pytest.raises(PaymentProviderError):
+            client.create_payment_intent(1000)
+    assert client.breaker.is_open
+    assert client.session.post.call_count == 6
+    # Open circuit, Fintoc is not called at all
+    with pytest.raises(CircuitOpen):
+        client.create_payment_intent(1000)
+    assert send_payment_intent(1000) == (None, None)
+    assert client.session.post.call_count == 6
+    assert client.stats().rejected == 2
+    # After the reset time one trial call closes the circuit again
+    client.breaker.opened_at -= 60
+    client.session.post.return_value = _CREATED
+    assert send_payment_intent(1000) == ('pmntid', 'wdgttkn')
+    assert not client.breaker.is_open
+
+
+def test_payment_client_metrics(client):
+    registry.clear()
+    client.session.post.side_effect = [
+        ConnectTimeout(),
+        _response(502),
+        _response(502)
+    ]
+    with pytest.raises(PaymentProviderError):
+        client.create_payment_intent(1000)
+    client.session.post.side_effect = None
+    client.session.post.return_value = _response(503)
+    with pytest.raises(PaymentProviderError):
+        client.create_payment_intent(1000)
+    with pytest.raises(CircuitOpen):
+        client.create_payment_intent(1000)
+    metrics = render(collect()).splitlines()
+    for line in (
+        'payment_requests_total{provider="fintoc"} 6',
+        'payment_request_duration_seconds_count{provider="fintoc"} 6',
+        'payment_errors_total{provider="fintoc",kind="ConnectTimeout"} 1',
+        'payment_errors_total{provider="fintoc",kind="status_502"} 2',
+        'payment_errors_total{provider="fintoc",kind="status_503"} 3',
+        'payment_client_events_total{provider="fintoc",event="retries"} 4',
+        'payment_client_events_total{provider="fintoc",event="failures"} 2',
+        'payment_client_events_total{provider="fintoc",event="rejected"} 1',
+        '# TYPE payment_circuit_open gauge',
+        'payment_circuit_open{provider="fintoc"} 1'
+    ):
+        assert line in metrics
+    # The circuit closes again after a successful trial call
+    client.breaker.opened_at -= 60
+    client.session.post.return_value = _CREATED
+    client.create_payment_intent(1000)
+    assert 'payment_circuit_open{provider="fintoc"} 0' \
+        in render(collect()).splitlines()
+
+
+def test_circuit_breaker_trial_error(client):
+    client.session.post.return_value = _response(502)
+    for _ in range(2):
+        with pytest.raises(PaymentProviderError):
+            client.create_payment_intent(1000)
+    # An unexpected error in the trial call reopens the circuit
+    client.breaker.opened_at -= 60
+    client.session.post.side_effect = RuntimeError('Worker timeout')
+    with pytest.raises(RuntimeError):
+        client.create_payment_intent(1000)
+    assert client.breaker.is_open
+    assert not client.breaker.trial_running
+    with pytest.raises(CircuitOpen):
+        client.create_payment_intent(1000)
+    # And the next trial call is let through
+    client.breaker.opened_at -= 60
+    client.session.post.side_effect = None
+    client.session.post.return_value = _CREATED
+    assert send_payment_intent(1000) == ('pmntid', 'wdgttkn')
+    assert not client.breaker.is_open
+    assert client.stats().failures == 3
+
+
+def test_async_payment_intent(client):
+    client.session.post.return_value = _CREATED
+    assert asyncio.run(send_payment_intent_async(1000)) \
+        == ('pmntid', 'wdgttkn')
@@ -1,9 +1,37 @@
 import pytest
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
-from publications.models import Publication
+from publications.models import Publication, PublicationItem
+from transactions.clean_transactions import (
+    SweepResult,
+    clean_transactions,
+    expiration_time_limit
+)
+from transactions.helpers.confirmation import get_ambiguous_transaction
+from transactions.helpers.validation import validate_signature
+from transactions.models import (
+    Coupon,
+    Transaction,
+    TransactionPointer,
+    AcountlessTransaction,
+    AcountlessTransactionPointer,
+    WebhookEvent
+)
 from transactions.tests.conftest import _IMAGE_URI
+from transactions.webhooks import (
+    WebhookResult,
+    enqueue_webhook_event,
+    process_webhook_events,
+    webhook_queue_stats
+)
+from utilities.models import IdempotencyKey
 from unittest.mock import Mock, patch
+from datetime import date, timedelta
+from hashlib import sha256
+from urllib.parse import urlencode
+import csv
+import hmac
 import json
 
 
@@ -15,6 +43,14 @@ mock_send_payment_intent.side_effect = [
 failed_mock_send_payment_intent = Mock(return_value=(None, None))
 
 
+def succeeded_event(event_id: str, payment_id: str) -> dict:
+    return {
+        'id': event_id,
+        'type': 'payment_intent.succeeded',
+        'data': {'id': payment_id}
+    }
+
+
 def _generate_publication_permissions() -> None:
     seller_group, _ = Group.objects.get_or_create(name='Seller')
     # Check for permission to create publication
@@ -286,6 +322,7 @@ def test_accountless_transaction_creation(
 )
 def test_not_enough_amount(
     ninja_client,
+    reservation_engine,
     user_two,
     wrong_accountless_transaction_creation_info,
     generate_publication_and_permissions
@@ -324,6 +361,7 @@ def test_not_enough_amount(
 )
 def test_not_enough_available(
     ninja_client,
+    reservation_engine,
     user_two,
     correct_accountless_transaction_creation_info,
     generate_publication_and_permissions
@@ -397,6 +435,40 @@ def test_canel_transaction(
     ).json()['publication_items'][0]['available'] == 3
 
 
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@patch(
+    'transactions.api.transactions.send_payment_intent',
+    new=Mock(return_value=('pmntid', 'wdgttk'))
+)
+def test_cancel_transaction_canceled_meanwhile(
+    ninja_client,
+    correct_accountless_transaction_creation_info,
+    generate_publication_and_permissions
+):
+    assert ninja_client.post(
+        '/transactions/transactions/create_acountless/',
+        json=correct_accountless_transaction_creation_info
+    ).status_code == 200
+    # Both requests read the transaction before either canceled it
+    read_before_cancel = get_ambiguous_transaction('pmntid')
+    cancel_path = 'transactions/transaction_confirmation/cancel/pmntid'
+    assert ninja_client.patch(cancel_path).status_code == 200
+    with patch(
+        'transactions.api.confirmation.get_ambiguous_transaction',
+        new=Mock(return_value=read_before_cancel)
+    ):
+        assert ninja_client.patch(cancel_path).status_code == 400
+        # Nor is a canceled transaction requested again
+        assert ninja_client.patch(
+            'transactions/transaction_confirmation/confirm_request/pmntid'
+        ).status_code == 400
+    assert AcountlessTransaction.objects.get().status == 'CANCELED'
+    # The units are released once
+    assert ninja_client.get(
+        'publications/publications/obtener/1'
+    ).json()['publication_items'][0]['available'] == 3
+
+
 @pytest.mark.django_db(transaction=True, reset_sequences=True)
 @patch(
     'transactions.api.transactions.send_payment_intent',
@@ -448,7 +520,8 @@ def test_resolving_transaction(
     correct_accountless_transaction_creation_info,
     user_transactions_result,
     seller_transactions_result,
-    generate_publication_and_permissions
+    generate_publication_and_permissions,
+    django_assert_max_num_queries
 ):
     # add publication to user cart
     ninja_client.post(
@@ -477,22 +550,88 @@ def test_resolving_transaction(
     # resolve transaction
     assert ninja_client.post(
         '/transactions/transaction_confirmation/resolved',
-        json={'id': payment_id, 'type': 'payment_intent.succeeded'}
+        json=succeeded_event('evt_1', payment_id)
     ).status_code == 200
     assert ninja_client.post(
         '/transactions/transaction_confirmation/resolved',
-        json={'id': accountless_payment_id, 'type': 'payment_intent.succeeded'}
+        json=succeeded_event('evt_2', accountless_payment_id)
     ).status_code == 200
+    assert process_webhook_events(10) == WebhookResult(processed=2)
     # check buyer purchase list
     assert ninja_client.get(
         '/transactions/transactions/my-purchases',
         user=user_two
-    ).json() == user_transactions_result
-    # check seller 'my-sells' list
+    ).json() == {'items': user_transactions_result, 'next': None}
+    # check seller 'my-sells' list, nested fields are joined
+    with django_assert_max_num_queries(2):
+        assert ninja_client.get(
+            '/transactions/transactions/my-sells',
+            user=user_one
+        ).json() == seller_transactions_result | {'next': None}
+    # check seller sales summary
+    totals = {'revenue': 75000, 'units': 3, 'orders': 2}
     assert ninja_client.get(
-        '/transactions/transactions/my-sells',
+        '/transactions/sales/summary?group_by=category',
+        user=user_one
+    ).json() == {
+        'group_by': 'category',
+        'totals': totals,
+        'rows': [{'key': '1', 'label': 'categorytest'} | totals]
+    }
+    today = date.today()
+    assert ninja_client.get(
+        '/transactions/sales/summary?' + urlencode({'from': today}),
+        user=user_one
+    ).json()['rows'] == [{'key': str(today), 'label': None} | totals]
+    assert ninja_client.get(
+        '/transactions/sales/summary?' + urlencode({
+            'group_by': 'publication',
+            'from': today + timedelta(days=1)
+        }),
+        user=user_one
+    ).json() == {
+        'group_by': 'publication',
+        'totals': {'revenue': 0, 'units': 0, 'orders': 0},
+        'rows': []
+    }
+    # buyers have no sales
+    assert ninja_client.get(
+        '/transactions/sales/summary',
+        user=user_two
+    ).json()['totals'] == {'revenue': 0, 'units': 0, 'orders': 0}
+    # export seller sales
+    response = ninja_client.get(
+        '/transactions/sales/export?format=csv',
+        user=user_one
+    )
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/csv'
+    rows = list(csv.DictReader(response.content.decode('utf-8').splitlines()))
+    assert [
+        (row['kind'], row['payment_id'], row['buyer_email'], row['total'])
+        for row in rows
+    ] == [
+        ('account', payment_id, 'js2@email.com', '50000'),
+        ('accountless', accountless_payment_id, '', '25000')
+    ]
+    # admins export every transaction
+    get_user_model().objects.get(pk=user_one.id).user_permissions.add(
+        Permission.objects.create(
+            id=1010,
+            codename='can_read',
+            name='Can read transaction',
+            content_type=ContentType.objects.get_for_model(Transaction)
+        )
+    )
+    lines = ninja_client.get(
+        '/transactions/sales/export?format=jsonl&scope=all',
         user=user_one
-    ).json() == seller_transactions_result
+    ).content.decode('utf-8').splitlines()
+    assert [json.loads(line)['amount'] for line in lines] == [2, 1]
+    assert ninja_client.get(
+        '/transactions/sales/export?scope=all',
+        user=user_two
+    ).status_code == 403
 
 
 @pytest.mark.django_db(transaction=True, reset_sequences=True)
@@ -577,13 +716,14 @@ def test_resolving_transaction_with_coupons(
     # resolve transaction
     assert ninja_client.post(
         '/transactions/transaction_confirmation/resolved',
-        json={'id': payment_id, 'type': 'payment_intent.succeeded'}
+        json=succeeded_event('evt_1', payment_id)
     ).status_code == 200
     # resolve accountless transaction
     assert ninja_client.post(
         '/transactions/transaction_confirmation/resolved',
-        json={'id': accountless_payment_id, 'type': 'payment_intent.succeeded'}
+        json=succeeded_event('evt_2', accountless_payment_id)
     ).status_code == 200
+    assert process_webhook_events(10) == WebhookResult(processed=2)
 
     # update response info to contain coupons
     succint_coupon_info = {**coupon_creation_info} | {'id': 1}
@@ -593,7 +733,7 @@ def test_resolving_transaction_with_coupons(
     assert ninja_client.get(
         '/transactions/transactions/my-purchases',
         user=user_two
-    ).json() == user_transactions_result
+    ).json() == {'items': user_transactions_result, 'next': None}
 
     # update response info to contain coupons
     second_succinct_coupon_info = {**second_coupon_creation_info} | {'id': 2}
@@ -608,7 +748,7 @@ def test_resolving_transaction_with_coupons(
     assert ninja_client.get(
         '/transactions/transactions/my-sells',
         user=user_one
-    ).json() == seller_transactions_result
+    ).json() == seller_transactions_result | {'next': None}
 
 
 @pytest.mark.django_db(transaction=True, reset_sequences=True)
@@ -618,6 +758,7 @@ def test_resolving_transaction_with_coupons(
 )
 def test_transaction_restoration(
     ninja_client,
+    reservation_engine,
     user_two,
     publication_get_info,
     generate_publication_and_permissions
@@ -642,3 +783,377 @@ def test_transaction_restoration(
     assert ninja_client.get(
         '/publications/publications/obtener/1'
     ).json() == accepted_publication_get_info
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@patch(
+    'transactions.api.transactions.send_payment_intent',
+    new=mock_send_payment_intent
+)
+def test_clean_expired_transactions(
+    ninja_client,
+    reservation_engine,
+    user_two,
+    correct_accountless_transaction_creation_info,
+    generate_publication_and_permissions
+):
+    # reserve one unit with a user transaction and two accountless
+    ninja_client.post(
+        '/publications/shopping_cart/add_to_cart/1',
+        json={'amount': 1},
+        user=user_two
+    )
+    assert ninja_client.post(
+        '/transactions/transactions/create/',
+        json={'shipping_address_id': 1},
+        user=user_two
+    ).status_code == 200
+    assert ninja_client.post(
+        '/transactions/transactions/create_acountless/',
+        json=correct_accountless_transaction_creation_info | {
+            'publication_items_list': [{'id': 1, 'amount': 2}]
+        }
+    ).status_code == 200
+    assert ninja_client.get(
+        'publications/publications/obtener/1'
+    ).json()['publication_items'][0]['available'] == 0
+    # nothing has expired yet
+    assert clean_transactions(10) == SweepResult(0, 0)
+    # expire both transactions
+    expired_at = expiration_time_limit() - timedelta(seconds=1)
+    Transaction.objects.update(created_at=expired_at)
+    AcountlessTransaction.objects.update(created_at=expired_at)
+    assert clean_transactions(10) == SweepResult(2, 3)
+    assert ninja_client.get(
+        'publications/publications/obtener/1'
+    ).json()['publication_items'][0]['available'] == 3
+    assert Transaction.objects.get().status == 'CANCELED'
+    assert AcountlessTransaction.objects.get().status == 'CANCELED'
+    # released transactions are not released twice
+    assert clean_transactions(10) == SweepResult(0, 0)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_idempotent_transaction_creation(
+    ninja_client,
+    correct_accountless_transaction_creation_info,
+    generate_publication_and_permissions
+):
+    payment_intent = Mock(side_effect=[
+        ('pmntid1', 'wdgttk1'),
+        ('pmntid2', 'wdgttk2')
+    ])
+    body = correct_accountless_transaction_creation_info | {
+        'publication_items_list': [{'id': 1, 'amount': 1}]
+    }
+    with patch(
+        'transactions.api.transactions.send_payment_intent',
+        new=payment_intent
+    ):
+        responses = [
+            ninja_client.post(
+                '/transactions/transactions/create_acountless/',
+                json=body,
+                headers={'Idempotency-Key': 'checkout-1'}
+            )
+            for _ in range(2)
+        ]
+        # the retry gets the original payment without reserving again
+        assert [response.status_code for response in responses] == [200, 200]
+        assert responses[0].json() == responses[1].json() == {
+            'payment_id': 'pmntid1',
+            'widget_token': 'wdgttk1'
+        }
+        assert payment_intent.call_count == 1
+        assert AcountlessTransaction.objects.count() == 1
+        assert ninja_client.get(
+            'publications/publications/obtener/1'
+        ).json()['publication_items'][0]['available'] == 2
+        # the same key can not be used for another checkout
+        response = ninja_client.post(
+            '/transactions/transactions/create_acountless/',
+            json=body | {'publication_items_list': [{'id': 1, 'amount': 2}]},
+            headers={'Idempotency-Key': 'checkout-1'}
+        )
+        assert response.status_code == 422
+        assert payment_intent.call_count == 1
+        # a new key is a new checkout
+        assert ninja_client.post(
+            '/transactions/transactions/create_acountless/',
+            json=body,
+            headers={'Idempotency-Key': 'checkout-2'}
+        ).status_code == 200
+        assert payment_intent.call_count == 2
+        assert AcountlessTransaction.objects.count() == 2
+        # keys that could not be stored are rejected before the checkout
+        response = ninja_client.post(
+            '/transactions/transactions/create_acountless/',
+            json=body,
+            headers={'Idempotency-Key': 'k' * 256}
+        )
+        assert response.status_code == 400
+        assert list(response.json()['errors']) == ['Idempotency-Key']
+        assert payment_intent.call_count == 2
+        assert IdempotencyKey.objects.count() == 2
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@patch(
+    'transactions.api.transactions.send_payment_intent',
+    new=mock_send_payment_intent
+)
+def test_payment_lookup_is_a_single_query(
+    ninja_client,
+    user_two,
+    correct_accountless_transaction_creation_info,
+    generate_publication_and_permissions,
+    django_assert_num_queries
+):
+    ninja_client.post(
+        '/publications/shopping_cart/add_to_cart/1',
+        json={'amount': 1},
+        user=user_two
+    )
+    assert ninja_client.post(
+        '/transactions/transactions/create/',
+        json={'shipping_address_id': 1},
+        user=user_two
+    ).status_code == 200
+    assert ninja_client.post(
+        '/transactions/transactions/create_acountless/',
+        json=correct_accountless_transaction_creation_info | {
+            'publication_items_list': [{'id': 1, 'amount': 1}]
+        }
+    ).status_code == 200
+    transaction = Transaction.objects.get()
+    accountless_transaction = AcountlessTransaction.objects.get()
+    with django_assert_num_queries(1):
+        assert get_ambiguous_transaction(transaction.payment_id) == (
+            transaction,
+            TransactionPointer
+        )
+    with django_assert_num_queries(1):
+        assert get_ambiguous_transaction(
+            accountless_transaction.payment_id
+        ) == (accountless_transaction, AcountlessTransactionPointer)
+    with django_assert_num_queries(1):
+        assert get_ambiguous_transaction('unknown') == (None, None)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@patch(
+    'transactions.api.transactions.send_payment_intent',
+    new=Mock(return_value=('pmntid', 'wdgttk'))
+)
+@patch(
+    'transactions.api.confirmation.validate_signature',
+    new=Mock(return_value=True)
+)
+def test_webhook_events_queue(
+    ninja_client,
+    correct_accountless_transaction_creation_info,
+    generate_publication_and_permissions
+):
+    assert ninja_client.post(
+        '/transactions/transactions/create_acountless/',
+        json=correct_accountless_transaction_creation_info | {
+            'publication_items_list': [{'id': 1, 'amount': 1}]
+        }
+    ).status_code == 200
+    # Fintoc retries are stored once
+    for _ in range(2):
+        assert ninja_client.post(
+            '/transactions/transaction_confirmation/resolved',
+            json=succeeded_event('evt_1', 'pmntid')
+        ).status_code == 200
+    assert ninja_client.post(
+        '/transactions/transaction_confirmation/resolved',
+        json=succeeded_event('evt_2', 'pmntid') | {
+            'type': 'payment_intent.failed'
+        }
+    ).status_code == 200
+    assert ninja_client.post(
+        '/transactions/transaction_confirmation/resolved',
+        json={'id': 'evt_3', 'type': 'payment_intent.succeeded'}
+    ).status_code == 400
+    assert webhook_queue_stats().depth == 2
+    # Nothing is applied until the worker runs
+    assert AcountlessTransaction.objects.get().status == 'CREATED'
+    # Events of a payment are applied one at a time in order, the failure
+    # arriving after the confirmation is ignored
+    assert process_webhook_events(10) == WebhookResult(processed=1)
+    assert AcountlessTransaction.objects.get().status == 'SUCCEDED'
+    assert process_webhook_events(10) == WebhookResult(ignored=1)
+    assert AcountlessTransaction.objects.get().status == 'SUCCEDED'
+    assert webhook_queue_stats().depth == 0
+    publication_item = ninja_client.get(
+        'publications/publications/obtener/1'
+    ).json()['publication_items'][0]
+    assert publication_item['available'] == 2
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@patch(
+    'transactions.api.transactions.send_payment_intent',
+    new=Mock(side_effect=[('pmntid', 'wdgttk'), ('pmntid2', 'wdgttk2')])
+)
+@patch(
+    'transactions.api.confirmation.validate_signature',
+    new=Mock(return_value=True)
+)
+def test_webhook_payment_of_swept_transaction(
+    ninja_client,
+    correct_accountless_transaction_creation_info,
+    generate_publication_and_permissions
+):
+    assert ninja_client.post(
+        '/transactions/transactions/create_acountless/',
+        json=correct_accountless_transaction_creation_info | {
+            'publication_items_list': [{'id': 1, 'amount': 1}]
+        }
+    ).status_code == 200
+    # The reservation expires and its unit is reserved by someone else
+    AcountlessTransaction.objects.update(
+        created_at=expiration_time_limit() - timedelta(seconds=1)
+    )
+    assert clean_transactions(10) == SweepResult(1, 1)
+    assert ninja_client.post(
+        '/transactions/transactions/create_acountless/',
+        json=correct_accountless_transaction_creation_info | {
+            'publication_items_list': [{'id': 1, 'amount': 3}]
+        }
+    ).status_code == 200
+    # The payment goes through anyway
+    assert ninja_client.post(
+        '/transactions/transaction_confirmation/resolved',
+        json=succeeded_event('evt_1', 'pmntid')
+    ).status_code == 200
+    assert process_webhook_events(10) == WebhookResult(review=1)
+    event = WebhookEvent.objects.get()
+    assert (event.status, event.attempts) == ('REVIEW', 1)
+    # Neither the swept transaction nor the other reservation change
+    swept = AcountlessTransaction.objects.order_by('id').first()
+    assert swept.status == 'CANCELED'
+    publication_item = PublicationItem.objects.get(id=1)
+    assert (publication_item.amount, publication_item.reserved) == (3, 3)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@patch(
+    'transactions.api.transactions.send_payment_intent',
+    new=Mock(return_value=('pmntid', 'wdgttk'))
+)
+def test_webhook_payment_swept_meanwhile(
+    ninja_client,
+    correct_accountless_transaction_creation_info,
+    generate_publication_and_permissions
+):
+    assert ninja_client.post(
+        '/transactions/transactions/create_acountless/',
+        json=correct_accountless_transaction_creation_info | {
+            'publication_items_list': [{'id': 1, 'amount': 1}]
+        }
+    ).status_code == 200
+    # The worker read the transaction just before the sweeper canceled it
+    read_before_sweep = get_ambiguous_transaction('pmntid')
+    AcountlessTransaction.objects.update(
+        created_at=expiration_time_limit() - timedelta(seconds=1)
+    )
+    assert clean_transactions(10) == SweepResult(1, 1)
+    enqueue_webhook_event(
+        'evt_1',
+        'pmntid',
+        'payment_intent.succeeded',
+        succeeded_event('evt_1', 'pmntid')
+    )
+    with patch(
+        'transactions.webhooks.get_ambiguous_transaction',
+        new=Mock(return_value=read_before_sweep)
+    ):
+        assert process_webhook_events(10) == WebhookResult(review=1)
+    # The released unit is not consumed again nor the status overwritten
+    assert AcountlessTransaction.objects.get().status == 'CANCELED'
+    publication_item = PublicationItem.objects.get(id=1)
+    assert (publication_item.amount, publication_item.reserved) == (3, 0)
+
+
+def test_validate_webhook_signature(settings):
+    settings.FINTOC_WEBHOOK_SECRET = 'whsec'
+    body = json.dumps(succeeded_event('evt_1', 'pmntid'))
+    signature = hmac.new(
+        b'whsec',
+        msg=f'1700000000.{body}'.encode('utf-8'),
+        digestmod=sha256
+    ).hexdigest()
+    request = Mock(
+        body=body.encode('utf-8'),
+        headers={'Fintoc-Signature': f't=1700000000,v1={signature}'}
+    )
+    assert validate_signature(request)
+    request.headers = {'Fintoc-Signature': 't=1700000001,v1=' + signature}
+    assert not validate_signature(request)
+    request.headers = {}
+    assert not validate_signature(request)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_purchases_and_sales_query_budgets(
+    ninja_client,
+    user_one,
+    user_two,
+    assert_query_budget,
+    generate_publication_and_permissions
+):
+    def add_sales(size: int) -> None:
+        for i in range(Transaction.objects.count(), size):
+            transaction = Transaction.objects.create(
+                buyer_id=user_two.id,
+                shipping_address_id=1,
+                payment_id=f'budget{i}',
+                status='SUCCEDED',
+                coupon=Coupon.objects.create(
+                    name='budget',
+                    code=f'budget{i}',
+                    discount_percentage=10
+                )
+            )
+            TransactionPointer.objects.create(
+                transaction=transaction,
+                publication_item_id=1,
+                amount=1,
+                price_per_unit=25000
+            )
+            accountless_transaction = AcountlessTransaction.objects.create(
+                payment_id=f'accountlessbudget{i}',
+                status='SUCCEDED',
+                buyer_name='John',
+                buyer_lastname='Smith',
+                phone_number='+569000002',
+                address='address',
+                region='region',
+                commune='commune'
+            )
+            AcountlessTransactionPointer.objects.create(
+                transaction=accountless_transaction,
+                publication_item_id=1,
+                amount=1,
+                price_per_unit=25000
+            )
+
+    query = urlencode({'limit': 50})
+    assert_query_budget(
+        lambda: ninja_client.get(
+            f'/transactions/transactions/my-purchases?{query}',
+            user=user_two
+        ),
+        add_sales,
+        budget=3
+    )
+    assert_query_budget(
+        lambda: ninja_client.get(
+            f'/transactions/transactions/my-sells?{query}',
+            user=user_one
+        ),
+        add_sales,
+        budget=2
+    )
@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, Min, OuterRef
+from django.utils.timezone import now
+from transactions.helpers.confirmation import (
+    confirm_transaction_payment,
+    get_ambiguous_transaction,
+    lock_transaction
+)
+from transactions.mail import (
+    get_email_and_send,
+    send_purchase_succeded_email,
+    send_purchase_failed_email
+)
+from transactions.models import WebhookEvent
+from dataclasses import dataclass, field
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+_SUCCEEDED_EVENTS = ('payment_intent.succeeded',)
+_FAILED_EVENTS = ('payment_intent.failed', 'payment_intent.rejected')
+
+
+@dataclass
+class WebhookResult:
+    processed: int = 0
+    ignored: int = 0
+    failed: int = 0
+    # Failed events that stay pending to be tried again
+    retried: int = 0
+    # Payments that need a manual review or a refund
+    review: int = 0
+    # Longest time an event of the batch waited in the queue
+    max_lag: float = field(default=0, compare=False)
+
+    @property
+    def handled(self) -> int:
+        return self.processed + self.ignored + self.failed + self.retried \
+            + self.review
+
+    def __add__(self, other: 'WebhookResult') -> 'WebhookResult':
+        return WebhookResult(
+            self.processed + other.processed,
+            self.ignored + other.ignored,
+            self.failed + other.failed,
+            self.retried + other.retried,
+            self.review + other.review,
+            max(self.max_lag, other.max_lag)
+        )
+
+
+@dataclass
+class WebhookQueueStats:
+    depth: int
+    # Seconds the oldest pending event has been waiting
+    lag: float
+
+
+def enqueue_webhook_event(
+    event_id: str,
+    payment_id: str,
+    event_type: str,
+    payload: dict
+) -> bool:
+    # Fintoc retries deliveries, an event already stored is not added again
+    _, created = WebhookEvent.objects.get_or_create(
+        event_id=event_id,
+        defaults={
+            'payment_id': payment_id,
+            'type': event_type,
+            'payload': payload
+        }
+    )
+    return created
+
+
+def webhook_queue_stats() -> WebhookQueueStats:
+    stats = WebhookEvent.objects.filter(status='PENDING').aggregate(
+        depth=Count('id'),
+        oldest=Min('received_at')
+    )
+    lag = 0 if stats['oldest'] is None \
+        else (now() - stats['oldest']).total_seconds()
+    return WebhookQueueStats(stats['depth'], lag)
+
+
+def apply_webhook_event(event: WebhookEvent) -> str:
+    # Returns the status the event ends up with
+    transaction_obj, _ = get_ambiguous_transaction(event.payment_id)
+    if transaction_obj is None:
+        return 'IGNORED'
+    transaction_obj = lock_transaction(transaction_obj)
+    if transaction_obj.status in ('SUCCEDED', 'FAILED'):
+        return 'IGNORED'
+    if transaction_obj.status == 'CANCELED':
+        # Its units were already released, maybe reserved again by other
+        # buyers, so they can not be consumed. A payment that went through
+        # anyway has to be refunded or sorted out by hand.
+        if event.type not in _SUCCEEDED_EVENTS:
+            return 'IGNORED'
+        logger.error(
+            'Payment %s succeeded for a canceled transaction, event %s '
+            'needs a manual review or a refund.',
+            event.payment_id,
+            event.event_id
+        )
+        return 'REVIEW'
+    if event.type in _SUCCEEDED_EVENTS:
+        confirm_transaction_payment(transaction_obj)
+        get_email_and_send(
+            None,
+            transaction_obj,
+            send_purchase_succeded_email
+        )
+    elif event.type in _FAILED_EVENTS:
+        transaction_obj.status = 'FAILED'
+        transaction_obj.save(update_fields=['status'])
+        get_email_and_send(
+            None,
+            transaction_obj,
+            send_purchase_failed_email
+        )
+    else:
+        return 'IGNORED'
+    return 'PROCESSED'
+
+
+@transaction.atomic
+def process_webhook_events(batch_size: int) -> WebhookResult:
+    # Only the oldest pending event of each payment can be taken, so the
+    # events of a payment are applied in the order they were received even
+    # with several workers. Later ones are picked up by the next batch.
+    earlier_pending = WebhookEvent.objects.filter(
+        status='PENDING',
+        payment_id=OuterRef('payment_id'),
+        id__lt=OuterRef('id')
+    )
+    events = list(
+        WebhookEvent.objects
+        .select_for_update(skip_locked=True)
+        .filter(status='PENDING')
+        .exclude(Exists(earlier_pending))
+        .order_by('id')[:batch_size]
+    )
+    result = WebhookResult()
+    for event in events:
+        event.attempts += 1
+        try:
+            # A failing event rolls back on its own
+            with transaction.atomic():
+                event.status = apply_webhook_event(event)
+        except Exception as error:
+            event.last_error = f'{type(error).__name__}: {error}'
+            if event.attempts >= settings.WEBHOOK_EVENTS_MAX_ATTEMPTS:
+                event.status = 'FAILED'
+                result.failed += 1
+            else:
+                result.retried += 1
+            logger.exception('Failed to apply webhook event %s.', event.id)
+            continue
+        event.processed_at = now()
+        result.max_lag = max(
+            result.max_lag,
+            (event.processed_at - event.received_at).total_seconds()
+        )
+        if event.status == 'PROCESSED':
+            result.processed += 1
+        elif event.status == 'REVIEW':
+            result.review += 1
+        else:
+            result.ignored += 1
+    WebhookEvent.objects.bulk_update(
+        events,
+        ['status', 'attempts', 'last_error', 'processed_at']
+    )
+    return result
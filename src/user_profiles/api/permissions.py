@@ -1,5 +1,6 @@
 from ninja import Router
 from user_profiles.models import UserProfile
+from user_profiles.principal import get_principal, invalidate_principal
 from user_profiles.schema import UserProfileSchema
 from utilities.errors import ErrorOut, error404
 from django.contrib.auth.models import Group
@@ -17,12 +18,13 @@ router = Router()
     }
 )
 def assign_seller(request, user_profile_id: int):
-    if not request.user.has_perm('user_profiles.assign_seller'):
+    if not get_principal(request).has_perm('user_profiles.assign_seller'):
         return 403, None
     user_profile_query = UserProfile.objects.filter(pk=user_profile_id)
     if user_profile_query.exists():
         user_profile = user_profile_query[0]
         user_profile.groups.add(Group.objects.get(name='Seller'))
+        invalidate_principal(user_profile.id)
         return 200, user_profile
     else:
         return 404, error404('id', 'User Profile')['id']
@@ -37,12 +39,13 @@ def assign_seller(request, user_profile_id: int):
     }
 )
 def assign_admin(request, user_profile_id: int):
-    if not request.user.has_perm('user_profiles.assign_admin'):
+    if not get_principal(request).has_perm('user_profiles.assign_admin'):
         return 403, None
     user_profile_query = UserProfile.objects.filter(pk=user_profile_id)
     if user_profile_query.exists():
         user_profile = user_profile_query[0]
         user_profile.groups.add(Group.objects.get(name='Admin'))
+        invalidate_principal(user_profile.id)
         return 200, user_profile
     else:
         return 404, error404('id', 'User Profile')['id']
@@ -57,12 +60,13 @@ def assign_admin(request, user_profile_id: int):
     }
 )
 def remove_seller(request, user_profile_id: int):
-    if not request.user.has_perm('user_profiles.assign_seller'):
+    if not get_principal(request).has_perm('user_profiles.assign_seller'):
         return 403, None
     user_profile_query = UserProfile.objects.filter(pk=user_profile_id)
     if user_profile_query.exists():
         user_profile = user_profile_query[0]
         user_profile.groups.remove(Group.objects.get(name='Seller'))
+        invalidate_principal(user_profile.id)
         return 204, None
     else:
         return 404, error404('id', 'User Profile')['id']
@@ -77,12 +81,13 @@ def remove_seller(request, user_profile_id: int):
     }
 )
 def remove_admin(request, user_profile_id: int):
-    if not request.user.has_perm('user_profiles.assign_admin'):
+    if not get_principal(request).has_perm('user_profiles.assign_admin'):
         return 403, None
     user_profile_query = UserProfile.objects.filter(pk=user_profile_id)
     if user_profile_query.exists():
         user_profile = user_profile_query[0]
         user_profile.groups.remove(Group.objects.get(name='Admin'))
+        invalidate_principal(user_profile.id)
         return 204, None
     else:
         return 404, error404('id', 'User Profile')['id']
@@ -1,5 +1,6 @@
 from ninja import Router
 from ninja.security import django_auth
+from django.db import transaction
 from django.contrib.auth import (
     login as django_login,
     logout as django_logout
@@ -8,6 +9,7 @@ from user_profiles.tokens import email_confrimation_token_generator
 from user_profiles.models import UserProfile, UserShippingAddress
 from user_profiles.schema import (
     PublicUserProfileSchema,
+    UserProfilePageSchema,
     UserProfileSchema,
     UserProfileCreationSchema,
     UserShippingAddressSchema,
@@ -21,7 +23,16 @@ from user_profiles.forms import (
     UserShippingAddressCreationForm
 )
 from user_profiles.mail import send_confirmation_email
-from utilities.errors import ErrorsOut, ErrorOut, missing_permission, not_found
+from user_profiles.principal import get_principal, invalidate_principal
+from utilities.errors import (
+    ErrorsOut,
+    ErrorOut,
+    bad_parameters,
+    missing_permission,
+    not_found
+)
+from utilities.pagination import InvalidCursor, paginate_queryset
+from typing import Optional
 
 
 router = Router()
@@ -30,7 +41,7 @@ _LOGIN_BACKEND = 'user_auth.backend.EmailBackend'
 
 @router.get('/me', response=UserProfileSchema, auth=django_auth)
 def get_user(request):
-    return UserProfile.objects.get(id=request.user.id)
+    return UserProfile.objects.with_group_names().get(id=request.user.id)
 
 
 @router.get(
@@ -54,15 +65,29 @@ def get_seller(request, seller_id: int):
 @router.get(
     '/all',
     response={
-        200: list[UserProfileSchema],
+        200: UserProfilePageSchema,
+        400: ErrorOut,
         403: ErrorOut
     },
     auth=django_auth
 )
-def get_all_users(request):
-    if not request.user.has_perm('user_profiles.can_get_all_user_profiles'):
+def get_all_users(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    user = get_principal(request)
+    if not user.has_perm('user_profiles.can_get_all_user_profiles'):
         return 403, missing_permission()
-    return 200, UserProfile.objects.filter(is_active=True)
+    try:
+        return 200, paginate_queryset(
+            UserProfile.objects.with_group_names().filter(is_active=True),
+            ('date_joined', 'id'),
+            cursor,
+            limit
+        )
+    except InvalidCursor:
+        return 400, bad_parameters()
 
 
 @router.post(
@@ -77,8 +102,9 @@ def create_user(request, body: UserProfileCreationSchema):
         return 400, {'errors': {'user': ['A session already exists.']}}
     form = UserCreationForm(body.dict())
     if form.is_valid():
-        user = form.save()
-        send_confirmation_email(user, request)
+        with transaction.atomic():
+            user = form.save()
+            send_confirmation_email(user, request)
         django_login(request, user, backend=_LOGIN_BACKEND)
         return 200, user
     else:
@@ -90,6 +116,7 @@ def remove_user(request):
     user = UserProfile.objects.get(pk=request.user.id)
     user.is_active = False
     user.save()
+    invalidate_principal(user.id)
     django_logout(request)
     return 204, None
 
@@ -104,7 +131,7 @@ def remove_user(request):
     auth=django_auth
 )
 def remove_user_by_id(request, user_id: int):
-    if not request.user.has_perm('user_profiles.can_delete_user'):
+    if not get_principal(request).has_perm('user_profiles.can_delete_user'):
         return 403, missing_permission()
     user_query = UserProfile.objects.filter(id=user_id)
     if not user_query.exists():
@@ -114,6 +141,7 @@ def remove_user_by_id(request, user_id: int):
         return 403, {'message': 'Target user is an Admin.'}
     user.is_active = False
     user.save()
+    invalidate_principal(user.id)
     return 204, None
 
 
@@ -129,9 +157,10 @@ def update_user(request, body: UserUpdateSchema):
     user = UserProfile.objects.get(id=request.user.id)
     form = UserUpdateForm(body.dict(), instance=user)
     if form.is_valid():
-        user = form.save()
-        if not user.email_verified:
-            send_confirmation_email(user, request)
+        with transaction.atomic():
+            user = form.save()
+            if not user.email_verified:
+                send_confirmation_email(user, request)
         return 200, user
     else:
         return 400, {'errors': dict(form.errors)}
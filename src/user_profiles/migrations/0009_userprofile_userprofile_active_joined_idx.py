@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profiles', '0008_alter_usershippingaddress_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['is_active', 'date_joined', 'id'], name='userprofile_active_joined_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:16
+
+from django.db import migrations
+import user_profiles.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profiles', '0009_userprofile_userprofile_active_joined_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='userprofile',
+            managers=[
+                ('objects', user_profiles.models.UserProfileManager()),
+            ],
+        ),
+    ]
@@ -1,8 +1,23 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.postgres.aggregates import ArrayAgg
 from utilities.models import phone_regex
 
 
+class UserProfileQuerySet(models.QuerySet):
+
+    def with_group_names(self):
+        # Users without groups get [None], so is_admin and is_seller are
+        # answered without a query per user.
+        return self.annotate(
+            group_names=ArrayAgg('groups__name', distinct=True)
+        )
+
+
+class UserProfileManager(UserManager.from_queryset(UserProfileQuerySet)):
+    pass
+
+
 class UserProfile(AbstractUser):
     email_verified = models.BooleanField(default=False)
     phone_number = models.CharField(
@@ -12,16 +27,32 @@ class UserProfile(AbstractUser):
     rut = models.CharField(max_length=20, unique=True)
     birthdate = models.DateField()
 
+    objects = UserProfileManager()
+
+    def in_group(self, name: str) -> bool:
+        if hasattr(self, 'group_names'):
+            return name in self.group_names
+        return self.groups.filter(name=name).exists()
+
     @property
     def is_seller(self) -> bool:
-        return self.groups.filter(name='Seller').exists()
+        return self.in_group('Seller')
 
     @property
     def is_admin(self) -> bool:
-        return self.groups.filter(name='Admin').exists()
+        return self.in_group('Admin')
 
     REQUIRED_FIELDS = ['phone_number', 'rut', 'birthdate']
 
+    class Meta(AbstractUser.Meta):
+        # Back the keyset pagination of the user listing
+        indexes = [
+            models.Index(
+                fields=['is_active', 'date_joined', 'id'],
+                name='userprofile_active_joined_idx'
+            )
+        ]
+
 
 class UserShippingAddress(models.Model):
     user = models.ForeignKey(
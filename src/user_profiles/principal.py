@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db.models import Q
+from user_profiles.models import UserProfile
+from dataclasses import dataclass
+
+
+_CACHE_KEY = 'principal:{}'
+
+
+@dataclass(frozen=True)
+class Principal:
+    # The permissions and groups of the requesting user, loaded once per
+    # request instead of re-fetching the user and its permissions per check.
+    id: int
+    is_active: bool
+    is_superuser: bool
+    groups: frozenset[str]
+    permissions: frozenset[str]
+
+    @property
+    def is_admin(self) -> bool:
+        return 'Admin' in self.groups
+
+    @property
+    def is_seller(self) -> bool:
+        return 'Seller' in self.groups
+
+    def has_perm(self, perm: str) -> bool:
+        # Same rules as the ModelBackend for active users
+        if not self.is_active:
+            return False
+        return self.is_superuser or perm in self.permissions
+
+
+def load_principal(user_id: int) -> Principal:
+    user = UserProfile.objects.with_group_names().values(
+        'id',
+        'is_active',
+        'is_superuser',
+        'group_names'
+    ).get(pk=user_id)
+    permissions = Permission.objects.filter(
+        Q(user=user_id) | Q(group__user=user_id)
+    ).values_list('content_type__app_label', 'codename').distinct()
+    return Principal(
+        user['id'],
+        user['is_active'],
+        user['is_superuser'],
+        frozenset(name for name in user['group_names'] if name is not None),
+        frozenset(
+            f'{app_label}.{codename}'
+            for app_label, codename in permissions
+        )
+    )
+
+
+def get_principal(request) -> Principal:
+    # Kept on the request, and across requests for PRINCIPAL_CACHE_TTL
+    # seconds when it is set.
+    principal = vars(request).get('_principal')
+    if principal is not None and principal.id == request.user.id:
+        return principal
+    key = _CACHE_KEY.format(request.user.id)
+    if settings.PRINCIPAL_CACHE_TTL > 0:
+        principal = cache.get(key)
+    if principal is None:
+        principal = load_principal(request.user.id)
+        if settings.PRINCIPAL_CACHE_TTL > 0:
+            cache.set(key, principal, settings.PRINCIPAL_CACHE_TTL)
+    request._principal = principal
+    return principal
+
+
+def invalidate_principal(user_id: int) -> None:
+    # Called whenever the groups, permissions or status of a user change
+    cache.delete(_CACHE_KEY.format(user_id))
@@ -1,6 +1,8 @@
+from ninja import Schema
 from ninja.orm import create_schema
 from django.contrib.auth import get_user_model
 from user_profiles.models import UserShippingAddress
+from typing import Optional
 
 
 UserSchemaMixin = create_schema(
@@ -37,6 +39,11 @@ UserProfileSchema = create_schema(
 )
 
 
+class UserProfilePageSchema(Schema):
+    items: list[UserProfileSchema]
+    next: Optional[str]
+
+
 class UserProfileCreationSchema(UserSchemaMixin):
     password1: str
     password2: str
@@ -1,5 +1,10 @@
 import pytest
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from publications.models import Publication
+from user_profiles.principal import get_principal
+from unittest.mock import Mock
 
 
 @pytest.fixture(scope="function")
@@ -57,3 +62,49 @@ def test_remove_seller_permission(
     super_user.has_perm.assert_called_with(
         'user_profiles.assign_seller'
     )
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_principal_is_cached_until_groups_change(
+    ninja_client,
+    settings,
+    super_user,
+    user_one,
+    user_one_creation_info,
+    django_assert_num_queries
+):
+    settings.PRINCIPAL_CACHE_TTL = 60
+    cache.clear()
+    seller_group, _ = Group.objects.get_or_create(name='Seller')
+    seller_group.permissions.add(Permission.objects.create(
+        id=1000,
+        codename='can_create',
+        name='Can create publication',
+        content_type=ContentType.objects.get_for_model(Publication)
+    ))
+    ninja_client.post(
+        '/user_profiles/user_profiles/create',
+        json=user_one_creation_info
+    )
+    # Loaded once, then checked without queries
+    request = Mock(user=user_one)
+    with django_assert_num_queries(2):
+        principal = get_principal(request)
+    with django_assert_num_queries(0):
+        assert get_principal(request) is principal
+        assert get_principal(Mock(user=user_one)) == principal
+        assert not principal.is_seller
+        assert not principal.has_perm('publications.can_create')
+    # Changing the groups invalidates the cached permissions
+    ninja_client.patch(
+        '/user_profiles/permissions/assign_seller/1',
+        user=super_user
+    )
+    principal = get_principal(Mock(user=user_one))
+    assert principal.is_seller
+    assert principal.has_perm('publications.can_create')
+    ninja_client.patch(
+        '/user_profiles/permissions/remove_seller/1',
+        user=super_user
+    )
+    assert not get_principal(Mock(user=user_one)).is_seller
@@ -307,7 +307,8 @@ def test_get_all_users(
     user_one_get_info,
     user_two_creation_info,
     user_two_get_info,
-    super_user
+    super_user,
+    django_assert_num_queries
 ):
     # Create user 1
     ninja_client.post(
@@ -319,11 +320,15 @@ def test_get_all_users(
         '/user_profiles/user_profiles/create',
         json=user_two_creation_info
     )
-    # Get users that are active (1 and 2)
-    assert ninja_client.get(
-        '/user_profiles/user_profiles/all',
-        user=super_user
-    ).json() == [user_one_get_info, user_two_get_info]
+    # Get users that are active (1 and 2), groups are read with the users
+    with django_assert_num_queries(1):
+        assert ninja_client.get(
+            '/user_profiles/user_profiles/all',
+            user=super_user
+        ).json() == {
+            'items': [user_one_get_info, user_two_get_info],
+            'next': None
+        }
     super_user.has_perm.assert_called_with(
         'user_profiles.can_get_all_user_profiles'
     )
@@ -336,7 +341,45 @@ def test_get_all_users(
     assert ninja_client.get(
         '/user_profiles/user_profiles/all',
         user=super_user
-    ).json() == [user_two_get_info]
+    ).json() == {'items': [user_two_get_info], 'next': None}
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_get_all_users_paginated(
+    ninja_client,
+    user_one_creation_info,
+    user_one_get_info,
+    user_two_creation_info,
+    user_two_get_info,
+    super_user
+):
+    # Create users 1 and 2
+    ninja_client.post(
+        '/user_profiles/user_profiles/create',
+        json=user_one_creation_info
+    )
+    ninja_client.post(
+        '/user_profiles/user_profiles/create',
+        json=user_two_creation_info
+    )
+    # Get first page
+    first_page = ninja_client.get(
+        '/user_profiles/user_profiles/all?limit=1',
+        user=super_user
+    ).json()
+    assert first_page['items'] == [user_one_get_info]
+    assert first_page['next'] is not None
+    # Get second and last page
+    assert ninja_client.get(
+        '/user_profiles/user_profiles/all?limit=1'
+        + f'&cursor={first_page["next"]}',
+        user=super_user
+    ).json() == {'items': [user_two_get_info], 'next': None}
+    # Fail with a malformed cursor
+    assert ninja_client.get(
+        '/user_profiles/user_profiles/all?cursor=malformed',
+        user=super_user
+    ).status_code == 400
 
 
 @pytest.mark.django_db(transaction=True, reset_sequences=True)
@@ -380,7 +423,7 @@ def test_delete_user_by_id(
     assert ninja_client.get(
         '/user_profiles/user_profiles/all',
         user=super_user
-    ).json() == []
+    ).json() == {'items': [], 'next': None}
 
 
 @pytest.mark.django_db(transaction=True, reset_sequences=True)
@@ -0,0 +1,33 @@
+from typing import Iterable
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if len(values) == 0:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(
+    latencies: list[float],
+    queries: list[int],
+    statuses: Iterable[int],
+    elapsed: float
+) -> dict:
+    # Latencies in milliseconds, statuses of 500 and above count as errors
+    return {
+        'requests': len(latencies),
+        'errors': sum(1 for status in statuses if status >= 500),
+        'throughput': len(latencies) / elapsed if elapsed > 0 else 0,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.5) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'max': max(latencies, default=0) * 1000
+        },
+        'queries': {
+            'mean': sum(queries) / len(queries) if queries else 0,
+            'p95': percentile(queries, 0.95),
+            'max': max(queries, default=0)
+        }
+    }
@@ -0,0 +1,54 @@
+from django.db import connection
+from django.db.models import Model
+from itertools import islice
+from typing import Iterable
+import csv
+import io
+
+
+class _CsvStream:
+    # File-like reader psycopg2 pulls the rows of a COPY from, so rows are
+    # generated as they are sent and never held in memory all at once.
+
+    def __init__(self, rows: Iterable[tuple], batch_size: int):
+        self._rows = iter(rows)
+        self._batch_size = batch_size
+        self._pending = ''
+        self.count = 0
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._pending) < size:
+            batch = list(islice(self._rows, self._batch_size))
+            if not batch:
+                break
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            self._pending += buffer.getvalue()
+            self.count += len(batch)
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+def copy_rows(
+    model: type[Model],
+    fields: list[str],
+    rows: Iterable[tuple],
+    batch_size: int
+) -> int:
+    # COPY is an order of magnitude faster than bulk_create. Values are
+    # written as csv, so strings must not be empty, those are read as NULL.
+    # Rows are generated while the COPY runs, they can not run queries.
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(model._meta.get_field(name).column) for name in fields
+    )
+    stream = _CsvStream(rows, batch_size)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote(model._meta.db_table)} ({columns}) '
+            'FROM STDIN WITH (FORMAT csv)',
+            stream
+        )
+    return stream.count
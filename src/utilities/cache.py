@@ -0,0 +1,177 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Event, Lock
+from time import monotonic, sleep, time_ns
+from typing import Any, Callable, Iterable, Optional
+import json
+
+
+# Cached reads go through two tiers: an in-process LRU and a shared tier,
+# any django cache backend (CACHE_SHARED_ALIAS), so every worker sees the
+# same entries. Entries are never deleted, each key includes the versions
+# of the entities it was built from and writes bump those versions instead.
+_VERSION_KEY = 'version:{}'
+_VALUE_KEY = 'cached:{}:{}'
+_LOCK_KEY = 'lock:{}'
+_LOCK_POLL_INTERVAL = 0.05
+
+
+class LocalCache:
+    # Least recently used entries are evicted past max_entries
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[tuple[Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: tuple[Any], ttl: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+local_cache = LocalCache(settings.CACHE_LOCAL_MAX_ENTRIES)
+
+# Misses being computed in this process, other requests for the same key
+# wait for them instead of querying the database again.
+_in_flight: dict[str, Event] = {}
+_in_flight_lock = Lock()
+
+
+def _shared_cache():
+    return caches[settings.CACHE_SHARED_ALIAS]
+
+
+def get_versions(names: Iterable[str]) -> dict[str, int]:
+    shared = _shared_cache()
+    keys = {name: _VERSION_KEY.format(name) for name in names}
+    stored = shared.get_many(keys.values())
+    versions = {}
+    for name, key in keys.items():
+        if key not in stored:
+            # A version that was never bumped, or evicted, starts at the
+            # current time so it can not match an entry stored before.
+            shared.add(key, time_ns(), None)
+            stored[key] = shared.get(key)
+        versions[name] = stored[key]
+    return versions
+
+
+def _bump_versions(names: tuple[str, ...]) -> None:
+    shared = _shared_cache()
+    for name in names:
+        key = _VERSION_KEY.format(name)
+        try:
+            shared.incr(key)
+        except ValueError:
+            shared.set(key, time_ns(), None)
+
+
+def bump_versions(*names: str) -> None:
+    # Bumped once the changes are committed, otherwise a concurrent read
+    # could cache the old rows under the new versions.
+    if names:
+        transaction.on_commit(lambda: _bump_versions(names))
+
+
+def _wait_for_shared(shared, key: str) -> Optional[tuple[Any]]:
+    # Another worker holds the lock of the key, wait for it to store the
+    # value, up to CACHE_LOCK_TIMEOUT seconds.
+    deadline = monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while monotonic() < deadline:
+        sleep(_LOCK_POLL_INTERVAL)
+        entry = shared.get(key)
+        if entry is not None:
+            return entry
+        if shared.get(_LOCK_KEY.format(key)) is None:
+            return None
+    return None
+
+
+def _compute_once(key: str, compute: Callable[[], Any]) -> tuple[Any]:
+    shared = _shared_cache()
+    lock_key = _LOCK_KEY.format(key)
+    locked = shared.add(lock_key, True, settings.CACHE_LOCK_TIMEOUT)
+    if not locked:
+        entry = _wait_for_shared(shared, key)
+        if entry is not None:
+            return entry
+    try:
+        entry = (compute(),)
+        shared.set(key, entry, settings.CACHE_TTL)
+    finally:
+        if locked:
+            shared.delete(lock_key)
+    return entry
+
+
+def cached(
+    namespace: str,
+    params: tuple,
+    versions: Iterable[str],
+    compute: Callable[[], Any]
+) -> Any:
+    # Returns what compute returned for the same params and versions.
+    # Values must be picklable and are shared between requests, so they
+    # should not be mutated.
+    if settings.CACHE_TTL <= 0:
+        return compute()
+    versions = get_versions(versions)
+    digest = sha1(
+        json.dumps([sorted(versions.items()), params], default=str)
+        .encode('utf-8')
+    ).hexdigest()
+    key = _VALUE_KEY.format(namespace, digest)
+    while True:
+        entry = local_cache.get(key)
+        if entry is None:
+            entry = _shared_cache().get(key)
+            if entry is not None:
+                local_cache.set(key, entry, settings.CACHE_TTL)
+        if entry is not None:
+            return entry[0]
+        with _in_flight_lock:
+            flight = _in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _in_flight[key] = Event()
+        if not leader:
+            # Read the tiers again once the leader is done, if it failed
+            # this request tries itself.
+            if not flight.wait(settings.CACHE_LOCK_TIMEOUT):
+                return compute()
+            continue
+        try:
+            entry = _compute_once(key, compute)
+            local_cache.set(key, entry, settings.CACHE_TTL)
+            return entry[0]
+        finally:
+            with _in_flight_lock:
+                del _in_flight[key]
+            flight.set()
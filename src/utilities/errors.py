@@ -37,5 +37,22 @@ def inactive_publication():
     return {'message': "The Publication is not active"}
 
 
+def idempotency_key_reused():
+    return {'message': "Idempotency-Key already used for another request"}
+
+
+def idempotency_key_too_long(max_length: int):
+    return {'errors': {'Idempotency-Key': [
+        f'Ensure this value has at most {max_length} characters.'
+    ]}}
+
+
+def idempotency_key_in_progress():
+    return {
+        'message': "Conflict: a request with this Idempotency-Key is "
+                   "still in progress"
+    }
+
+
 def item_already_exists(dict1, dict2):
     return {"item for that sku": dict1, "your attempted item": dict2}
\ No newline at end of file
@@ -0,0 +1,59 @@
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from functools import wraps
+from hashlib import sha1
+from typing import Any, Callable, Optional
+import json
+
+
+def make_etag(*parts: Any) -> str:
+    # A strong ETag, the same parts always describe the same body
+    digest = sha1(
+        json.dumps(parts, default=str, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    # If-None-Match uses the weak comparison
+    return '*' in etags or etag.strip('"') in (
+        tag.removeprefix('W/').strip('"') for tag in etags
+    )
+
+
+def conditional(etag_func: Callable[..., Optional[str]]) -> Callable:
+    """
+    Answers a GET with 304 Not Modified when its If-None-Match matches the
+    ETag that etag_func returns for the arguments of the view, other than
+    the request, before the view runs. Otherwise the api adds the ETag to
+    the response of the view. etag_func returns None for nothing to tag.
+    """
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag = etag_func(*args, **kwargs)
+            if etag is None:
+                return view(request, *args, **kwargs)
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                response = HttpResponse(status=304)
+                response['ETag'] = etag
+                return response
+            request._etag = etag
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request_etag(request) -> Optional[str]:
+    # The ETag conditional computed for the request, if any
+    return vars(request).get('_etag')
+
+
+def add_etag(request, response: HttpResponse) -> HttpResponse:
+    etag = request_etag(request)
+    if etag is not None and response.status_code == 200:
+        response['ETag'] = etag
+    return response
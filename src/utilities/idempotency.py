@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.db import connection
+from django.utils.timezone import now
+from utilities.errors import (
+    idempotency_key_in_progress,
+    idempotency_key_reused,
+    idempotency_key_too_long
+)
+from utilities.models import IdempotencyKey
+from datetime import timedelta
+from functools import wraps
+from hashlib import sha256
+from time import monotonic, sleep
+from typing import Callable, Optional
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Longer keys could not be stored, they are rejected before running the view
+IDEMPOTENCY_KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+# Polling interval while another request holds the same key
+_LOCK_POLL_SECONDS = 0.05
+
+
+def _request_hash(request) -> str:
+    body = request.body
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return sha256(request.path.encode('utf-8') + b'\0' + body).hexdigest()
+
+
+def _lock_id(scope: str, key: str) -> int:
+    # Advisory locks take a signed 64 bit integer
+    digest = sha256(f'{scope}\0{key}'.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+def _acquire_lock(lock_id: int, timeout: float) -> bool:
+    deadline = monotonic() + timeout
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [lock_id])
+            if cursor.fetchone()[0]:
+                return True
+            if monotonic() >= deadline:
+                return False
+            sleep(_LOCK_POLL_SECONDS)
+
+
+def _release_lock(lock_id: int) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_id])
+
+
+def _stored_key(scope: str, key: str) -> Optional[IdempotencyKey]:
+    expiry = now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    return IdempotencyKey.objects.filter(
+        scope=scope,
+        key=key,
+        created_at__gt=expiry
+    ).first()
+
+
+def delete_expired_idempotency_keys() -> int:
+    expiry = now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(
+        created_at__lte=expiry
+    ).delete()
+    return deleted
+
+
+def idempotent(view: Callable) -> Callable:
+    """
+    Replays the stored response of a view returning (status, body) when a
+    request repeats its Idempotency-Key. Requests sharing a key run one at
+    a time, so a concurrent retry waits for the first one and gets its
+    response. Server errors are not stored and can be retried.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None or key == '':
+            return view(request, *args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return 400, idempotency_key_too_long(IDEMPOTENCY_KEY_MAX_LENGTH)
+        user_id = request.user.id if request.user.is_authenticated else None
+        scope = f'{view.__module__}.{view.__name__}:{user_id}'
+        request_hash = _request_hash(request)
+        lock_id = _lock_id(scope, key)
+        if not _acquire_lock(lock_id, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return 409, idempotency_key_in_progress()
+        try:
+            stored = _stored_key(scope, key)
+            if stored is not None:
+                if stored.request_hash != request_hash:
+                    return 422, idempotency_key_reused()
+                return stored.status_code, stored.response
+            status_code, response = view(request, *args, **kwargs)
+            if status_code < 500:
+                IdempotencyKey.objects.update_or_create(
+                    scope=scope,
+                    key=key,
+                    defaults={
+                        'request_hash': request_hash,
+                        'status_code': status_code,
+                        'response': response,
+                        'created_at': now()
+                    }
+                )
+            return status_code, response
+        finally:
+            _release_lock(lock_id)
+    return wrapper
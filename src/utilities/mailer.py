@@ -1,6 +1,29 @@
-from conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
 from django.template import loader
+from django.utils.timezone import now
+from utilities.models import EmailOutbox
+from dataclasses import dataclass
+from datetime import timedelta
+from smtplib import SMTPConnectError, SMTPException, SMTPServerDisconnected
+from typing import Optional
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutboxResult:
+    sent: int = 0
+    failed: int = 0
+    # Left for later without an attempt, the SMTP server was unreachable
+    deferred: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
 
 
 def send_email(
@@ -10,18 +33,156 @@ def send_email(
     context,
     from_email=settings.EMAIL_DEFAULT_FROM,
     html_email_template_name=None,
-):
+) -> EmailOutbox:
     """
     Based on: django.contrib.auth.forms.PasswordResetForm
-    Send a django.core.mail.EmailMultiAlternatives to 'to_email'.
+    Render an email for 'to_email' and queue it in the outbox, it is
+    committed along with the caller's transaction and delivered by the
+    send_outbox command.
     """
     subject = loader.render_to_string(subject_template_name, context)
     subject = "".join(subject.splitlines())
     body = loader.render_to_string(email_template_name, context)
-
-    message = EmailMultiAlternatives(subject, body, from_email, [to_email])
+    html_body = None
     if html_email_template_name is not None:
-        html_email = loader.render_to_string(html_email_template_name, context)
-        message.attach_alternative(html_email, 'text/html')
+        html_body = loader.render_to_string(html_email_template_name, context)
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email,
+        to_email=to_email
+    )
+
+
+def _build_message(email: EmailOutbox) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(
+        email.subject,
+        email.body,
+        email.from_email,
+        [email.to_email]
+    )
+    if email.html_body is not None:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(
+        settings.EMAIL_OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.EMAIL_OUTBOX_MAX_RETRY_DELAY
+    ))
+
+
+def _connection_lost(error: Exception) -> bool:
+    # Errors of the connection itself rather than of a single message,
+    # smtplib errors are OSErrors as well
+    return isinstance(error, (SMTPConnectError, SMTPServerDisconnected)) \
+        or (
+            isinstance(error, OSError)
+            and not isinstance(error, SMTPException)
+        )
+
+
+def _error_message(error: Exception) -> str:
+    return f'{type(error).__name__}: {error}'
+
+
+def _close(connection) -> None:
+    # A broken connection may fail to close as well
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def _open(connection) -> Optional[Exception]:
+    _close(connection)
+    try:
+        connection.open()
+    except Exception as error:
+        return error
+    return None
+
+
+def _send(connection, email: EmailOutbox) -> Optional[Exception]:
+    try:
+        connection.send_messages([_build_message(email)])
+    except Exception as error:
+        return error
+    return None
+
+
+def _defer(emails: list[EmailOutbox], error: Exception) -> None:
+    # The emails wait for the first retry delay, they did not fail
+    # themselves so they keep their attempts
+    next_attempt_at = now() + retry_delay(1)
+    for email in emails:
+        email.last_error = _error_message(error)
+        email.next_attempt_at = next_attempt_at
+
+
+def _send_batch(emails: list[EmailOutbox], result: OutboxResult) -> None:
+    # Send the whole batch over a single SMTP connection. If the server
+    # drops it, it is opened again and the message sent once more, while
+    # the server can not be reached the rest of the batch is deferred.
+    connection = get_connection()
+    open_error = _open(connection)
+    if open_error is not None:
+        _defer(emails, open_error)
+        result.deferred = len(emails)
+        return
+    try:
+        for position, email in enumerate(emails):
+            error = _send(connection, email)
+            if error is not None and _connection_lost(error):
+                open_error = _open(connection)
+                error = open_error or _send(connection, email)
+            if open_error is not None or (
+                error is not None and _connection_lost(error)
+            ):
+                _defer(emails[position:], error)
+                result.deferred = len(emails) - position
+                return
+            email.attempts += 1
+            if error is not None:
+                email.last_error = _error_message(error)
+                if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    email.status = 'FAILED'
+                else:
+                    email.next_attempt_at = now() + retry_delay(email.attempts)
+                result.failed += 1
+            else:
+                email.status = 'SENT'
+                email.sent_at = now()
+                result.sent += 1
+    finally:
+        _close(connection)
+
 
-    message.send()
+@transaction.atomic
+def deliver_outbox(batch_size: int) -> OutboxResult:
+    # Lock a batch of due emails, skipping the ones another sender has
+    emails = list(
+        EmailOutbox.objects
+        .select_for_update(skip_locked=True)
+        .filter(status='PENDING', next_attempt_at__lte=now())
+        .order_by('next_attempt_at', 'id')[:batch_size]
+    )
+    result = OutboxResult()
+    if len(emails) == 0:
+        return result
+    _send_batch(emails, result)
+    EmailOutbox.objects.bulk_update(
+        emails,
+        ['attempts', 'status', 'last_error', 'next_attempt_at', 'sent_at']
+    )
+    if result.failed > 0:
+        logger.warning('Failed to send %d outbox emails.', result.failed)
+    if result.deferred > 0:
+        logger.warning(
+            'Could not reach the SMTP server, %d outbox emails deferred: %s',
+            result.deferred,
+            emails[-1].last_error
+        )
+    return result
@@ -0,0 +1,487 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils.timezone import now
+from publications.models import Category, Item, Publication, PublicationItem
+from transactions.models import Transaction
+from user_profiles.models import UserProfile, UserShippingAddress
+from utilities.benchmark import summarize
+from utilities.metrics_middleware import QueryCounter
+from collections import defaultdict
+from dataclasses import dataclass, field
+from hashlib import sha256
+from pathlib import Path
+from random import Random
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Callable
+from unittest import mock
+from uuid import uuid4
+import hmac
+import json
+
+
+_DEFAULT_MIX = 'browse=70,cart=20,checkout=8,webhook=2'
+_API = '/api'
+_PAYMENT_INTENT = 'transactions.api.transactions.send_payment_intent'
+
+
+@dataclass
+class Sample:
+    operation: str
+    status: int
+    latency: float
+    queries: int
+
+
+@dataclass
+class Catalogue:
+    # What the requests pick from, ids are drawn from their ranges, so a
+    # few may point at deleted rows, just like real traffic.
+    publication_ids: tuple[int, int]
+    pub_item_ids: tuple[int, int]
+    category_ids: list[int]
+    brands: list[str]
+    buyers: list[tuple[int, int]]
+    payment_ids: list[str] = field(default_factory=list)
+    lock: Lock = field(default_factory=Lock)
+
+    def add_payment_id(self, payment_id: str) -> None:
+        with self.lock:
+            self.payment_ids.append(payment_id)
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for entry in mix.split(','):
+        name, _, weight = entry.partition('=')
+        if name not in _SCENARIOS:
+            raise CommandError(
+                f'Unknown scenario {name}, '
+                f'choose from {", ".join(_SCENARIOS)}.'
+            )
+        try:
+            weights[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name}: {weight}.')
+    if sum(weights.values()) <= 0:
+        raise CommandError('The mix needs a positive weight.')
+    return weights
+
+
+def load_catalogue(buyer_limit: int) -> Catalogue:
+    publications = Publication.objects.filter(is_active=True).aggregate(
+        first=Min('id'),
+        last=Max('id')
+    )
+    pub_items = PublicationItem.objects.filter(
+        publication__is_active=True
+    ).aggregate(first=Min('id'), last=Max('id'))
+    if publications['first'] is None or pub_items['first'] is None:
+        raise CommandError('No active publications, run dummy_db first.')
+    # Buyers with a shipping address, so they can check out
+    buyers = list(
+        UserShippingAddress.objects.filter(
+            user__is_active=True
+        ).exclude(
+            user__groups__name='Seller'
+        ).order_by('user_id', 'id').distinct('user_id').values_list(
+            'user_id',
+            'id'
+        )[:buyer_limit]
+    )
+    if not buyers:
+        raise CommandError('No buyers with a shipping address.')
+    return Catalogue(
+        publication_ids=(publications['first'], publications['last']),
+        pub_item_ids=(pub_items['first'], pub_items['last']),
+        category_ids=list(Category.objects.values_list('id', flat=True)),
+        brands=list(
+            Item.objects.order_by('brand').values_list(
+                'brand',
+                flat=True
+            ).distinct()[:100]
+        ),
+        buyers=buyers,
+        payment_ids=list(
+            Transaction.objects.order_by('-id').values_list(
+                'payment_id',
+                flat=True
+            )[:1000]
+        )
+    )
+
+
+class Session:
+    # One per worker thread: an anonymous client for browsing and a logged
+    # in client for each of its buyers.
+
+    def __init__(
+        self,
+        catalogue: Catalogue,
+        buyers: list[tuple[int, int]],
+        rng: Random,
+        record: Callable[[Sample], None]
+    ):
+        self.catalogue = catalogue
+        self.buyers = buyers
+        self.rng = rng
+        self.record = record
+        self.anonymous = Client()
+        self.clients: dict[int, Client] = {}
+        self.counter = QueryCounter()
+
+    def client_of(self, buyer_id: int) -> Client:
+        client = self.clients.get(buyer_id)
+        if client is None:
+            client = self.clients[buyer_id] = Client()
+            client.force_login(UserProfile.objects.get(id=buyer_id))
+        return client
+
+    def request(
+        self,
+        operation: str,
+        client: Client,
+        method: str,
+        path: str,
+        **kwargs
+    ):
+        queries = self.counter.queries
+        start = monotonic()
+        response = getattr(client, method)(f'{_API}{path}', **kwargs)
+        self.record(Sample(
+            operation,
+            response.status_code,
+            monotonic() - start,
+            self.counter.queries - queries
+        ))
+        return response
+
+    def random_id(self, id_range: tuple[int, int]) -> int:
+        return self.rng.randint(*id_range)
+
+    def browse(self) -> None:
+        choice = self.rng.random()
+        if choice < 0.35:
+            self.request(
+                'browse:active',
+                self.anonymous,
+                'get',
+                '/publications/publications/active'
+            )
+        elif choice < 0.7:
+            publication_id = self.random_id(self.catalogue.publication_ids)
+            self.request(
+                'browse:detail',
+                self.anonymous,
+                'get',
+                f'/publications/publications/obtener/{publication_id}'
+            )
+        elif choice < 0.85 and self.catalogue.brands:
+            self.request(
+                'browse:search',
+                self.anonymous,
+                'get',
+                '/publications/publications/search',
+                data={'q': self.rng.choice(self.catalogue.brands)}
+            )
+        elif choice < 0.95 and self.catalogue.category_ids:
+            self.request(
+                'browse:filter',
+                self.anonymous,
+                'get',
+                '/publications/publications/filter',
+                data={
+                    'category': self.rng.choice(self.catalogue.category_ids)
+                }
+            )
+        else:
+            self.request(
+                'browse:categories',
+                self.anonymous,
+                'get',
+                '/publications/categories/all'
+            )
+
+    def add_to_cart(self, operation: str, client: Client) -> None:
+        pub_item_id = self.random_id(self.catalogue.pub_item_ids)
+        self.request(
+            operation,
+            client,
+            'post',
+            f'/publications/shopping_cart/add_to_cart/{pub_item_id}',
+            data={'amount': 1},
+            content_type='application/json'
+        )
+
+    def cart(self) -> None:
+        buyer_id, _ = self.rng.choice(self.buyers)
+        client = self.client_of(buyer_id)
+        if self.rng.random() < 0.5:
+            self.add_to_cart('cart:add', client)
+        else:
+            self.request(
+                'cart:show',
+                client,
+                'get',
+                '/publications/shopping_cart/shopping_cart/me'
+            )
+
+    def checkout(self) -> None:
+        buyer_id, address_id = self.rng.choice(self.buyers)
+        client = self.client_of(buyer_id)
+        self.add_to_cart('checkout:add', client)
+        response = self.request(
+            'checkout:create',
+            client,
+            'post',
+            '/transactions/transactions/create/',
+            data={'shipping_address_id': address_id},
+            content_type='application/json'
+        )
+        if response.status_code != 200:
+            return
+        payment_id = response.json()['payment_id']
+        self.request(
+            'checkout:confirm',
+            client,
+            'patch',
+            '/transactions/transaction_confirmation/confirm_request/'
+            f'{payment_id}'
+        )
+        self.catalogue.add_payment_id(payment_id)
+
+    def webhook(self) -> None:
+        with self.catalogue.lock:
+            payment_id = self.rng.choice(self.catalogue.payment_ids) \
+                if self.catalogue.payment_ids else f'pi_{uuid4().hex}'
+        body = json.dumps({
+            'id': f'evt_{uuid4().hex}',
+            'type': 'payment_intent.succeeded',
+            'mode': 'test',
+            'createdAt': now().isoformat(),
+            'data': {'id': payment_id},
+            'object': 'event'
+        })
+        timestamp = int(now().timestamp())
+        signature = hmac.new(
+            settings.FINTOC_WEBHOOK_SECRET.encode('utf-8'),
+            msg=f'{timestamp}.{body}'.encode('utf-8'),
+            digestmod=sha256
+        ).hexdigest()
+        self.request(
+            'webhook:resolved',
+            self.anonymous,
+            'post',
+            '/transactions/transaction_confirmation/resolved',
+            data=body,
+            content_type='application/json',
+            HTTP_FINTOC_SIGNATURE=f't={timestamp},v1={signature}'
+        )
+
+
+_SCENARIOS = {
+    'browse': Session.browse,
+    'cart': Session.cart,
+    'checkout': Session.checkout,
+    'webhook': Session.webhook
+}
+
+
+class Command(BaseCommand):
+
+    help: str = 'Replay a mix of api calls and report latency and queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mix',
+            default=_DEFAULT_MIX,
+            help='Weights of the scenarios, defaults to '
+                 f'{_DEFAULT_MIX}.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent clients, each with its own connection.'
+        )
+        parser.add_argument(
+            '--scenarios',
+            type=int,
+            default=2000,
+            help='Scenarios to run, unless --duration is given.'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=None,
+            help='Seconds to keep running scenarios for.'
+        )
+        parser.add_argument(
+            '--buyers',
+            type=int,
+            default=200,
+            help='Buyers the cart and checkout scenarios log in as.'
+        )
+        parser.add_argument(
+            '--payment-latency-ms',
+            type=float,
+            default=0,
+            help='Time the fake payment provider takes per payment intent.'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Seed of the scenario choices.'
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='File the results are saved to as json.'
+        )
+
+    def handle(self, *args, **options):
+        if settings.PROD:
+            raise CommandError(
+                'This command can not be executed in a production enviroment.'
+            )
+        if options['workers'] < 1:
+            raise CommandError('At least one worker is needed.')
+        weights = parse_mix(options['mix'])
+        catalogue = load_catalogue(options['buyers'])
+        # Checkouts must not reach Fintoc
+        latency = options['payment_latency_ms'] / 1000
+
+        def fake_payment_intent(price):
+            sleep(latency)
+            return f'pi_bench_{uuid4().hex}', 'widget_token'
+
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ), mock.patch(_PAYMENT_INTENT, fake_payment_intent):
+            samples, elapsed = self.run_workers(catalogue, weights, options)
+        results = self.summarize(samples, elapsed, options)
+        self.report(results)
+        if options['output'] is not None:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+
+    def run_workers(
+        self,
+        catalogue: Catalogue,
+        weights: dict[str, float],
+        options: dict
+    ) -> tuple[list[Sample], float]:
+        seed = Random(options['seed'])
+        pending = [options['scenarios']]
+        deadline = None if options['duration'] is None \
+            else monotonic() + options['duration']
+        samples: list[Sample] = []
+        errors: list[BaseException] = []
+        lock = Lock()
+
+        def record(sample: Sample) -> None:
+            with lock:
+                samples.append(sample)
+
+        def next_scenario() -> bool:
+            if deadline is not None:
+                return monotonic() < deadline
+            with lock:
+                if pending[0] == 0:
+                    return False
+                pending[0] -= 1
+                return True
+
+        def worker(index: int, rng: Random) -> None:
+            buyers = catalogue.buyers[index::options['workers']] \
+                or catalogue.buyers
+            session = Session(catalogue, buyers, rng, record)
+            scenarios = [_SCENARIOS[name] for name in weights]
+            try:
+                with connection.execute_wrapper(session.counter):
+                    while next_scenario():
+                        scenario, = rng.choices(
+                            scenarios,
+                            list(weights.values())
+                        )
+                        scenario(session)
+            except BaseException as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            Thread(target=worker, args=(i, Random(seed.random())))
+            for i in range(options['workers'])
+        ]
+        start = monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = monotonic() - start
+        if errors:
+            raise CommandError(f'A worker failed: {errors[0]!r}')
+        return samples, elapsed
+
+    def summarize(
+        self,
+        samples: list[Sample],
+        elapsed: float,
+        options: dict
+    ) -> dict:
+        by_operation = defaultdict(list)
+        for sample in samples:
+            by_operation[sample.operation].append(sample)
+
+        def summary(operation_samples: list[Sample]) -> dict:
+            statuses = defaultdict(int)
+            for sample in operation_samples:
+                statuses[str(sample.status)] += 1
+            return summarize(
+                [sample.latency for sample in operation_samples],
+                [sample.queries for sample in operation_samples],
+                [sample.status for sample in operation_samples],
+                elapsed
+            ) | {'statuses': dict(statuses)}
+
+        return {
+            'started_at': now().isoformat(),
+            'elapsed_seconds': elapsed,
+            'options': {
+                name: options[name] for name in (
+                    'mix', 'workers', 'scenarios', 'duration', 'buyers',
+                    'payment_latency_ms', 'seed'
+                )
+            },
+            'dataset': {
+                'users': UserProfile.objects.count(),
+                'publications': Publication.objects.count(),
+                'publication_items': PublicationItem.objects.count(),
+                'transactions': Transaction.objects.count()
+            },
+            'total': summary(samples),
+            'operations': {
+                operation: summary(by_operation[operation])
+                for operation in sorted(by_operation)
+            }
+        }
+
+    def report(self, results: dict) -> None:
+        self.stdout.write(
+            f'{"operation":<20} {"requests":>8} {"errors":>6} {"req/s":>8} '
+            f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>7}'
+        )
+        rows = [*results['operations'].items(), ('total', results['total'])]
+        for operation, summary in rows:
+            latency = summary['latency_ms']
+            self.stdout.write(
+                f'{operation:<20} {summary["requests"]:>8} '
+                f'{summary["errors"]:>6} {summary["throughput"]:>8.1f} '
+                f'{latency["p50"]:>8.1f} {latency["p95"]:>8.1f} '
+                f'{latency["p99"]:>8.1f} {summary["queries"]["mean"]:>7.1f}'
+            )
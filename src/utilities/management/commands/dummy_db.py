@@ -1,107 +1,376 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.core.management import call_command
+from django.core.management.color import no_style
 from django.conf import settings
-from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import Group
-from user_profiles.models import UserProfile
-from publications.models import Category, Item, Publication, PublicationItem
-from typing import Iterable
-from random import randint
-from datetime import date
-
-
-_PUBLICATION_AMOUNT = 10
-
-
-def create_users() -> tuple[UserProfile, UserProfile]:
-    UserModel = get_user_model()
-    seller = UserModel.objects.create(
-        username='seller',
-        email='seller@email.com',
-        first_name='seller_first_name',
-        last_name='seller_last_name',
-        rut='0000000-1',
-        phone_number='+56900001',
-        birthdate=date.today(),
-        email_verified=True
-    )
-    buyer = UserModel.objects.create(
-        username='buyer',
-        email='buyer@email.com',
-        first_name='buyer_first_name',
-        last_name='buyer_last_name',
-        rut='0000000-0',
-        phone_number='+56900000',
-        birthdate=date.today(),
-        email_verified=True
-    )
-    buyer.set_password('password')
-    seller.groups.add(Group.objects.get(name='Seller'))
-    seller.set_password('password')
-    seller.save()
-    buyer.save()
-    return seller, buyer
-
-
-def create_items(n: int) -> Iterable[Item]:
-    items = list()
-    category = Category.objects.create(name='category')
-    for i in range(n):
-        items.append(
-            Item(
-                name=f'item_{i}',
-                brand=f'brand_{i}',
-                size=f'size_{i}',
-                color=f'color_{i}',
-                sku=i,
-                category=category
-            )
+from django.db import connection, transaction
+from django.db.models import Model
+from django.utils.timezone import now
+from user_profiles.models import UserProfile, UserShippingAddress
+from publications.models import (
+    Category,
+    Item,
+    Publication,
+    PublicationItem,
+    PublicationPhoto,
+    ShoppingCartPointer,
+    item_size_class
+)
+from publications.helpers.search import publication_search_vector
+from transactions.models import (
+    PaymentRegistry,
+    Transaction,
+    TransactionPointer
+)
+from utilities.bulk import copy_rows
+from typing import Iterable, Iterator
+from datetime import timedelta
+from random import Random
+from time import monotonic
+
+
+_BRANDS = (
+    'adidas', 'nike', 'puma', 'reebok', 'fila', 'umbro', 'converse',
+    'vans', 'levis', 'zara', 'mango', 'lacoste', 'columbia', 'lippi'
+)
+_COLORS = (
+    'negro', 'blanco', 'rojo', 'azul', 'verde', 'gris', 'amarillo',
+    'rosado', 'morado', 'cafe'
+)
+_SIZES = tuple(size for size, _ in Item._meta.get_field('size').choices)
+_REGIONS = ('Metropolitana', 'Valparaiso', 'Biobio', 'Maule', 'Araucania')
+_STATUSES = ('SUCCEDED',) * 8 + ('FAILED', 'CANCELED')
+# Transactions are spread over the last year
+_HISTORY_DAYS = 365
+_PASSWORD = 'password'
+
+
+class DummyData:
+    # Rows get consecutive ids starting at 1, so related rows are picked by
+    # id without reading anything back. Sellers come first, then buyers.
+
+    def __init__(self, options: dict):
+        self.sellers = options['sellers']
+        self.buyers = options['users']
+        self.categories = options['categories']
+        self.publications = options['publications']
+        self.variants = options['variants']
+        self.photos = options['photos']
+        self.carts = min(options['carts'], self.buyers)
+        self.transactions = options['transactions'] if self.buyers else 0
+        self.batch_size = options['batch_size']
+        self.random = Random(options['seed'])
+        self.now = now()
+
+    @property
+    def items(self) -> int:
+        return self.publications * self.variants
+
+    def buyer_id(self, buyer: int) -> int:
+        return self.sellers + buyer + 1
+
+    def random_pub_item_ids(self, amount: int) -> list[int]:
+        amount = min(amount, self.items)
+        return self.random.sample(range(1, self.items + 1), amount)
+
+    def users(self) -> Iterator[tuple]:
+        password = make_password(_PASSWORD)
+        joined = self.now - timedelta(days=_HISTORY_DAYS)
+        for role, amount, rut_suffix in (
+            ('seller', self.sellers, 1),
+            ('buyer', self.buyers, 0)
+        ):
+            for i in range(amount):
+                # The first seller and buyer keep the plain usernames
+                username = role if i == 0 else f'{role}_{i}'
+                yield (
+                    password, username, f'{username}_first_name',
+                    f'{username}_last_name', f'{username}@email.com',
+                    False, False, True, joined, True, f'+569{i:08d}',
+                    f'{i:07d}-{rut_suffix}', joined.date()
+                )
+
+    def seller_groups(self) -> Iterator[tuple]:
+        # Queried before the rows are copied
+        group_id = Group.objects.get(name='Seller').id
+        return (
+            (seller_id, group_id)
+            for seller_id in range(1, self.sellers + 1)
         )
-    Item.objects.bulk_create(items, len(items))
-    return items
-
-
-def create_publication(n: int, seller: UserProfile) -> None:
-    items = create_items(n)
-    publications = list()
-    publication_items = list()
-    for i, item in enumerate(items):
-        publications.append(
-            Publication(
-                seller=seller,
-                price=1,
-                is_active=True,
-                is_accepted=True,
-                description=f'description n.{i}'
+
+    def shipping_addresses(self) -> Iterator[tuple]:
+        # One per buyer, with the same index
+        for buyer in range(self.buyers):
+            yield (
+                self.buyer_id(buyer),
+                self.random.choice(_REGIONS),
+                f'comuna_{buyer % 50}',
+                f'calle {buyer} #{self.random.randint(1, 9999)}'
             )
-        )
-        publication_items.append(
-            PublicationItem(
-                item=item,
-                publication=publications[i],
-                amount=randint(10, 20),
+
+    def category_rows(self) -> Iterator[tuple]:
+        for i in range(self.categories):
+            # The first category keeps the name it always had
+            yield ('category' if i == 0 else f'category_{i}',)
+
+    def item_rows(self) -> Iterator[tuple]:
+        # Variants of a publication share name, brand and category
+        sku = 0
+        for pub in range(self.publications):
+            brand = _BRANDS[pub % len(_BRANDS)]
+            category_id = pub % self.categories + 1 \
+                if self.categories else None
+            for _ in range(self.variants):
+                size = self.random.choice(_SIZES)
+                yield (
+                    f'item_{pub}', brand, size, item_size_class(size),
+                    self.random.choice(_COLORS), sku, category_id
+                )
+                sku += 1
+
+    def publication_rows(self) -> Iterator[tuple]:
+        for pub in range(self.publications):
+            published = self.now - timedelta(
+                days=self.random.randrange(_HISTORY_DAYS)
             )
-        )
-    Publication.objects.bulk_create(publications, len(publications))
-    PublicationItem.objects.bulk_create(
-        publication_items,
-        len(publication_items)
+            yield (
+                pub % self.sellers + 1,
+                self.random.randint(1, 100) * 1000,
+                published.date(), True, True,
+                f'description n.{pub}', self.now, self.now
+            )
+
+    def publication_item_rows(self) -> Iterator[tuple]:
+        for item_id in range(1, self.items + 1):
+            publication_id = (item_id - 1) // self.variants + 1
+            yield (
+                item_id, publication_id,
+                self.random.randint(10, 100), 0, self.now
+            )
+
+    def photo_rows(self) -> Iterator[tuple]:
+        for publication_id in range(1, self.publications + 1):
+            for i in range(self.photos):
+                yield (
+                    publication_id,
+                    f'https://picsum.photos/seed/{publication_id}-{i}/600',
+                    self.now
+                )
+
+    def cart_rows(self) -> Iterator[tuple]:
+        for buyer in self.random.sample(range(self.buyers), self.carts):
+            for pub_item_id in self.random_pub_item_ids(
+                self.random.randint(1, 3)
+            ):
+                yield (
+                    self.buyer_id(buyer), pub_item_id,
+                    self.random.randint(1, 3)
+                )
+
+    def transaction_rows(self) -> Iterator[tuple]:
+        for transaction_id in range(1, self.transactions + 1):
+            buyer = self.random.randrange(self.buyers)
+            created_at = self.now - timedelta(
+                seconds=self.random.randrange(_HISTORY_DAYS * 24 * 3600)
+            )
+            yield (
+                f'pi_dummy_{transaction_id}',
+                self.random.choice(_STATUSES), created_at,
+                self.buyer_id(buyer), buyer + 1, False
+            )
+
+    def transaction_pointer_rows(self) -> Iterator[tuple]:
+        for transaction_id in range(1, self.transactions + 1):
+            for pub_item_id in self.random_pub_item_ids(
+                self.random.randint(1, 3)
+            ):
+                yield (
+                    transaction_id, pub_item_id,
+                    self.random.randint(1, 3),
+                    self.random.randint(1, 100) * 1000
+                )
+
+    def payment_registry_rows(self) -> Iterator[tuple]:
+        for transaction_id in range(1, self.transactions + 1):
+            yield (f'pi_dummy_{transaction_id}', transaction_id)
+
+
+_TABLES = (
+    (
+        UserProfile,
+        [
+            'password', 'username', 'first_name', 'last_name', 'email',
+            'is_superuser', 'is_staff', 'is_active', 'date_joined',
+            'email_verified', 'phone_number', 'rut', 'birthdate'
+        ],
+        DummyData.users
+    ),
+    (
+        UserProfile.groups.through,
+        ['userprofile', 'group'],
+        DummyData.seller_groups
+    ),
+    (
+        UserShippingAddress,
+        ['user', 'region', 'commune', 'address'],
+        DummyData.shipping_addresses
+    ),
+    (Category, ['name'], DummyData.category_rows),
+    (
+        Item,
+        [
+            'name', 'brand', 'size', 'size_class', 'color', 'sku',
+            'category'
+        ],
+        DummyData.item_rows
+    ),
+    (
+        Publication,
+        [
+            'seller', 'price', 'publish_date', 'is_active', 'is_accepted',
+            'description', 'updated_at', 'content_updated_at'
+        ],
+        DummyData.publication_rows
+    ),
+    (
+        PublicationItem,
+        ['item', 'publication', 'amount', 'reserved', 'updated_at'],
+        DummyData.publication_item_rows
+    ),
+    (
+        PublicationPhoto,
+        ['publication', 'image_uri', 'updated_at'],
+        DummyData.photo_rows
+    ),
+    (
+        ShoppingCartPointer,
+        ['cart_owner', 'publication_item', 'amount'],
+        DummyData.cart_rows
+    ),
+    (
+        Transaction,
+        [
+            'payment_id', 'status', 'created_at', 'buyer',
+            'shipping_address', 'related_indexed'
+        ],
+        DummyData.transaction_rows
+    ),
+    (
+        TransactionPointer,
+        ['transaction', 'publication_item', 'amount', 'price_per_unit'],
+        DummyData.transaction_pointer_rows
+    ),
+    (
+        PaymentRegistry,
+        ['payment_id', 'transaction'],
+        DummyData.payment_registry_rows
     )
+)
+
+
+def update_all_search_vectors(batch_size: int) -> None:
+    # In id ranges, a single update of millions of rows would hold its
+    # locks and dead tuples until the very end.
+    last_id = Publication.objects.order_by('-id').values_list(
+        'id',
+        flat=True
+    ).first() or 0
+    for start in range(1, last_id + 1, batch_size):
+        Publication.objects.filter(
+            id__range=(start, start + batch_size - 1)
+        ).update(search_vector=publication_search_vector())
 
 
 class Command(BaseCommand):
 
     help: str = 'Reset and populate db with dummy data.'
 
+    def add_arguments(self, parser):
+        sizes = (
+            ('--users', 1, 'Buyers, each with a shipping address.'),
+            ('--sellers', 1, 'Sellers owning the publications.'),
+            ('--categories', 1, 'Categories of the items.'),
+            ('--publications', 10, 'Active publications.'),
+            ('--variants', 1, 'Items of each publication.'),
+            ('--photos', 0, 'Photos of each publication.'),
+            ('--carts', 0, 'Buyers with items in their shopping cart.'),
+            ('--transactions', 0, 'Past purchases of random buyers.')
+        )
+        for flag, default, help_text in sizes:
+            parser.add_argument(
+                flag,
+                type=int,
+                default=default,
+                help=f'{help_text} Defaults to {default}.'
+            )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Rows generated at a time while loading.'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Seed of the random data, for repeatable datasets.'
+        )
+
     def handle(self, *args, **options):
         if settings.PROD:
             raise CommandError(
                 'This command can not be executed in a production enviroment.'
             )
+        if options['sellers'] < 1 and options['publications'] > 0:
+            raise CommandError('Publications need at least one seller.')
+        if min(options['batch_size'], options['variants']) < 1:
+            raise CommandError('Batch size and variants must be positive.')
         # Reset database
         call_command('reset_db')
         call_command('migrate')
-        # Create seller and buyer users
-        seller, _ = create_users()
-        # Create publications
-        create_publication(_PUBLICATION_AMOUNT, seller)
+        self.load(DummyData(options))
+
+    def load(self, data: DummyData) -> None:
+        with transaction.atomic():
+            for model, fields, rows in _TABLES:
+                self.copy_table(model, fields, rows(data), data.batch_size)
+            # Ids were given explicitly, sequences continue after them
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(),
+                    [model for model, _, _ in _TABLES]
+                ):
+                    cursor.execute(sql)
+        start = monotonic()
+        # Without statistics of the new rows the planner picks poor plans
+        # for the subqueries of the search vectors, ten times slower.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        update_all_search_vectors(data.batch_size)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'ANALYZE '
+                + connection.ops.quote_name(Publication._meta.db_table)
+            )
+        self.stdout.write(
+            f'search vectors and statistics in {monotonic() - start:.1f}s'
+        )
+
+    def copy_table(
+        self,
+        model: type[Model],
+        fields: list[str],
+        rows: Iterable[tuple],
+        batch_size: int
+    ) -> None:
+        start = monotonic()
+        # Ids are numbered in the order rows are generated
+        rows = (
+            (row_id, *row) for row_id, row in enumerate(rows, start=1)
+        )
+        count = copy_rows(model, ['id', *fields], rows, batch_size)
+        self.stdout.write(
+            f'{model._meta.db_table}: {count} rows in '
+            f'{monotonic() - start:.1f}s'
+        )
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from utilities.mailer import OutboxResult, deliver_outbox
+from utilities.workers import run_periodically
+from time import monotonic
+
+
+class Command(BaseCommand):
+
+    help: str = 'Send the emails queued in the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the outbox once and exit.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.EMAIL_OUTBOX_INTERVAL,
+            help='Seconds to wait between checks of the outbox.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Emails sent per SMTP connection.'
+        )
+
+    def handle(self, *args, **options):
+        run_periodically(
+            'send_outbox',
+            lambda: self.drain(options['batch_size']),
+            options['interval'],
+            options['once']
+        )
+
+    def drain(self, batch_size: int) -> OutboxResult:
+        start = monotonic()
+        result = OutboxResult()
+        # Keep going while batches come back full and the server answers
+        while True:
+            batch_result = deliver_outbox(batch_size)
+            result = OutboxResult(
+                result.sent + batch_result.sent,
+                result.failed + batch_result.failed,
+                result.deferred + batch_result.deferred
+            )
+            if batch_result.processed < batch_size \
+                    or batch_result.deferred > 0:
+                break
+        if result.processed > 0 or result.deferred > 0:
+            self.stdout.write(
+                f'Sent {result.sent} emails, {result.failed} failed, '
+                f'{result.deferred} deferred in {monotonic() - start:.3f}s.'
+            )
+        return result
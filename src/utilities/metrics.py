@@ -0,0 +1,305 @@
+from django.conf import settings
+from collections import defaultdict
+from pathlib import Path
+from threading import Lock
+from time import monotonic
+from typing import Iterable
+from uuid import uuid4
+import atexit
+import fcntl
+import json
+import os
+
+
+# Every worker keeps its samples in memory and writes them to its own file
+# of METRICS_DIR, at most every METRICS_FLUSH_INTERVAL seconds. The metrics
+# endpoint adds up the files of every worker, so counters keep counting
+# when gunicorn restarts a worker. Without METRICS_DIR only the samples of
+# the current process are exposed.
+_DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_METRICS = {
+    'http_requests_total': (
+        'counter',
+        'Requests by operation, method and status.'
+    ),
+    'http_request_duration_seconds': (
+        'histogram',
+        'Time spent on requests by operation.'
+    ),
+    'http_request_db_queries': (
+        'histogram',
+        'SQL queries run per request by operation.'
+    ),
+    'http_request_db_seconds_total': (
+        'counter',
+        'Time spent on SQL queries by operation.'
+    ),
+    'http_response_size_bytes_total': (
+        'counter',
+        'Bytes sent in response bodies by operation.'
+    ),
+    'payment_requests_total': (
+        'counter',
+        'Requests sent to the payment provider.'
+    ),
+    'payment_request_duration_seconds': (
+        'histogram',
+        'Time spent on requests to the payment provider.'
+    ),
+    'payment_errors_total': (
+        'counter',
+        'Failed requests to the payment provider by kind.'
+    ),
+    'payment_client_events_total': (
+        'counter',
+        'Retries, failed payment intents and calls rejected by the circuit.'
+    ),
+    'payment_circuit_open': (
+        'gauge',
+        'Workers whose payment provider circuit breaker is open.'
+    )
+}
+
+_ARCHIVE_FILE = 'archive.json'
+
+Labels = tuple[tuple[str, str], ...]
+Samples = dict[tuple[str, Labels], float]
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._samples: Samples = defaultdict(float)
+        self._lock = Lock()
+        self._flushed_at = monotonic()
+        # Process ids are reused, the token keeps the file of a finished
+        # worker from being overwritten by a new one.
+        self._file_name = f'{os.getpid()}-{uuid4().hex[:8]}.json'
+
+    def inc(self, name: str, labels: Labels, value: float = 1) -> None:
+        with self._lock:
+            self._samples[(name, labels)] += value
+
+    def set(self, name: str, labels: Labels, value: float) -> None:
+        with self._lock:
+            self._samples[(name, labels)] = value
+
+    def observe(
+        self,
+        name: str,
+        labels: Labels,
+        value: float,
+        buckets: Iterable[float]
+    ) -> None:
+        with self._lock:
+            for bucket in buckets:
+                bucket_labels = labels + (('le', str(bucket)),)
+                # Empty buckets are exposed as well
+                self._samples[(f'{name}_bucket', bucket_labels)] += \
+                    1 if value <= bucket else 0
+            inf_labels = labels + (('le', '+Inf'),)
+            self._samples[(f'{name}_bucket', inf_labels)] += 1
+            self._samples[(f'{name}_sum', labels)] += value
+            self._samples[(f'{name}_count', labels)] += 1
+
+    def samples(self) -> Samples:
+        with self._lock:
+            return dict(self._samples)
+
+    def flush(self, force: bool = False) -> None:
+        if not settings.METRICS_DIR:
+            return
+        elapsed = monotonic() - self._flushed_at
+        if not force and elapsed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._flushed_at = monotonic()
+        metrics_dir = Path(settings.METRICS_DIR)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        _write_samples(metrics_dir / self._file_name, self.samples())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush, True)
+
+
+def record_request(
+    operation: str,
+    method: str,
+    status: int,
+    duration: float,
+    queries: int,
+    db_seconds: float,
+    size: int
+) -> None:
+    labels = (('operation', operation),)
+    registry.inc(
+        'http_requests_total',
+        labels + (('method', method), ('status', str(status)))
+    )
+    registry.observe(
+        'http_request_duration_seconds',
+        labels,
+        duration,
+        _DURATION_BUCKETS
+    )
+    registry.observe(
+        'http_request_db_queries',
+        labels,
+        queries,
+        _QUERY_BUCKETS
+    )
+    registry.inc('http_request_db_seconds_total', labels, db_seconds)
+    registry.inc('http_response_size_bytes_total', labels, size)
+    registry.flush()
+
+
+# Payment metrics are flushed with those of the request making the payment
+def record_payment_request(provider: str, duration: float) -> None:
+    labels = (('provider', provider),)
+    registry.inc('payment_requests_total', labels)
+    registry.observe(
+        'payment_request_duration_seconds',
+        labels,
+        duration,
+        _DURATION_BUCKETS
+    )
+
+
+def record_payment_error(provider: str, kind: str) -> None:
+    registry.inc(
+        'payment_errors_total',
+        (('provider', provider), ('kind', kind))
+    )
+
+
+def record_payment_event(provider: str, event: str) -> None:
+    registry.inc(
+        'payment_client_events_total',
+        (('provider', provider), ('event', event))
+    )
+
+
+def record_payment_circuit(provider: str, is_open: bool) -> None:
+    registry.set(
+        'payment_circuit_open',
+        (('provider', provider),),
+        1 if is_open else 0
+    )
+
+
+def _write_samples(path: Path, samples: Samples) -> None:
+    # Written aside and renamed, so readers never see half a file
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps([
+        [name, labels, value]
+        for (name, labels), value in samples.items()
+    ]))
+    os.replace(temporary, path)
+
+
+def _read_samples(path: Path) -> Samples:
+    try:
+        return {
+            (name, tuple(tuple(label) for label in labels)): value
+            for name, labels, value in json.loads(path.read_text())
+        }
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _add_samples(total: Samples, samples: Samples) -> None:
+    for key, value in samples.items():
+        total[key] = total.get(key, 0) + value
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _archive_finished_workers(metrics_dir: Path) -> None:
+    # Files of workers that are gone are folded into a single one, so
+    # scrapes do not slow down as gunicorn recycles workers.
+    archive_path = metrics_dir / _ARCHIVE_FILE
+    finished = [
+        path for path in metrics_dir.glob('*-*.json')
+        if not _is_running(int(path.name.split('-')[0]))
+    ]
+    if not finished:
+        return
+    archive = _read_samples(archive_path)
+    for path in finished:
+        # The state of a finished worker is gone with it
+        _add_samples(archive, {
+            (name, labels): value
+            for (name, labels), value in _read_samples(path).items()
+            if _METRICS.get(_metric_of(name), ('',))[0] != 'gauge'
+        })
+    _write_samples(archive_path, archive)
+    for path in finished:
+        path.unlink()
+
+
+def collect() -> Samples:
+    if not settings.METRICS_DIR:
+        return registry.samples()
+    registry.flush(force=True)
+    metrics_dir = Path(settings.METRICS_DIR)
+    total: Samples = {}
+    # Concurrent scrapes must not read a worker both in its own file and
+    # in the archive
+    with open(metrics_dir / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _archive_finished_workers(metrics_dir)
+        for path in metrics_dir.glob('*.json'):
+            _add_samples(total, _read_samples(path))
+    return total
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n') \
+        .replace('"', '\\"')
+
+
+def _metric_of(sample_name: str) -> str:
+    for suffix in ('_bucket', '_sum', '_count'):
+        name = sample_name[:-len(suffix)]
+        if sample_name.endswith(suffix) and name in _METRICS:
+            return name
+    return sample_name
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render(samples: Samples) -> str:
+    # Prometheus text exposition format. Samples keep the order they were
+    # first recorded in, so histogram buckets stay in ascending order.
+    by_metric = defaultdict(list)
+    for (name, labels), value in samples.items():
+        by_metric[_metric_of(name)].append((name, labels, value))
+    lines = []
+    for metric, (metric_type, description) in _METRICS.items():
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} {metric_type}')
+        for name, labels, value in by_metric.get(metric, []):
+            label_text = ','.join(
+                f'{label}="{_escape(label_value)}"'
+                for label, label_value in labels
+            )
+            lines.append(f'{name}{{{label_text}}} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
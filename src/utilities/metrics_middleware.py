@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from ninja.operation import PathView
+from utilities.metrics import collect, record_request, render
+from time import perf_counter
+
+
+_METRICS_PATH = '/metrics'
+_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class QueryCounter:
+    # Installed with connection.execute_wrapper for the whole request
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += perf_counter() - start
+
+
+def operation_id(request) -> str:
+    # Requests are labelled with the operation id of the openapi schema,
+    # or the url name of other views, to keep the number of labels bounded.
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    path_view = getattr(match.func, '__self__', None)
+    if isinstance(path_view, PathView):
+        for operation in path_view.operations:
+            if request.method in operation.methods:
+                return operation.api.get_openapi_operation_id(operation)
+    return match.view_name or 'unmatched'
+
+
+def response_size(response) -> int:
+    if response.streaming:
+        return int(response.get('Content-Length', 0))
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == _METRICS_PATH:
+            return self.metrics(request)
+        counter = QueryCounter()
+        start = perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        record_request(
+            operation_id(request),
+            request.method,
+            response.status_code,
+            perf_counter() - start,
+            counter.queries,
+            counter.seconds,
+            response_size(response)
+        )
+        return response
+
+    def metrics(self, request) -> HttpResponse:
+        token = settings.METRICS_TOKEN
+        if token and request.headers.get('Authorization') \
+                != f'Bearer {token}':
+            return HttpResponse(status=401)
+        return HttpResponse(render(collect()), content_type=_CONTENT_TYPE)
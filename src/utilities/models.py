@@ -1,4 +1,8 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
+from django.db import models
+from django.db.models import Q
+from django.utils.timezone import now
 
 
 phone_regex = RegexValidator(
@@ -6,9 +10,63 @@ phone_regex = RegexValidator(
     message="Invalid phone number"
 )
 
+_EMAIL_OUTBOX_STATUS = (
+    ('PENDING', 'pending'),
+    ('SENT', 'sent'),
+    ('FAILED', 'failed')
+)
+
 
 def get_latest_id(model) -> int:
     model_query = model.objects.last()
     if model_query is not None:
         return model_query.id + 1
     return 1
+
+
+class EmailOutbox(models.Model):
+    # Emails are rendered and stored with the change that triggers them,
+    # the send_outbox command delivers them outside of the request.
+    subject = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True, null=True)
+    from_email = models.CharField(max_length=254, blank=True, null=True)
+    to_email = models.CharField(max_length=254)
+    status = models.CharField(
+        max_length=8,
+        choices=_EMAIL_OUTBOX_STATUS,
+        default='PENDING'
+    )
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    next_attempt_at = models.DateTimeField(default=now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                condition=Q(status='PENDING'),
+                name='emailoutbox_pending_idx'
+            )
+        ]
+
+
+class IdempotencyKey(models.Model):
+    # Response stored for a client supplied Idempotency-Key, so a retried
+    # request is answered without running the operation again.
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.IntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    created_at = models.DateTimeField(default=now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'key'],
+                name='idempotencykey_scope_key_unique'
+            )
+        ]
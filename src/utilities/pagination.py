@@ -0,0 +1,157 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from datetime import date
+from typing import Any, Optional, Union
+import json
+
+
+# Cursors are opaque to clients: a base64 encoded json object with the
+# ordering values of the last item returned for each paginated list.
+Position = Optional[list[Any]]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return settings.PAGINATION_PAGE_SIZE
+    return max(1, min(limit, settings.PAGINATION_MAX_PAGE_SIZE))
+
+
+def encode_cursor(positions: dict[str, Position]) -> str:
+    # Padding is dropped so cursors can go in a query string as they are
+    return urlsafe_b64encode(
+        json.dumps(positions).encode('utf-8')
+    ).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> dict[str, Position]:
+    if cursor is None or cursor == '':
+        return {}
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        positions = json.loads(
+            urlsafe_b64decode((cursor + padding).encode('ascii'))
+        )
+    except (BinasciiError, UnicodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(positions, dict) or not all(
+        position is None or isinstance(position, list)
+        for position in positions.values()
+    ):
+        raise InvalidCursor(cursor)
+    return positions
+
+
+def _ordering_value(instance, field: str) -> Any:
+    value = instance
+    for attribute in field.lstrip('-').split('__'):
+        value = getattr(value, attribute)
+    if isinstance(value, date):
+        # Keep microseconds, json encoders truncate them
+        return value.isoformat()
+    return value
+
+
+def _after(ordering: tuple[str, ...], position: list[Any]) -> Q:
+    # (a, b) > (x, y) expands to a > x OR (a = x AND b > y), with the
+    # comparison flipped for descending fields.
+    condition = Q()
+    previous_equal = Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= previous_equal & Q(**{f'{name}__{lookup}': value})
+        previous_equal &= Q(**{name: value})
+    return condition
+
+
+def _after_position(
+    queryset: QuerySet,
+    ordering: tuple[str, ...],
+    position: Position
+) -> QuerySet:
+    queryset = queryset.order_by(*ordering)
+    if position is not None:
+        if len(position) != len(ordering):
+            raise InvalidCursor(position)
+        try:
+            queryset = queryset.filter(_after(ordering, position))
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidCursor(position)
+    return queryset
+
+
+def keyset_page(
+    queryset: QuerySet,
+    ordering: tuple[str, ...],
+    position: Position,
+    limit: int
+) -> tuple[list, Position]:
+    queryset = _after_position(queryset, ordering, position)
+    # Fetch one extra row to know if there is a next page
+    items = list(queryset[:limit + 1])
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, [_ordering_value(items[-1], field) for field in ordering]
+
+
+def paginate_querysets(
+    querysets: dict[str, QuerySet],
+    ordering: tuple[str, ...],
+    cursor: Optional[str],
+    limit: Optional[int]
+) -> dict[str, Union[list, Optional[str]]]:
+    positions = decode_cursor(cursor)
+    limit = page_limit(limit)
+    page: dict[str, Union[list, Optional[str]]] = {}
+    next_positions: dict[str, Position] = {}
+    for key, queryset in querysets.items():
+        # A list that was already exhausted is stored as null
+        if key in positions and positions[key] is None:
+            page[key] = []
+            next_positions[key] = None
+            continue
+        page[key], next_positions[key] = keyset_page(
+            queryset,
+            ordering,
+            positions.get(key),
+            limit
+        )
+    has_next = any(
+        position is not None for position in next_positions.values()
+    )
+    page['next'] = encode_cursor(next_positions) if has_next else None
+    return page
+
+
+def paginate_queryset(
+    queryset: QuerySet,
+    ordering: tuple[str, ...],
+    cursor: Optional[str],
+    limit: Optional[int]
+) -> dict[str, Union[list, Optional[str]]]:
+    return paginate_querysets({'items': queryset}, ordering, cursor, limit)
+
+
+def page_queryset(
+    queryset: QuerySet,
+    ordering: tuple[str, ...],
+    cursor: Optional[str],
+    limit: Optional[int]
+) -> QuerySet:
+    # The rows paginate_queryset returns for the same arguments, unfetched
+    positions = decode_cursor(cursor)
+    if 'items' in positions and positions['items'] is None:
+        return queryset.none()
+    return _after_position(
+        queryset,
+        ordering,
+        positions.get('items')
+    )[:page_limit(limit)]
@@ -0,0 +1,66 @@
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from publications.models import Publication, PublicationItem
+from transactions.models import PaymentRegistry, Transaction
+from user_profiles.models import UserProfile
+from utilities.management.commands.dummy_db import Command, DummyData
+from io import StringIO
+import json
+
+
+_DUMMY_OPTIONS = {
+    'users': 20,
+    'sellers': 3,
+    'categories': 4,
+    'publications': 50,
+    'variants': 3,
+    'photos': 2,
+    'carts': 5,
+    'transactions': 30,
+    'batch_size': 7,
+    'seed': 1
+}
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_dummy_data_and_api_benchmark(tmp_path):
+    # dummy_db resets and migrates the database first, the test database
+    # is loaded directly
+    Group.objects.get_or_create(name='Seller')
+    Command(stdout=StringIO()).load(DummyData(_DUMMY_OPTIONS))
+    assert UserProfile.objects.count() == 23
+    assert UserProfile.objects.get(username='seller').is_seller
+    assert UserProfile.objects.get(username='buyer').check_password(
+        'password'
+    )
+    assert PublicationItem.objects.count() == 150
+    assert not Publication.objects.filter(search_vector=None).exists()
+    assert PaymentRegistry.objects.count() == Transaction.objects.count()
+    # Sequences continue after the loaded rows
+    publication = Publication.objects.create(seller_id=1, price=1)
+    assert publication.id == 51
+
+    output = tmp_path / 'results.json'
+    call_command(
+        'benchmark_api',
+        scenarios=60,
+        workers=2,
+        seed=1,
+        mix='browse=2,cart=1,checkout=1,webhook=1',
+        output=str(output),
+        stdout=StringIO()
+    )
+    results = json.loads(output.read_text())
+    assert results['total']['errors'] == 0
+    assert results['total']['requests'] >= 60
+    assert {'browse', 'cart', 'checkout', 'webhook'} == {
+        operation.split(':')[0] for operation in results['operations']
+    }
+    summary = results['operations']['checkout:create']
+    assert set(summary['latency_ms']) == {'p50', 'p95', 'p99', 'max'}
+    assert summary['queries']['mean'] > 0
+    # Checkouts went through the fake payment provider
+    assert Transaction.objects.filter(
+        payment_id__startswith='pi_bench_'
+    ).count() == summary['statuses'].get('200', 0)
@@ -0,0 +1,48 @@
+import pytest
+from utilities.cache import LocalCache, bump_versions, cached
+from threading import Barrier, Thread
+from time import sleep
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(2)
+    local.set('a', (1,), 60)
+    local.set('b', (2,), 60)
+    assert local.get('a') == (1,)
+    local.set('c', (3,), 60)
+    assert local.get('b') is None
+    assert (local.get('a'), local.get('c')) == ((1,), (3,))
+    # Expired entries are dropped when read
+    local.set('d', (4,), -1)
+    assert local.get('d') is None
+    assert len(local) == 1
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_cached_computes_once_per_version():
+    calls = []
+    workers = 8
+    barrier = Barrier(workers)
+    results = []
+
+    def compute():
+        calls.append(None)
+        # Keep the other requests waiting on this one
+        sleep(0.1)
+        return len(calls)
+
+    def worker():
+        barrier.wait()
+        results.append(cached('test', (1,), ['test'], compute))
+
+    threads = [Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [1] * workers
+    assert cached('test', (2,), ['test'], compute) == 2
+    # Outside of a transaction the version is bumped right away
+    bump_versions('test')
+    assert cached('test', (1,), ['test'], compute) == 3
+    assert cached('test', (1,), ['test'], compute) == 3
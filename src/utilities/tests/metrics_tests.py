@@ -0,0 +1,75 @@
+import pytest
+from utilities.metrics import collect, registry
+from subprocess import run
+import json
+
+
+def requests_total(metrics: str, operation: str, status: int) -> int:
+    prefix = f'http_requests_total{{operation="{operation}",' \
+        f'method="GET",status="{status}"}} '
+    for line in metrics.splitlines():
+        if line.startswith(prefix):
+            return int(line[len(prefix):])
+    return 0
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_request_metrics(client, settings, tmp_path):
+    registry.clear()
+    for _ in range(2):
+        assert client.get(
+            '/api/publications/publications/active'
+        ).status_code == 200
+    assert client.get(
+        '/api/publications/publications/obtener/1'
+    ).status_code == 404
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    metrics = response.content.decode('utf-8')
+    assert requests_total(metrics, 'show_active_publications', 200) == 2
+    assert requests_total(metrics, 'show_specific_publication', 404) == 1
+    assert '# TYPE http_request_duration_seconds histogram' in metrics
+    assert 'http_request_duration_seconds_count' \
+        '{operation="show_active_publications"} 2' in metrics
+    assert 'http_request_db_queries_bucket' \
+        '{operation="show_active_publications",le="+Inf"} 2' in metrics
+    # Metrics of other workers are added up, finished ones are archived
+    settings.METRICS_DIR = str(tmp_path)
+    finished_pid = run(
+        ['sh', '-c', 'echo $$'],
+        capture_output=True
+    ).stdout.decode().strip()
+    (tmp_path / f'{finished_pid}-finished.json').write_text(json.dumps([[
+        'http_requests_total',
+        [
+            ['operation', 'show_active_publications'],
+            ['method', 'GET'],
+            ['status', '200']
+        ],
+        3
+    ], [
+        'payment_circuit_open',
+        [['provider', 'fintoc']],
+        1
+    ]]))
+    samples = collect()
+    assert samples[('http_requests_total', (
+        ('operation', 'show_active_publications'),
+        ('method', 'GET'),
+        ('status', '200')
+    ))] == 5
+    # Gauges of finished workers are not
+    assert ('payment_circuit_open', (('provider', 'fintoc'),)) \
+        not in samples
+    assert sorted(path.name for path in tmp_path.glob('*.json')) \
+        == sorted(['archive.json', registry._file_name])
+    # Scrapes can require a token
+    settings.METRICS_TOKEN = 'secret'
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+    assert requests_total(
+        response.content.decode('utf-8'),
+        'show_active_publications',
+        200
+    ) == 5
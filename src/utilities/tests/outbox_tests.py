@@ -0,0 +1,156 @@
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.db import OperationalError
+from django.utils.timezone import now
+from utilities.mailer import OutboxResult, deliver_outbox, send_email
+from utilities.models import EmailOutbox
+from unittest.mock import patch
+from datetime import timedelta
+from smtplib import SMTPDataError, SMTPServerDisconnected
+
+
+def _queue_emails(amount: int) -> None:
+    for i in range(amount):
+        send_email(
+            'purchase_confirmed_subject.txt',
+            'purchase_confirmed_email.html',
+            f'buyer{i}@email.com',
+            {'email': f'buyer{i}@email.com'}
+        )
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_user_creation_queues_confirmation_email(
+    ninja_client,
+    user_one_creation_info
+):
+    assert ninja_client.post(
+        '/user_profiles/user_profiles/create',
+        json=user_one_creation_info
+    ).status_code == 200
+    # Nothing is sent during the request
+    assert len(mail.outbox) == 0
+    email = EmailOutbox.objects.get()
+    assert email.to_email == user_one_creation_info['email']
+    assert email.status == 'PENDING'
+    call_command('send_outbox', '--once')
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == [user_one_creation_info['email']]
+    assert mail.outbox[0].subject == email.subject
+    email.refresh_from_db()
+    assert (email.status, email.attempts) == ('SENT', 1)
+    assert email.sent_at is not None
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_outbox_batches_over_one_connection(settings):
+    settings.EMAIL_OUTBOX_BATCH_SIZE = 2
+    _queue_emails(3)
+    with patch('utilities.mailer.get_connection') as get_connection:
+        get_connection.return_value.send_messages.return_value = 1
+        result = deliver_outbox(2)
+    assert (result.sent, result.failed) == (2, 0)
+    assert get_connection.call_count == 1
+    assert get_connection.return_value.send_messages.call_count == 2
+    assert EmailOutbox.objects.filter(status='PENDING').count() == 1
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_outbox_retries_with_backoff(settings):
+    settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 2
+    settings.EMAIL_OUTBOX_RETRY_BACKOFF = 30
+    send_email(
+        'purchase_confirmed_subject.txt',
+        'purchase_confirmed_email.html',
+        'buyer@email.com',
+        {'email': 'buyer@email.com'}
+    )
+    with patch('utilities.mailer.get_connection') as get_connection:
+        get_connection.return_value.send_messages.side_effect = \
+            SMTPDataError(554, 'Message rejected')
+        assert deliver_outbox(10).failed == 1
+        email = EmailOutbox.objects.get()
+        assert (email.status, email.attempts) == ('PENDING', 1)
+        assert email.last_error == \
+            "SMTPDataError: (554, 'Message rejected')"
+        assert email.next_attempt_at > now() + timedelta(seconds=25)
+        # Not due yet
+        assert deliver_outbox(10).processed == 0
+        EmailOutbox.objects.update(next_attempt_at=now())
+        assert deliver_outbox(10).failed == 1
+    email.refresh_from_db()
+    assert (email.status, email.attempts) == ('FAILED', 2)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_outbox_defers_while_smtp_is_down(settings):
+    settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 1
+    settings.EMAIL_OUTBOX_RETRY_BACKOFF = 30
+    _queue_emails(3)
+    with patch('utilities.mailer.get_connection') as get_connection:
+        connection = get_connection.return_value
+        # The server can not be reached, no email spends an attempt
+        connection.open.side_effect = ConnectionRefusedError('refused')
+        result = deliver_outbox(10)
+        assert (result.sent, result.failed, result.deferred) == (0, 0, 3)
+        assert set(EmailOutbox.objects.values_list(
+            'status',
+            'attempts'
+        )) == {('PENDING', 0)}
+        assert not EmailOutbox.objects.filter(
+            next_attempt_at__lte=now() + timedelta(seconds=25)
+        ).exists()
+        # A dropped connection is opened again for the same message
+        EmailOutbox.objects.update(next_attempt_at=now())
+        connection.open.side_effect = None
+        connection.send_messages.side_effect = [
+            1,
+            SMTPServerDisconnected('Connection unexpectedly closed'),
+            1,
+            1
+        ]
+        result = deliver_outbox(10)
+        assert (result.sent, result.failed, result.deferred) == (3, 0, 0)
+        assert connection.open.call_count == 3
+        # While it can not be opened again the rest of the batch waits
+        _queue_emails(3)
+        connection.open.side_effect = [None, ConnectionRefusedError()]
+        connection.send_messages.side_effect = [
+            1,
+            SMTPServerDisconnected('Connection unexpectedly closed')
+        ]
+        result = deliver_outbox(10)
+        assert (result.sent, result.failed, result.deferred) == (1, 0, 2)
+    assert EmailOutbox.objects.filter(status='SENT').count() == 4
+    assert EmailOutbox.objects.filter(
+        status='PENDING',
+        attempts=0
+    ).count() == 2
+
+
+class _StopWorker(Exception):
+    pass
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_outbox_worker_survives_errors():
+    # The first run fails on the database, the worker logs it and runs
+    # again after the interval
+    with patch(
+        'utilities.management.commands.send_outbox.deliver_outbox',
+        side_effect=[OperationalError('server closed'), OutboxResult()]
+    ) as deliver, patch(
+        'utilities.workers.sleep',
+        side_effect=[None, _StopWorker]
+    ):
+        with pytest.raises(_StopWorker):
+            call_command('send_outbox', '--interval', '0')
+    assert deliver.call_count == 2
+    # A single run reports the error
+    with patch(
+        'utilities.management.commands.send_outbox.deliver_outbox',
+        side_effect=OperationalError('server closed')
+    ):
+        with pytest.raises(OperationalError):
+            call_command('send_outbox', '--once')
@@ -0,0 +1,38 @@
+from django.db import close_old_connections
+from time import sleep
+from typing import Callable
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_periodically(
+    name: str,
+    job: Callable[[], None],
+    interval: float,
+    once: bool = False
+) -> None:
+    """
+    Runs job every interval seconds, or a single time with once. The
+    background workers run unsupervised, so an error, such as the database
+    restarting, is logged and the job tried again after the interval
+    instead of stopping the worker. A single run raises it.
+    """
+    while True:
+        close_old_connections()
+        try:
+            job()
+        except Exception:
+            if once:
+                raise
+            logger.exception(
+                '%s failed, trying again in %ss.',
+                name,
+                interval
+            )
+            # Connections left broken by the error are replaced
+            close_old_connections()
+        if once:
+            return
+        sleep(interval)